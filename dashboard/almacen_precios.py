@@ -0,0 +1,234 @@
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connections
+
+from .models import EstadoIngesta, PrecioAccion
+
+
+# Columnas de precio guardadas después de la fecha, en este orden
+COLUMNAS = ['apertura', 'maximo', 'minimo', 'cierre', 'cierre_ajustado', 'volumen']
+
+
+def _a_dias(fecha):
+    """Fecha -> días desde 1970-01-01, el formato de la columna de fechas"""
+    return np.datetime64(fecha, 'D').astype('int64')
+
+
+def matriz_desde_filas(filas):
+    """
+    Filas (fecha, *COLUMNAS) -> matriz float64 en orden Fortran.
+
+    Acepta tanto tuplas del ORM (date, Decimal) como filas crudas del cursor
+    (en SQLite, fechas ISO en texto y números float): NumPy convierte cada
+    columna de una vez.
+    """
+    matriz = np.empty((len(filas), 1 + len(COLUMNAS)), dtype='f8', order='F')
+    if filas:
+        fechas, *valores = zip(*filas)
+        matriz[:, 0] = np.array(fechas, dtype='datetime64[D]').astype('int64')
+        matriz[:, 1:] = np.array(valores, dtype='f8').T
+    return matriz
+
+
+def dataframe_desde_matriz(matriz):
+    """DataFrame indexado por fecha (datetime.date) sobre la matriz, sin copiarla"""
+    indice = pd.Index(
+        matriz[:, 0].astype('int64').astype('datetime64[D]').astype(object),
+        name='fecha'
+    )
+    return pd.DataFrame(matriz[:, 1:], index=indice, columns=COLUMNAS, copy=False)
+
+
+def leer_matriz(queryset):
+    """
+    Ejecuta la consulta de precios con el cursor crudo y la carga en una matriz.
+
+    Se saltea la construcción de instancias y los conversores del ORM (un
+    Decimal por celda): las filas van directo del cursor a NumPy.
+    """
+    sql, params = queryset.order_by('fecha').values_list('fecha', *COLUMNAS).query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return matriz_desde_filas(cursor.fetchall())
+
+
+def dataframe_desde_bd(simbolo, desde=None, hasta=None):
+    """Precios de un símbolo en [desde, hasta] leídos de la base en una consulta"""
+    precios = PrecioAccion.objects.filter(accion__simbolo=simbolo)
+    if desde is not None:
+        precios = precios.filter(fecha__gte=desde)
+    if hasta is not None:
+        precios = precios.filter(fecha__lte=hasta)
+    return dataframe_desde_matriz(leer_matriz(precios))
+
+
+def dataframes_desde_bd(simbolos, desde=None, hasta=None):
+    """
+    Precios de varios símbolos en una sola consulta: {simbolo: DataFrame}.
+
+    Las filas llegan ordenadas por símbolo y fecha, así que cada DataFrame es
+    un slice contiguo de la misma matriz. Los símbolos sin precios no aparecen.
+    """
+    precios = PrecioAccion.objects.filter(accion__simbolo__in=simbolos)
+    if desde is not None:
+        precios = precios.filter(fecha__gte=desde)
+    if hasta is not None:
+        precios = precios.filter(fecha__lte=hasta)
+
+    sql, params = (
+        precios.order_by('accion__simbolo', 'fecha')
+        .values_list('accion__simbolo', 'fecha', *COLUMNAS)
+        .query.sql_with_params()
+    )
+    with connections[precios.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        filas = cursor.fetchall()
+    if not filas:
+        return {}
+
+    simbolos_filas = [fila[0] for fila in filas]
+    matriz = matriz_desde_filas([fila[1:] for fila in filas])
+    nombres, inicios = np.unique(np.array(simbolos_filas, dtype=object), return_index=True)
+    limites = sorted(zip(inicios, nombres)) + [(len(filas), None)]
+
+    return {
+        nombre: dataframe_desde_matriz(matriz[inicio:siguiente])
+        for (inicio, nombre), (siguiente, _) in zip(limites, limites[1:])
+    }
+
+
+class AlmacenPrecios:
+    """
+    Copia columnar de PrecioAccion, un archivo .npy por símbolo.
+
+    Cada archivo es una matriz float64 en orden Fortran (columna por columna)
+    con la fecha en días desde 1970 seguida de COLUMNAS, ordenada por fecha.
+    Se abre con np.load(mmap_mode='r'): cargar una ventana es un searchsorted
+    y un slice sobre el mapeo, sin copiar, y todos los workers que leen el
+    mismo símbolo comparten las páginas del page cache del sistema.
+
+    La ingesta reconstruye el archivo de un símbolo después de cada commit que
+    le escribe precios. El nombre lleva la versión de 'precios:<SIMBOLO>' en
+    EstadoIngesta con que se armó (AAPL.v12.npy) y los lectores piden la
+    versión vigente: si los precios se escribieron por otro camino el archivo
+    no aparece y hay que leer de la base. Los lectores que ya tenían mapeado
+    un archivo reemplazado siguen viendo esa versión hasta reabrirlo.
+    """
+
+    _compartido = None
+    _lock_compartido = threading.Lock()
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self._abiertos = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def compartido(cls):
+        """Instancia única por proceso configurada desde settings"""
+        with cls._lock_compartido:
+            if cls._compartido is None:
+                cls._compartido = cls(getattr(settings, 'PRECIOS_COLUMNAR_DIR', 'precios_columnar'))
+            return cls._compartido
+
+    def _base(self, simbolo):
+        return simbolo.replace('/', '_')
+
+    def ruta(self, simbolo, version):
+        return self.directorio / f"{self._base(simbolo)}.v{version}.npy"
+
+    def existe(self, simbolo, version):
+        return self.ruta(simbolo, version).exists()
+
+    @staticmethod
+    def version_vigente(simbolo):
+        """Versión de 'precios:<SIMBOLO>' en EstadoIngesta (0 si nunca se registró)"""
+        version = EstadoIngesta.objects.filter(clave=f'precios:{simbolo}').values_list('version', flat=True).first()
+        return version or 0
+
+    def al_dia(self, simbolo):
+        """Hay archivo del símbolo con la versión vigente de sus precios"""
+        return self.existe(simbolo, self.version_vigente(simbolo))
+
+    def _anteriores(self, simbolo, vigente):
+        """Archivos del símbolo de otras versiones (y el formato sin versión)"""
+        patron = re.compile(rf'{re.escape(self._base(simbolo))}(\.v\d+)?\.npy')
+        return [
+            ruta for ruta in self.directorio.glob(f'{self._base(simbolo)}.*')
+            if ruta != vigente and patron.fullmatch(ruta.name)
+        ]
+
+    def reconstruir(self, simbolo):
+        """Regenera el archivo de un símbolo desde la base; devuelve la cantidad de filas"""
+        # La versión se lee antes que los precios: si entra una escritura en el
+        # medio, el archivo queda con una versión vieja y nadie lo va a pedir
+        version = self.version_vigente(simbolo)
+        matriz = leer_matriz(PrecioAccion.objects.filter(accion__simbolo=simbolo))
+        ruta = self.ruta(simbolo, version)
+
+        if len(matriz):
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as archivo:
+                    np.save(archivo, matriz)
+                os.replace(temporal, ruta)
+            except Exception:
+                if os.path.exists(temporal):
+                    os.unlink(temporal)
+                raise
+        else:
+            ruta.unlink(missing_ok=True)
+
+        if self.directorio.exists():
+            for anterior in self._anteriores(simbolo, ruta):
+                anterior.unlink(missing_ok=True)
+        return len(matriz)
+
+    def abrir(self, simbolo, version):
+        """Matriz mapeada de un símbolo en `version`, o None si no hay archivo de esa versión"""
+        ruta = self.ruta(simbolo, version)
+        try:
+            info = ruta.stat()
+        except FileNotFoundError:
+            return None
+
+        # Un archivo reemplazado cambia de inodo: hay que volver a mapearlo
+        firma = (ruta.name, info.st_ino, info.st_mtime_ns)
+        with self._lock:
+            abierto = self._abiertos.get(simbolo)
+            if abierto is not None and abierto[0] == firma:
+                return abierto[1]
+            matriz = np.load(ruta, mmap_mode='r')
+            self._abiertos[simbolo] = (firma, matriz)
+            return matriz
+
+    def ventana(self, simbolo, version, desde=None, hasta=None):
+        """Slice (sin copia) de las filas con fecha en [desde, hasta], o None si no hay archivo"""
+        matriz = self.abrir(simbolo, version)
+        if matriz is None:
+            return None
+
+        fechas = matriz[:, 0]
+        inicio = 0 if desde is None else np.searchsorted(fechas, _a_dias(desde), side='left')
+        fin = len(fechas) if hasta is None else np.searchsorted(fechas, _a_dias(hasta), side='right')
+        return matriz[inicio:fin]
+
+    def dataframe(self, simbolo, version, desde=None, hasta=None):
+        """
+        DataFrame indexado por fecha (datetime.date) sobre la ventana mapeada.
+
+        Las columnas de precio son vistas de solo lectura del archivo; None si
+        el símbolo no tiene archivo de esa versión.
+        """
+        bloque = self.ventana(simbolo, version, desde, hasta)
+        if bloque is None:
+            return None
+        return dataframe_desde_matriz(bloque)
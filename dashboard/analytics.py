@@ -1,60 +1,193 @@
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Avg, Max, Min, StdDev, Count
+from django.db.models import Avg, Max, Min, StdDev, Count, OuterRef, Subquery
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 
-from .models import PrecioAccion, AccionInternacional, Cotizacion
+from .almacen_precios import AlmacenPrecios, dataframe_desde_bd, dataframes_desde_bd
+from .cache_analitica import cacheado, fuentes_correlacion, fuentes_correlacion_blue, versiones_datos
+from .correlaciones import correlacion_cruzada, correlacion_movil, correlacion_rezagada, matriz_correlacion
+from .models import PrecioAccion, AccionInternacional, Cotizacion, MetricaAccion
+from .paralelo import ejecutar_por_simbolo
+
+
+# Columna de cada tipo de dólar en la matriz de retornos del universo
+SERIES_DOLAR = {tipo: f'dolar_{tipo}' for tipo, _ in Cotizacion.TIPOS_DOLAR}
+ETIQUETAS_SERIES = {f'dolar_{tipo}': nombre for tipo, nombre in Cotizacion.TIPOS_DOLAR}
+
+
+class ContextoDatos:
+    """
+    Memoria de ventanas de precios que vive lo que dura una request.
+    
+    Cada símbolo se carga una sola vez, a la ventana más amplia que se
+    anunció al crearlo (`dias`) o a la pedida si es mayor; los pedidos más
+    chicos se sirven cortando lo ya cargado. Los contadores permiten verificar
+    que no quedan cargas duplicadas:
+    
+        contexto = ContextoDatos(dias=30)
+        analizador = AnalizadorMercadoInternacional(contexto=contexto)
+        ...
+        contexto.estadisticas()  # {'aciertos': 14, 'fallos': 4, 'cargas': 1}
+    """
+    
+    def __init__(self, dias=None, hoy=None):
+        self.hoy = hoy or timezone.now().date()
+        self.desde_minimo = self.hoy - timedelta(days=dias) if dias is not None else None
+        self._datos = {}  # simbolo -> (desde cargado, DataFrame o None si no tiene precios)
+        self.versiones = {}  # clave de EstadoIngesta -> versión leída en esta request
+        self.aciertos = 0
+        self.fallos = 0
+        self.cargas = 0
+    
+    def obtener(self, simbolos, desde, cargar):
+        """
+        Devuelve {simbolo: DataFrame desde `desde`} para los símbolos con precios.
+        
+        Los que no están cargados con una ventana que cubra `desde` se leen
+        juntos con cargar(simbolos, desde).
+        """
+        simbolos = list(dict.fromkeys(simbolos))
+        faltantes = [
+            simbolo for simbolo in simbolos
+            if simbolo not in self._datos or self._datos[simbolo][0] > desde
+        ]
+        self.aciertos += len(simbolos) - len(faltantes)
+        self.fallos += len(faltantes)
+        
+        if faltantes:
+            desde_carga = min(desde, self.desde_minimo) if self.desde_minimo is not None else desde
+            cargados = cargar(faltantes, desde_carga)
+            self.cargas += 1
+            for simbolo in faltantes:
+                self._datos[simbolo] = (desde_carga, cargados.get(simbolo))
+        
+        resultado = {}
+        for simbolo in simbolos:
+            df = self._datos[simbolo][1]
+            if df is None:
+                continue
+            df = df.iloc[df.index.searchsorted(desde):]
+            if not df.empty:
+                resultado[simbolo] = df
+        return resultado
+    
+    def estadisticas(self):
+        return {'aciertos': self.aciertos, 'fallos': self.fallos, 'cargas': self.cargas}
 
 
 class AnalizadorMercadoInternacional:
     """Clase para análisis y visualización de datos del mercado internacional"""
     
-    def __init__(self):
-        self.hoy = timezone.now().date()
+    def __init__(self, contexto=None):
+        self.contexto = contexto
+        self.hoy = contexto.hoy if contexto is not None else timezone.now().date()
+    
+    def _cargar_dataframes(self, simbolos, dias):
+        """{simbolo: DataFrame} de los últimos `dias` días, pasando por el contexto si hay"""
+        desde = self.hoy - timedelta(days=dias)
+        if self.contexto is not None:
+            return self.contexto.obtener(simbolos, desde, self._leer_dataframes)
+        return self._leer_dataframes(simbolos, desde)
+    
+    def _leer_dataframes(self, simbolos, desde):
+        """
+        Lee los precios desde `desde` de varios símbolos.
+        
+        Los símbolos con archivo al día en el almacén columnar (misma versión
+        de 'precios:<SIMBOLO>' que EstadoIngesta) se leen de ahí y el resto
+        sale de una única consulta, así que la cantidad de consultas no
+        depende de cuántos símbolos se pidan. Omite los símbolos sin precios.
+        """
+        partes = {}
+        faltantes = list(simbolos)
+        
+        if getattr(settings, 'PRECIOS_COLUMNAR_ACTIVO', False):
+            almacen = AlmacenPrecios.compartido()
+            versiones = versiones_datos([f'precios:{simbolo}' for simbolo in simbolos], self.contexto)
+            faltantes = []
+            for simbolo in simbolos:
+                df = almacen.dataframe(simbolo, versiones[f'precios:{simbolo}'], desde=desde)
+                if df is None:
+                    faltantes.append(simbolo)
+                else:
+                    partes[simbolo] = df
+        if len(faltantes) == 1:
+            partes[faltantes[0]] = dataframe_desde_bd(faltantes[0], desde=desde)
+        elif faltantes:
+            partes.update(dataframes_desde_bd(faltantes, desde=desde))
+        
+        return {
+            simbolo: _agregar_retorno_diario(df)
+            for simbolo, df in partes.items()
+            if not df.empty
+        }
     
     def obtener_datos_dataframe(self, simbolo, dias=30):
-        """Convierte datos de la base de datos a DataFrame de pandas"""
-        try:
-            accion = AccionInternacional.objects.get(simbolo=simbolo)
-            fecha_limite = self.hoy - timedelta(days=dias)
-            
-            precios = PrecioAccion.objects.filter(
-                accion=accion,
-                fecha__gte=fecha_limite
-            ).order_by('fecha')
-            
-            if not precios.exists():
-                return None
-            
-            # Convertir a DataFrame
-            data = []
-            for precio in precios:
-                data.append({
-                    'fecha': precio.fecha,
-                    'apertura': float(precio.apertura),
-                    'maximo': float(precio.maximo),
-                    'minimo': float(precio.minimo),
-                    'cierre': float(precio.cierre),
-                    'cierre_ajustado': float(precio.cierre_ajustado),
-                    'volumen': float(precio.volumen),
-                    'retorno_diario': float(precio.retorno_diario()),
-                })
-            
-            df = pd.DataFrame(data)
-            df.set_index('fecha', inplace=True)
-            return df
-            
-        except AccionInternacional.DoesNotExist:
+        """
+        Devuelve los precios de los últimos `dias` días como DataFrame de pandas.
+        
+        Lee del almacén columnar mapeado en memoria si está activo y el símbolo
+        tiene archivo; si no, de la base con una sola consulta cargada directo
+        en arrays de NumPy.
+        """
+        return self._cargar_dataframes([simbolo], dias).get(simbolo)
+    
+    def obtener_panel(self, simbolos, dias=30):
+        """
+        Carga varios símbolos a la vez en un panel ancho alineado por fecha.
+        
+        Columnas MultiIndex (campo, simbolo): panel['cierre'] es una tabla
+        fecha x símbolo, con NaN donde un símbolo no cotizó. Devuelve None si
+        ninguno tiene datos.
+        """
+        simbolos = list(dict.fromkeys(simbolos))
+        cargados = self._cargar_dataframes(simbolos, dias)
+        partes = {simbolo: cargados[simbolo] for simbolo in simbolos if simbolo in cargados}
+        if not partes:
             return None
+        
+        panel = pd.concat(partes, axis=1, names=['simbolo', 'campo']).sort_index()
+        campos = list(next(iter(partes.values())).columns)
+        return panel.swaplevel(axis=1).reindex(
+            columns=pd.MultiIndex.from_product([campos, list(partes)], names=['campo', 'simbolo'])
+        )
+    
+    def obtener_metricas_materializadas(self, simbolos, periodo='D'):
+        """Última fila de MetricaAccion de cada símbolo, en una consulta (ver materializar_metricas)"""
+        ultima_fecha = MetricaAccion.objects.filter(
+            accion=OuterRef('accion'),
+            periodo=periodo
+        ).order_by('-fecha').values('fecha')[:1]
+        
+        metricas = MetricaAccion.objects.filter(
+            accion__simbolo__in=simbolos,
+            periodo=periodo,
+            fecha=Subquery(ultima_fecha)
+        ).select_related('accion')
+        
+        por_simbolo = {metrica.accion.simbolo: metrica for metrica in metricas}
+        return [por_simbolo[simbolo] for simbolo in simbolos if simbolo in por_simbolo]
     
+    def _datos_simbolo(self, panel, simbolo):
+        """DataFrame de un símbolo extraído del panel, solo con las fechas en que cotizó"""
+        if panel is None or simbolo not in panel.columns.get_level_values('simbolo'):
+            return None
+        df = panel.xs(simbolo, axis=1, level='simbolo').dropna(subset=['cierre'])
+        return df if not df.empty else None
+    
+    @cacheado()
     def calcular_metricas_basicas(self, simbolo, dias=30):
         """Calcula métricas básicas para un símbolo"""
-        df = self.obtener_datos_dataframe(simbolo, dias)
-        
+        return self._metricas_desde_dataframe(simbolo, self.obtener_datos_dataframe(simbolo, dias))
+    
+    @staticmethod
+    def _metricas_desde_dataframe(simbolo, df):
+        """Métricas básicas a partir de los precios ya cargados de un símbolo"""
         if df is None or df.empty:
             return None
         
@@ -87,6 +220,7 @@ class AnalizadorMercadoInternacional:
             'dias_analizados': len(df)
         }
     
+    @cacheado()
     def generar_grafico_linea(self, simbolo, dias=30):
         """Genera gráfico de línea para un símbolo"""
         df = self.obtener_datos_dataframe(simbolo, dias)
@@ -130,17 +264,18 @@ class AnalizadorMercadoInternacional:
         
         return fig.to_html(full_html=False, include_plotlyjs='cdn')
     
+    @cacheado()
     def generar_grafico_comparativo(self, simbolos, dias=30):
         """Genera gráfico comparativo de múltiples símbolos (normalizado)"""
         datos = {}
+        panel = self.obtener_panel(simbolos, dias)
         
-        # Obtener datos para cada símbolo
-        for simbolo in simbolos:
-            df = self.obtener_datos_dataframe(simbolo, dias)
-            if df is not None and not df.empty:
-                # Normalizar a 100 para comparación
-                primer_precio = df['cierre'].iloc[0]
-                datos[simbolo] = (df['cierre'] / primer_precio * 100).tolist()
+        # Normalizar a 100 para comparación
+        if panel is not None:
+            for simbolo, cierres in panel['cierre'].items():
+                cierres = cierres.dropna()
+                if not cierres.empty:
+                    datos[simbolo] = (cierres / cierres.iloc[0] * 100).tolist()
         
         if not datos:
             return None
@@ -150,8 +285,6 @@ class AnalizadorMercadoInternacional:
         
         # Agregar cada símbolo
         for simbolo, valores in datos.items():
-            accion = AccionInternacional.objects.get(simbolo=simbolo)
-            
             fig.add_trace(go.Scatter(
                 x=list(range(len(valores))),
                 y=valores,
@@ -173,114 +306,486 @@ class AnalizadorMercadoInternacional:
         
         return fig.to_html(full_html=False, include_plotlyjs='cdn')
     
+    @cacheado()
     def generar_tabla_metricas(self, simbolos, dias=30):
         """Genera tabla con métricas para múltiples símbolos"""
         metricas = []
+        panel = self.obtener_panel(simbolos, dias)
         
         for simbolo in simbolos:
-            datos = self.calcular_metricas_basicas(simbolo, dias)
+            datos = self._metricas_desde_dataframe(simbolo, self._datos_simbolo(panel, simbolo))
             if datos:
                 metricas.append(datos)
         
         return metricas
     
+    def generar_tabla_metricas_paralela(self, simbolos, dias=30, procesos=None):
+        """
+        Igual que generar_tabla_metricas, repartiendo los símbolos en un pool de procesos.
+        
+        Pensado para universos grandes desde comandos y tareas (no para una
+        request): los precios se cargan acá y llegan a los procesos por
+        memoria compartida (ver paralelo.ejecutar_por_simbolo).
+        """
+        cargados = self._cargar_dataframes(simbolos, dias)
+        resultados = ejecutar_por_simbolo(_metricas_de_simbolo, cargados, procesos)
+        return [resultados[simbolo] for simbolo in simbolos if resultados.get(simbolo)]
+    
+    @cacheado()
+    def calcular_indicadores_tecnicos(self, simbolos, dias=120):
+        """
+        Último valor de los indicadores técnicos de cada símbolo.
+        
+        Se calculan todos los símbolos juntos sobre las matrices del panel
+        (ver indicadores_tecnicos), sin recorrerlos uno por uno.
+        """
+        panel = self.obtener_panel(simbolos, dias)
+        if panel is None:
+            return []
+        
+        cierres = panel['cierre'].to_numpy()
+        indicadores = indicadores_tecnicos(
+            panel['maximo'].to_numpy(), panel['minimo'].to_numpy(), cierres, panel['volumen'].to_numpy()
+        )
+        
+        # Última fecha en que cotizó cada símbolo
+        validos = np.isfinite(cierres)
+        ultimas = len(cierres) - 1 - np.argmax(validos[::-1], axis=0)
+        columnas = np.arange(cierres.shape[1])
+        ultimos = {nombre: matriz[ultimas, columnas] for nombre, matriz in indicadores.items()}
+        
+        resultado = []
+        for indice, simbolo in enumerate(panel['cierre'].columns):
+            if not validos[:, indice].any():
+                continue
+            fila = {'simbolo': simbolo, 'ultimo_precio': round(float(cierres[ultimas[indice], indice]), 2)}
+            for nombre, valores in ultimos.items():
+                valor = valores[indice]
+                fila[nombre] = None if np.isnan(valor) else round(float(valor), 2)
+            resultado.append(fila)
+        return resultado
+    
+    @cacheado(fuentes_correlacion_blue)
     def calcular_correlacion_dolar_blue(self, simbolo, dias=30):
-        """Calcula correlación entre una acción y el dólar blue"""
-        try:
-            # Obtener datos de la acción
-            df_accion = self.obtener_datos_dataframe(simbolo, dias)
-            if df_accion is None or df_accion.empty:
-                return None
-            
-            # Obtener datos del dólar blue
-            fecha_limite = self.hoy - timedelta(days=dias)
-            cotizaciones = Cotizacion.objects.filter(
-                tipo='blue',
-                fecha__gte=fecha_limite
-            ).order_by('fecha')
-            
-            # Convertir a Series
-            precios_accion = df_accion['cierre']
-            precios_dolar = pd.Series({
-                c.fecha: float(c.venta)
-                for c in cotizaciones
-            })
-            
-            # Alinear fechas
-            fechas_comunes = set(precios_accion.index) & set(precios_dolar.index)
-            if len(fechas_comunes) < 5:
-                return None
-            
-            # Calcular correlación
-            correlacion = np.corrcoef(
-                precios_accion.loc[list(fechas_comunes)].values,
-                precios_dolar.loc[list(fechas_comunes)].values
-            )[0, 1]
-            
-            return round(correlacion, 3)
-            
-        except Exception as e:
-            print(f"Error calculando correlación para {simbolo}: {e}")
+        """Correlación de los retornos diarios de una acción con los del dólar blue"""
+        retornos = self.obtener_retornos_universo([simbolo], dias, tipos_dolar=['blue'])
+        blue = SERIES_DOLAR['blue']
+        if retornos is None or simbolo not in retornos.columns or blue not in retornos.columns:
+            return None
+        correlacion = correlacion_cruzada(retornos[[simbolo]].to_numpy(), retornos[[blue]].to_numpy())[0, 0]
+        return None if np.isnan(correlacion) else round(float(correlacion), 3)
+    
+    def _simbolos_universo(self, simbolos=None):
+        if simbolos:
+            return list(simbolos)
+        return list(
+            AccionInternacional.objects.filter(activo=True).order_by('simbolo').values_list('simbolo', flat=True)
+        )
+    
+    def obtener_retornos_universo(self, simbolos=None, dias=90, tipos_dolar=None):
+        """
+        Retornos diarios alineados por fecha: una columna por símbolo y una por tipo de dólar.
+        
+        Sin `simbolos` toma todas las acciones activas y sin `tipos_dolar`
+        todos los tipos de SERIES_DOLAR. Cada retorno es contra
+        la observación anterior de la misma serie, así un feriado de un
+        mercado no le quita fechas a las demás; queda NaN donde una serie no
+        tuvo dato. Devuelve None si no hay ninguna serie.
+        """
+        simbolos = self._simbolos_universo(simbolos)
+        panel = self.obtener_panel(simbolos, dias) if simbolos else None
+        partes = [panel['cierre']] if panel is not None else []
+        
+        tipos = list(SERIES_DOLAR) if tipos_dolar is None else list(tipos_dolar)
+        cotizaciones = list(
+            Cotizacion.objects.filter(tipo__in=tipos, fecha__gte=self.hoy - timedelta(days=dias))
+            .values_list('fecha', 'tipo', 'venta')
+        ) if tipos else []
+        if cotizaciones:
+            dolares = pd.DataFrame(cotizaciones, columns=['fecha', 'tipo', 'venta']).pivot(
+                index='fecha', columns='tipo', values='venta'
+            )
+            orden = [tipo for tipo in tipos if tipo in dolares.columns]
+            partes.append(dolares[orden].astype('float64').rename(columns=SERIES_DOLAR))
+        
+        if not partes:
+            return None
+        precios = pd.concat(partes, axis=1).sort_index()
+        precios.columns = pd.Index(list(precios.columns), name='serie')
+        return precios.ffill().pct_change(fill_method=None).where(precios.notna())
+    
+    @cacheado(fuentes_correlacion)
+    def calcular_matriz_correlacion(self, simbolos=None, dias=90):
+        """Correlación de retornos diarios entre todas las series del universo (DataFrame serie x serie)"""
+        retornos = self.obtener_retornos_universo(simbolos, dias)
+        if retornos is None:
+            return None
+        return pd.DataFrame(matriz_correlacion(retornos.to_numpy()), index=retornos.columns, columns=retornos.columns)
+    
+    @cacheado(fuentes_correlacion)
+    def calcular_correlacion_movil(self, referencia='dolar_blue', simbolos=None, dias=180, ventana=30):
+        """
+        Correlación de cada serie con `referencia` sobre las últimas `ventana` fechas.
+        
+        DataFrame fecha x serie; la ventana cuenta fechas del índice combinado
+        y cada par usa las que tienen dato en ambas series.
+        """
+        retornos = self.obtener_retornos_universo(simbolos, dias)
+        if retornos is None or referencia not in retornos.columns:
+            return None
+        movil = correlacion_movil(retornos.to_numpy(), retornos[[referencia]].to_numpy(), ventana)[:, :, 0]
+        return pd.DataFrame(movil, index=retornos.index, columns=retornos.columns).drop(columns=referencia)
+    
+    @cacheado(fuentes_correlacion)
+    def calcular_correlaciones_rezagadas(self, referencia='dolar_blue', simbolos=None, dias=90, rezagos=5):
+        """
+        Correlación de cada serie con `referencia` desplazada 0..`rezagos` fechas hacia atrás.
+        
+        DataFrame rezago x serie: la fila k compara el retorno de la serie en t
+        con el de `referencia` en t - k (k > 0: la referencia se adelanta).
+        """
+        retornos = self.obtener_retornos_universo(simbolos, dias)
+        if retornos is None or referencia not in retornos.columns:
+            return None
+        desplazamientos = list(range(rezagos + 1))
+        rezagadas = correlacion_rezagada(retornos.to_numpy(), retornos[[referencia]].to_numpy(), desplazamientos)
+        return pd.DataFrame(
+            rezagadas[:, :, 0],
+            index=pd.Index(desplazamientos, name='rezago'),
+            columns=retornos.columns
+        ).drop(columns=referencia)
+    
+    def tabla_correlaciones_dolar(self, simbolos, dias=90):
+        """Correlación de cada símbolo con cada tipo de dólar, lista para una tabla"""
+        matriz = self.calcular_matriz_correlacion(dias=dias)
+        filas = []
+        if matriz is None:
+            return filas
+        for simbolo in simbolos:
+            if simbolo not in matriz.index:
+                continue
+            fila = {'simbolo': simbolo}
+            for tipo, serie in SERIES_DOLAR.items():
+                valor = matriz.loc[simbolo, serie] if serie in matriz.columns else np.nan
+                fila[tipo] = None if np.isnan(valor) else round(float(valor), 2)
+            filas.append(fila)
+        return filas
+    
+    @cacheado(fuentes_correlacion)
+    def generar_grafico_heatmap_correlacion(self, simbolos=None, dias=90):
+        """Genera heatmap de la matriz de correlación de retornos del universo"""
+        matriz = self.calcular_matriz_correlacion(simbolos, dias)
+        if matriz is None or matriz.isna().all().all():
             return None
+        
+        etiquetas = [ETIQUETAS_SERIES.get(serie, serie) for serie in matriz.columns]
+        valores = matriz.to_numpy()
+        fig = go.Figure(data=go.Heatmap(
+            z=np.where(np.isnan(valores), None, valores).tolist(),
+            x=etiquetas,
+            y=etiquetas,
+            colorscale='RdBu',
+            zmid=0,
+            zmin=-1,
+            zmax=1,
+            text=[['' if np.isnan(v) else f"{v:.2f}" for v in fila] for fila in valores],
+            texttemplate='%{text}',
+            textfont={"size": 9}
+        ))
+        
+        fig.update_layout(
+            title=f'Correlación de Retornos Diarios (Últimos {dias} días)',
+            height=max(400, 30 * len(etiquetas)),
+            template='plotly_white'
+        )
+        
+        return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    
+    @cacheado(fuentes_correlacion)
+    def generar_grafico_correlacion_movil(self, referencia='dolar_blue', simbolos=None, dias=180, ventana=30):
+        """Genera gráfico de la correlación móvil de cada serie con `referencia`"""
+        movil = self.calcular_correlacion_movil(referencia, simbolos, dias, ventana)
+        if movil is None:
+            return None
+        movil = movil.dropna(how='all').dropna(axis=1, how='all')
+        if movil.empty:
+            return None
+        
+        fig = go.Figure()
+        for serie, valores in movil.items():
+            fig.add_trace(go.Scatter(
+                x=movil.index,
+                y=valores,
+                mode='lines',
+                name=ETIQUETAS_SERIES.get(serie, serie),
+                connectgaps=True
+            ))
+        
+        fig.update_layout(
+            title=f'Correlación Móvil ({ventana} fechas) con {ETIQUETAS_SERIES.get(referencia, referencia)}',
+            xaxis_title='Fecha',
+            yaxis_title='Correlación',
+            yaxis_range=[-1, 1],
+            template='plotly_white',
+            hovermode='x unified',
+            height=400
+        )
+        
+        return fig.to_html(full_html=False, include_plotlyjs='cdn')
+    
+    @cacheado()
+    def generar_grafico_heatmap_rendimientos(self, simbolos, dias=5):
+        """Genera heatmap de rendimientos diarios"""
+        datos_heatmap = []
+        fechas = []
+        panel = self.obtener_panel(simbolos, dias)
+        cierres_panel = panel['cierre'] if panel is not None else {}
+        
+        for simbolo, cierres in cierres_panel.items():
+            cierres = cierres.dropna()
+            if not cierres.empty:
+                # Calcular rendimientos diarios
+                rendimientos = cierres.pct_change().dropna() * 100
+        
+                if not fechas:
+                    fechas = [f.strftime('%d/%m') for f in rendimientos.index]
+        
+                datos_heatmap.append({
+                    'simbolo': simbolo,
+                    'rendimientos': rendimientos.values.tolist()
+                })
+        
+        if not datos_heatmap:
+            return None
+        
+        # Crear heatmap
+        fig = go.Figure(data=go.Heatmap(
+            z=[d['rendimientos'] for d in datos_heatmap],
+            x=fechas,
+            y=[d['simbolo'] for d in datos_heatmap],
+            colorscale='RdYlGn',
+            zmid=0,
+            text=[[f"{v:.1f}%" for v in d['rendimientos']] for d in datos_heatmap],
+            texttemplate='%{text}',
+            textfont={"size": 10}
+        ))
+        
+        fig.update_layout(
+            title=f'Heatmap de Rendimientos Diarios (Últimos {dias} días)',
+            xaxis_title='Fecha',
+            yaxis_title='Símbolo',
+            height=300,
+            template='plotly_white'
+        )
+        
+        return fig.to_html(full_html=False, include_plotlyjs='cdn')
+
+
+# Indicadores técnicos vectorizados
+#
+# Trabajan sobre matrices fechas x símbolos (por ejemplo panel['cierre'].to_numpy())
+# y calculan todo el universo a la vez: las operaciones recorren las fechas
+# y cada paso opera sobre todos los símbolos juntos. NaN significa que el
+# símbolo no cotizó ese día; ver _sobre_observaciones.
+
+def _sobre_observaciones(calculo, *matrices):
+    """
+    Aplica `calculo` a las observaciones válidas de cada columna como si no hubiera huecos.
+    
+    Un día sin dato (NaN en cualquiera de las matrices) no corta la serie de
+    un símbolo: sus filas válidas se suben al principio de la columna (en
+    orden), `calculo` trabaja sobre ese bloque contiguo con los NaN al final,
+    y cada resultado vuelve a su fecha original. Los días sin dato quedan en
+    NaN. Acepta también vectores de un solo símbolo.
+    """
+    matrices = [np.asarray(matriz, dtype='f8') for matriz in matrices]
+    vector = matrices[0].ndim == 1
+    if vector:
+        matrices = [matriz[:, np.newaxis] for matriz in matrices]
+    
+    validos = np.logical_and.reduce([np.isfinite(matriz) for matriz in matrices])
+    filas, ancho = validos.shape
+    completo = validos.all()
+    
+    if completo:
+        compactas = matrices
+    else:
+        # Posición (aplanada) de destino de cada celda: las válidas en orden y los huecos detrás
+        cantidad = validos.sum(axis=0)
+        destino = np.where(validos, np.cumsum(validos, axis=0) - 1, cantidad + np.cumsum(~validos, axis=0) - 1)
+        destino = (destino * ancho + np.arange(ancho)).ravel()
+        compactas = []
+        for matriz in matrices:
+            compacta = np.empty(filas * ancho)
+            compacta[destino] = np.where(validos, matriz, np.nan).ravel()
+            compactas.append(compacta.reshape(filas, ancho))
+    
+    resultados = calculo(*compactas)
+    unico = isinstance(resultados, np.ndarray)
+    salidas = []
+    for salida in ((resultados,) if unico else resultados):
+        if not completo:
+            salida = np.where(validos, salida.ravel().take(destino).reshape(filas, ancho), np.nan)
+        salidas.append(salida[:, 0] if vector else salida)
+    return salidas[0] if unico else tuple(salidas)
+
+
+def _suma_movil(valores, ventana):
+    """Suma de cada ventana de `ventana` filas por diferencia de sumas acumuladas"""
+    acumulado = np.cumsum(valores, axis=0)
+    suma = np.full(valores.shape, np.nan)
+    if len(valores) >= ventana:
+        suma[ventana - 1:] = acumulado[ventana - 1:]
+        suma[ventana:] -= acumulado[:-ventana]
+    return suma
+
+
+def _media_simple(valores, ventana):
+    return _suma_movil(valores, ventana) / ventana
+
+
+def _suavizado(valores, alfa, minimo):
+    """Media exponencial sin ajuste (s = s + alfa * (x - s)) que arranca en el primer valor"""
+    salida = np.empty(valores.shape)
+    if len(valores):
+        salida[0] = valores[0]
+        for fila in range(1, len(valores)):
+            salida[fila] = salida[fila - 1] + alfa * (valores[fila] - salida[fila - 1])
+    salida[:minimo - 1] = np.nan
+    return salida
+
+
+def _diferencias(valores):
+    """Cambio contra la observación anterior; la primera fila queda en NaN"""
+    cambios = np.full(valores.shape, np.nan)
+    cambios[1:] = valores[1:] - valores[:-1]
+    return cambios
+
+
+def _rsi(cierres, periodos):
+    cambios = _diferencias(cierres)[1:]
+    ganancias = _suavizado(np.clip(cambios, 0, None), 1 / periodos, periodos)
+    perdidas = _suavizado(-np.clip(cambios, None, 0), 1 / periodos, periodos)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(perdidas == 0, 100.0, 100 - 100 / (1 + ganancias / perdidas))
+    rsi[np.isnan(ganancias)] = np.nan
+    return np.concatenate([np.full((1,) + cierres.shape[1:], np.nan), rsi])
+
+
+def _macd(cierres, rapida, lenta, senal):
+    linea = _suavizado(cierres, 2 / (rapida + 1), lenta) - _suavizado(cierres, 2 / (lenta + 1), lenta)
+    # La señal arranca con la primera fila válida de la línea
+    linea_senal = np.full(cierres.shape, np.nan)
+    linea_senal[lenta - 1:] = _suavizado(linea[lenta - 1:], 2 / (senal + 1), senal)
+    return linea, linea_senal, linea - linea_senal
+
+
+def _bollinger(cierres, ventana, desvios):
+    # Centrar en el primer cierre evita la cancelación de E[x²] - E[x]² con precios altos
+    centrados = cierres - cierres[:1]
+    media = _media_simple(centrados, ventana)
+    desvio = np.sqrt(np.clip(_media_simple(centrados ** 2, ventana) - media ** 2, 0, None))
+    media = media + cierres[:1]
+    return media, media + desvios * desvio, media - desvios * desvio
+
+
+def _atr(maximos, minimos, cierres, periodos):
+    anterior = np.vstack([cierres[:1], cierres[:-1]])
+    rango = np.fmax(maximos - minimos, np.fmax(np.abs(maximos - anterior), np.abs(minimos - anterior)))
+    return _suavizado(rango, 1 / periodos, periodos)
+
+
+def _obv(cierres, volumenes):
+    return np.cumsum(np.nan_to_num(np.sign(_diferencias(cierres))) * volumenes, axis=0)
+
+
+def media_movil_simple(valores, ventana=20):
+    """Media de las últimas `ventana` observaciones de cada símbolo (NaN hasta tenerlas)"""
+    return _sobre_observaciones(lambda x: _media_simple(x, ventana), valores)
+
+
+def media_movil_exponencial(valores, ventana=20):
+    """Media exponencial con alpha = 2 / (ventana + 1); NaN hasta tener `ventana` observaciones"""
+    return _sobre_observaciones(lambda x: _suavizado(x, 2 / (ventana + 1), ventana), valores)
+
+
+def rsi(cierres, periodos=14):
+    """RSI con el suavizado de Wilder, igual que materializacion.rsi_wilder"""
+    return _sobre_observaciones(lambda x: _rsi(x, periodos), cierres)
+
+
+def macd(cierres, rapida=12, lenta=26, senal=9):
+    """(macd, señal, histograma): diferencia de medias exponenciales y su media de `senal` períodos"""
+    return _sobre_observaciones(lambda x: _macd(x, rapida, lenta, senal), cierres)
+
+
+def bandas_bollinger(cierres, ventana=20, desvios=2):
+    """(media, superior, inferior): media móvil ± `desvios` desvíos poblacionales de la ventana"""
+    return _sobre_observaciones(lambda x: _bollinger(x, ventana, desvios), cierres)
+
+
+def rango_verdadero_promedio(maximos, minimos, cierres, periodos=14):
+    """ATR: rango verdadero suavizado con Wilder (el primer día el rango es máximo - mínimo)"""
+    return _sobre_observaciones(lambda *x: _atr(*x, periodos), maximos, minimos, cierres)
+
+
+def volumen_en_balance(cierres, volumenes):
+    """OBV: volumen acumulado con el signo del cambio de cierre, desde 0 en la primera observación"""
+    return _sobre_observaciones(_obv, cierres, volumenes)
+
+
+NOMBRES_INDICADORES = [
+    'media_movil_20', 'media_exponencial_20', 'rsi', 'macd', 'macd_senal', 'macd_histograma',
+    'bollinger_superior', 'bollinger_inferior', 'atr', 'obv',
+]
+
+
+def indicadores_tecnicos(maximos, minimos, cierres, volumenes):
+    """
+    Todos los indicadores técnicos del universo: {nombre: matriz fechas x símbolos}.
+    
+    Compacta las matrices una sola vez para todos los indicadores; un día
+    cuenta como hueco si falta cualquiera de los cuatro datos.
+    """
+    def calculo(alto, bajo, cierre, volumen):
+        return (
+            _media_simple(cierre, 20),
+            _suavizado(cierre, 2 / 21, 20),
+            _rsi(cierre, 14),
+            *_macd(cierre, 12, 26, 9),
+            *_bollinger(cierre, 20, 2)[1:],
+            _atr(alto, bajo, cierre, 14),
+            _obv(cierre, volumen),
+        )
+    return dict(zip(NOMBRES_INDICADORES, _sobre_observaciones(calculo, maximos, minimos, cierres, volumenes)))
+
+
+def _agregar_retorno_diario(df):
+    """Agrega el retorno intradía (cierre vs apertura), igual que PrecioAccion.retorno_diario()"""
+    apertura = df['apertura'].to_numpy()
+    cierre = df['cierre'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['retorno_diario'] = np.where(apertura > 0, (cierre - apertura) / apertura * 100, 0.0)
+    return df
+
+
+def _metricas_de_simbolo(simbolo, df, extras):
+    """Tarea del pool de generar_tabla_metricas_paralela"""
+    return AnalizadorMercadoInternacional._metricas_desde_dataframe(simbolo, _agregar_retorno_diario(df))
 
 
 # Funciones helper rápidas
-def obtener_resumen_mercado(dias=7):
+def obtener_resumen_mercado(dias=7, analizador=None):
     """Obtiene resumen rápido del mercado internacional"""
-    analizador = AnalizadorMercadoInternacional()
+    analizador = analizador or AnalizadorMercadoInternacional()
     
     # Símbolos principales
     simbolos_principales = ['AAPL', 'MSFT', 'SPY', 'QQQ']
     
-    resumen = []
-    for simbolo in simbolos_principales:
-        metricas = analizador.calcular_metricas_basicas(simbolo, dias)
-        if metricas:
-            resumen.append(metricas)
-    
-    return resumen
+    return analizador.generar_tabla_metricas(simbolos_principales, dias)
 
 
-def generar_grafico_heatmap_rendimientos(simbolos, dias=5):
+def generar_grafico_heatmap_rendimientos(simbolos, dias=5, analizador=None):
     """Genera heatmap de rendimientos diarios"""
-    datos_heatmap = []
-    fechas = []
-    
-    for simbolo in simbolos:
-        df = AnalizadorMercadoInternacional().obtener_datos_dataframe(simbolo, dias)
-        if df is not None and not df.empty:
-            # Calcular rendimientos diarios
-            rendimientos = df['cierre'].pct_change().dropna() * 100
-            
-            if not fechas:
-                fechas = [f.strftime('%d/%m') for f in rendimientos.index]
-            
-            datos_heatmap.append({
-                'simbolo': simbolo,
-                'rendimientos': rendimientos.values.tolist()
-            })
-    
-    if not datos_heatmap:
-        return None
-    
-    # Crear heatmap
-    fig = go.Figure(data=go.Heatmap(
-        z=[d['rendimientos'] for d in datos_heatmap],
-        x=fechas,
-        y=[d['simbolo'] for d in datos_heatmap],
-        colorscale='RdYlGn',
-        zmid=0,
-        text=[[f"{v:.1f}%" for v in d['rendimientos']] for d in datos_heatmap],
-        texttemplate='%{text}',
-        textfont={"size": 10}
-    ))
-    
-    fig.update_layout(
-        title=f'Heatmap de Rendimientos Diarios (Últimos {dias} días)',
-        xaxis_title='Fecha',
-        yaxis_title='Símbolo',
-        height=300,
-        template='plotly_white'
-    )
-    
-    return fig.to_html(full_html=False, include_plotlyjs='cdn')
\ No newline at end of file
+    analizador = analizador or AnalizadorMercadoInternacional()
+    return analizador.generar_grafico_heatmap_rendimientos(simbolos, dias)
@@ -0,0 +1,119 @@
+import functools
+import hashlib
+import inspect
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import AccionInternacional, Cotizacion, EstadoIngesta
+
+
+# Alias de CACHES donde se guardan métricas y gráficos
+ALIAS_CACHE = 'analitica'
+
+_AUSENTE = object()
+
+_estadisticas = {'aciertos': 0, 'fallos': 0}
+_lock_estadisticas = threading.Lock()
+
+
+def _contar(campo):
+    with _lock_estadisticas:
+        _estadisticas[campo] += 1
+
+
+def estadisticas_cache():
+    """Aciertos, fallos y tasa de aciertos de la cache de analítica en este proceso"""
+    with _lock_estadisticas:
+        aciertos, fallos = _estadisticas['aciertos'], _estadisticas['fallos']
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total * 100, 1) if total else None,
+    }
+
+
+def versiones_datos(claves, contexto=None):
+    """
+    {clave: versión} de EstadoIngesta en una consulta (0 si la fuente nunca se escribió).
+
+    Con un ContextoDatos las versiones se leen una sola vez por request.
+    """
+    memoria = contexto.versiones if contexto is not None else {}
+    faltantes = [clave for clave in claves if clave not in memoria]
+    if faltantes:
+        leidas = dict(EstadoIngesta.objects.filter(clave__in=faltantes).values_list('clave', 'version'))
+        for clave in faltantes:
+            memoria[clave] = leidas.get(clave, 0)
+    return {clave: memoria[clave] for clave in claves}
+
+
+def fuentes_precios(argumentos):
+    """Claves de EstadoIngesta de los símbolos de `simbolo` o `simbolos`"""
+    simbolos = argumentos.get('simbolos') or [argumentos['simbolo']]
+    return [f'precios:{simbolo}' for simbolo in simbolos]
+
+
+def fuentes_correlacion(argumentos):
+    """Precios de los símbolos pedidos (o de todos los activos) y las cotizaciones de cada tipo de dólar"""
+    simbolos = argumentos.get('simbolos') or AccionInternacional.objects.filter(activo=True).values_list(
+        'simbolo', flat=True
+    )
+    return [f'precios:{simbolo}' for simbolo in simbolos] + [
+        f'cotizaciones:{tipo}' for tipo, _ in Cotizacion.TIPOS_DOLAR
+    ]
+
+
+def fuentes_correlacion_blue(argumentos):
+    """Precios de `simbolo` y las cotizaciones del dólar blue"""
+    return [f"precios:{argumentos['simbolo']}", 'cotizaciones:blue']
+
+
+def cacheado(fuentes=fuentes_precios):
+    """
+    Cachea el resultado de un método de AnalizadorMercadoInternacional.
+
+    La clave combina el método, sus argumentos, la fecha de hoy (las ventanas
+    son relativas a ella) y la versión de cada fuente de datos de la que
+    depende según `fuentes(argumentos)`. Como la ingesta sube esas versiones
+    al escribir, una entrada nunca queda desactualizada y no hace falta TTL:
+    las viejas simplemente dejan de pedirse y el límite de entradas de la
+    cache las desaloja.
+    """
+    def decorador(metodo):
+        firma = inspect.signature(metodo)
+
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            if not getattr(settings, 'ANALITICA_CACHE_ACTIVA', True):
+                return metodo(self, *args, **kwargs)
+
+            argumentos = firma.bind(self, *args, **kwargs)
+            argumentos.apply_defaults()
+            argumentos = dict(list(argumentos.arguments.items())[1:])
+
+            versiones = versiones_datos(fuentes(argumentos), getattr(self, 'contexto', None))
+            identidad = repr((
+                metodo.__qualname__,
+                sorted((nombre, tuple(valor) if isinstance(valor, list) else valor)
+                       for nombre, valor in argumentos.items()),
+                self.hoy.isoformat(),
+                sorted(versiones.items()),
+            ))
+            clave = 'analitica:' + hashlib.sha256(identidad.encode('utf-8')).hexdigest()
+
+            cache = caches[ALIAS_CACHE]
+            resultado = cache.get(clave, _AUSENTE)
+            if resultado is not _AUSENTE:
+                _contar('aciertos')
+                return resultado
+
+            _contar('fallos')
+            resultado = metodo(self, *args, **kwargs)
+            cache.set(clave, resultado, timeout=None)
+            return resultado
+
+        return envoltura
+    return decorador
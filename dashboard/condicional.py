@@ -0,0 +1,117 @@
+import hashlib
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from .models import AccionInternacional, EstadoIngesta, ResumenDashboard
+
+
+def _firma(*partes):
+    return hashlib.sha1(repr(partes).encode('utf-8')).hexdigest()
+
+
+def _inicio_de_hoy():
+    """Medianoche local de hoy: las páginas con ventanas relativas a hoy cambian a esa hora"""
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def _versiones(*prefijos):
+    """Suma de versiones, cantidad de fuentes y última escritura de EstadoIngesta bajo `prefijos`"""
+    filtro = Q()
+    for prefijo in prefijos:
+        filtro |= Q(clave__startswith=prefijo)
+    return EstadoIngesta.objects.filter(filtro).aggregate(
+        version=Sum('version'), fuentes=Count('id'), ultima=Max('ultima_escritura')
+    )
+
+
+def _simbolos_activos():
+    return tuple(AccionInternacional.objects.filter(activo=True).order_by('simbolo').values_list('simbolo', flat=True))
+
+
+def _mas_reciente(*momentos):
+    return max(momento for momento in momentos if momento is not None)
+
+
+def validar_dashboard(request):
+    """Resumen precalculado, precios, cotizaciones y métricas de la ingesta, y la fecha de hoy"""
+    resumen = ResumenDashboard.objects.values_list('actualizado', flat=True).first()
+    versiones = _versiones('precios:', 'cotizaciones:', 'metricas:')
+    hoy = _inicio_de_hoy()
+    return (
+        _firma('dashboard', resumen, versiones, _simbolos_activos(), hoy),
+        _mas_reciente(resumen, versiones['ultima'], hoy),
+    )
+
+
+def validar_mercado_internacional(request):
+    """Precios y métricas de la ingesta, el universo de acciones y la fecha de hoy"""
+    versiones = _versiones('precios:', 'metricas:')
+    acciones = AccionInternacional.objects.aggregate(total=Count('id'), ultima=Max('fecha_creacion'))
+    hoy = _inicio_de_hoy()
+    return (
+        _firma('mercado_internacional', versiones, acciones, _simbolos_activos(), hoy),
+        _mas_reciente(versiones['ultima'], acciones['ultima'], hoy),
+    )
+
+
+def validar_correlaciones(request):
+    """Precios y cotizaciones de la ingesta, las acciones activas y la fecha de hoy"""
+    versiones = _versiones('precios:', 'cotizaciones:')
+    hoy = _inicio_de_hoy()
+    return (
+        _firma('correlaciones', versiones, _simbolos_activos(), hoy),
+        _mas_reciente(versiones['ultima'], hoy),
+    )
+
+
+def validar_tabla(prefijo):
+    """
+    Validador de un listado: versiones de EstadoIngesta bajo `prefijo`.
+
+    La ingesta y limpiar_datos_antiguos suben esas versiones al escribir o
+    borrar filas, así que alcanza con leerlas en lugar de recorrer la tabla.
+    """
+    def validar(request):
+        versiones = _versiones(prefijo)
+        return _firma('tabla', prefijo, versiones), versiones['ultima']
+    return validar
+
+
+def _validacion(request, validador):
+    """(etag, last_modified) de `validador`, calculado una sola vez por request"""
+    if not getattr(settings, 'GET_CONDICIONAL_ACTIVO', True):
+        return None, None
+    validaciones = request.__dict__.setdefault('_validaciones', {})
+    if validador not in validaciones:
+        etag, ultima = validador(request)
+        # El token CSRF de los formularios de la página depende de la cookie
+        cookie_csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        validaciones[validador] = (_firma(etag, cookie_csrf), ultima)
+    return validaciones[validador]
+
+
+def condicional(validador):
+    """
+    Decorador de vista: GET condicional con el ETag y Last-Modified de `validador(request)`.
+
+    El validador lee solo versiones y marcas de tiempo (EstadoIngesta,
+    `actualizado`, cantidades), así que si el cliente ya tiene la página se
+    responde 304 sin correr la analítica ni armar los gráficos. Las
+    respuestas van con Cache-Control: no-cache para que el navegador
+    revalide en cada recarga en vez de usar la copia sin preguntar.
+    """
+    def etag(request, *args, **kwargs):
+        return _validacion(request, validador)[0]
+
+    def ultima_modificacion(request, *args, **kwargs):
+        return _validacion(request, validador)[1]
+
+    def decorador(vista):
+        vista = condition(etag_func=etag, last_modified_func=ultima_modificacion)(vista)
+        return cache_control(no_cache=True)(vista)
+    return decorador
@@ -0,0 +1,102 @@
+import numpy as np
+
+
+# Mínimo de fechas en común para informar una correlación
+MINIMO_OBSERVACIONES = 5
+
+
+def _correlacion(n, suma_a, suma_b, cuadrados_a, cuadrados_b, productos, minimo):
+    """Pearson a partir de las sumas de cada par; NaN con pocas observaciones o series constantes"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covarianza = n * productos - suma_a * suma_b
+        varianza_a = n * cuadrados_a - suma_a ** 2
+        varianza_b = n * cuadrados_b - suma_b ** 2
+        correlacion = covarianza / np.sqrt(varianza_a * varianza_b)
+    correlacion[(n < minimo) | (varianza_a <= 0) | (varianza_b <= 0)] = np.nan
+    return np.clip(correlacion, -1, 1)
+
+
+def _preparar(matriz):
+    """(valores con 0 en los huecos, 1.0 donde hay dato)"""
+    matriz = np.asarray(matriz, dtype='f8')
+    validos = np.isfinite(matriz)
+    return np.where(validos, matriz, 0.0), validos.astype('f8')
+
+
+def correlacion_cruzada(a, b, minimo=MINIMO_OBSERVACIONES):
+    """
+    Correlación de cada columna de `a` con cada columna de `b` (filas = fechas).
+
+    Cada par usa solo las fechas en que ambas series tienen dato (NaN = sin
+    dato), así que una serie con huecos no recorta a las demás. Todas las
+    sumas por par salen de productos de matrices: el costo no depende de
+    recorrer los pares en Python.
+    """
+    valores_a, pesos_a = _preparar(a)
+    valores_b, pesos_b = _preparar(b)
+    return _correlacion(
+        pesos_a.T @ pesos_b,
+        valores_a.T @ pesos_b,
+        pesos_a.T @ valores_b,
+        (valores_a ** 2).T @ pesos_b,
+        pesos_a.T @ valores_b ** 2,
+        valores_a.T @ valores_b,
+        minimo
+    )
+
+
+def matriz_correlacion(retornos, minimo=MINIMO_OBSERVACIONES):
+    """Matriz de correlación completa entre las columnas de `retornos`"""
+    correlacion = correlacion_cruzada(retornos, retornos, minimo)
+    diagonal = np.diag_indices_from(correlacion)
+    correlacion[diagonal] = np.where(np.isnan(correlacion[diagonal]), np.nan, 1.0)
+    return correlacion
+
+
+def correlacion_movil(a, b, ventana, minimo=MINIMO_OBSERVACIONES):
+    """
+    Correlación cruzada sobre las últimas `ventana` filas, para cada fila.
+
+    Devuelve un arreglo fechas x columnas de `a` x columnas de `b`. Las sumas
+    por par se acumulan a lo largo de las fechas y cada ventana es la
+    diferencia de dos acumulados, sin recalcularla desde cero.
+    """
+    valores_a, pesos_a = _preparar(a)
+    valores_b, pesos_b = _preparar(b)
+
+    def movil(izquierda, derecha):
+        acumulado = np.cumsum(np.einsum('ti,tj->tij', izquierda, derecha), axis=0)
+        suma = acumulado.copy()
+        suma[ventana:] -= acumulado[:-ventana]
+        return suma
+
+    return _correlacion(
+        movil(pesos_a, pesos_b),
+        movil(valores_a, pesos_b),
+        movil(pesos_a, valores_b),
+        movil(valores_a ** 2, pesos_b),
+        movil(pesos_a, valores_b ** 2),
+        movil(valores_a, valores_b),
+        minimo
+    )
+
+
+def correlacion_rezagada(a, b, rezagos, minimo=MINIMO_OBSERVACIONES):
+    """
+    Correlación de `a` en t con `b` en t - k para cada k de `rezagos`.
+
+    Devuelve un arreglo rezagos x columnas de `a` x columnas de `b`. Con k > 0
+    mide si `b` anticipa a `a`; con k < 0, lo contrario.
+    """
+    a = np.asarray(a, dtype='f8')
+    b = np.asarray(b, dtype='f8')
+    filas = len(a)
+    resultado = np.full((len(rezagos), a.shape[1], b.shape[1]), np.nan)
+    for posicion, rezago in enumerate(rezagos):
+        if abs(rezago) >= filas:
+            continue
+        if rezago >= 0:
+            resultado[posicion] = correlacion_cruzada(a[rezago:], b[:filas - rezago], minimo)
+        else:
+            resultado[posicion] = correlacion_cruzada(a[:filas + rezago], b[-rezago:], minimo)
+    return resultado
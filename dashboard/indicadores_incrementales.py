@@ -0,0 +1,325 @@
+import math
+from collections import deque
+from datetime import date, timedelta
+
+
+PERIODOS_RSI = 14
+VENTANA_VOLATILIDAD_DIARIA = 20
+DIAS_52_SEMANAS = 365
+DIAS_CORRELACION = 30
+FACTOR_ANUAL = math.sqrt(252)
+
+
+class SumaMovil:
+    """Media de los últimos `n` valores con una suma acumulada: O(1) por valor"""
+
+    def __init__(self, n, valores=()):
+        self.n = n
+        self.valores = deque(valores)
+        self.suma = sum(self.valores)
+
+    def agregar(self, valor):
+        self.valores.append(valor)
+        self.suma += valor
+        if len(self.valores) > self.n:
+            self.suma -= self.valores.popleft()
+
+    def media(self, minimo=None):
+        if len(self.valores) < (self.n if minimo is None else minimo):
+            return None
+        return self.suma / len(self.valores)
+
+    def a_dict(self):
+        return list(self.valores)
+
+
+class WelfordMovil:
+    """
+    Varianza muestral de los últimos `n` valores (o de todos si n es None).
+
+    Algoritmo de Welford con baja de valores: agregar y quitar son O(1) y
+    numéricamente estables, sin volver a recorrer la ventana.
+    """
+
+    def __init__(self, n=None, valores=()):
+        self.n = n
+        self.valores = deque()
+        self.cantidad = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        for valor in valores:
+            self.agregar(valor)
+
+    def agregar(self, valor):
+        self.cantidad += 1
+        delta = valor - self.media
+        self.media += delta / self.cantidad
+        self.m2 += delta * (valor - self.media)
+        if self.n is not None:
+            self.valores.append(valor)
+            if len(self.valores) > self.n:
+                self._quitar(self.valores.popleft())
+
+    def _quitar(self, valor):
+        media_anterior = self.media
+        self.cantidad -= 1
+        self.media -= (valor - media_anterior) / self.cantidad
+        self.m2 -= (valor - media_anterior) * (valor - self.media)
+
+    def desvio(self):
+        if self.cantidad < 2:
+            return None
+        return math.sqrt(max(self.m2, 0.0) / (self.cantidad - 1))
+
+    def a_dict(self):
+        if self.n is not None:
+            return {'valores': list(self.valores)}
+        return {'cantidad': self.cantidad, 'media': self.media, 'm2': self.m2}
+
+    @classmethod
+    def desde_dict(cls, n, datos):
+        if n is not None:
+            return cls(n, datos['valores'])
+        welford = cls()
+        welford.cantidad, welford.media, welford.m2 = datos['cantidad'], datos['media'], datos['m2']
+        return welford
+
+
+class PromedioWilder:
+    """Medias de ganancias y pérdidas con el suavizado de Wilder, para el RSI"""
+
+    def __init__(self, periodos=PERIODOS_RSI, ganancia=0.0, perdida=0.0, cantidad=0):
+        self.periodos = periodos
+        self.ganancia = ganancia
+        self.perdida = perdida
+        self.cantidad = cantidad
+
+    def _siguiente(self, cambio):
+        ganancia, perdida = max(cambio, 0.0), max(-cambio, 0.0)
+        if self.cantidad == 0:
+            return ganancia, perdida, 1
+        alpha = 1 / self.periodos
+        return (
+            self.ganancia + alpha * (ganancia - self.ganancia),
+            self.perdida + alpha * (perdida - self.perdida),
+            self.cantidad + 1,
+        )
+
+    def agregar(self, cambio):
+        self.ganancia, self.perdida, self.cantidad = self._siguiente(cambio)
+
+    def rsi(self, cambio_pendiente=None):
+        """RSI actual; con `cambio_pendiente`, el que resultaría de agregarlo (sin agregarlo)"""
+        ganancia, perdida, cantidad = self.ganancia, self.perdida, self.cantidad
+        if cambio_pendiente is not None:
+            ganancia, perdida, cantidad = self._siguiente(cambio_pendiente)
+        if cantidad < self.periodos:
+            return None
+        if perdida == 0:
+            return 100.0
+        return 100 - 100 / (1 + ganancia / perdida)
+
+    def a_dict(self):
+        return [self.ganancia, self.perdida, self.cantidad]
+
+
+class ExtremoMovil:
+    """
+    Máximo (o mínimo) de los valores de los últimos `dias` días corridos.
+
+    Deque monotónica de (fecha, valor): cada valor entra y sale una sola vez,
+    así que agregar es O(1) amortizado y el extremo está siempre al frente.
+    """
+
+    def __init__(self, dias, maximo=True, entradas=()):
+        self.dias = dias
+        self.maximo = maximo
+        self.entradas = deque(tuple(entrada) for entrada in entradas)
+
+    def agregar(self, ordinal, valor):
+        domina = (lambda a, b: a <= b) if self.maximo else (lambda a, b: a >= b)
+        while self.entradas and domina(self.entradas[-1][1], valor):
+            self.entradas.pop()
+        self.entradas.append((ordinal, valor))
+        while self.entradas[0][0] <= ordinal - self.dias:
+            self.entradas.popleft()
+
+    def valor(self):
+        return self.entradas[0][1] if self.entradas else None
+
+    def a_dict(self):
+        return [list(entrada) for entrada in self.entradas]
+
+
+def clave_barra(fecha, periodo):
+    """Identifica la barra W (semana que cierra el viernes) o M (mes) de una fecha"""
+    if periodo == 'W':
+        return (fecha + timedelta(days=(4 - fecha.weekday()) % 7)).toordinal()
+    return fecha.year * 12 + fecha.month
+
+
+class BarraAbierta:
+    """Acumuladores de la barra W/M en curso y RSI de las barras ya cerradas"""
+
+    def __init__(self, periodo, datos=None):
+        datos = datos or {}
+        self.periodo = periodo
+        self.clave = datos.get('clave')
+        self.cierre = datos.get('cierre')
+        self.cierre_anterior = datos.get('cierre_anterior')
+        self.retornos = WelfordMovil.desde_dict(None, datos['retornos']) if 'retornos' in datos else WelfordMovil()
+        self.volumen_suma = datos.get('volumen_suma', 0.0)
+        self.volumen_dias = datos.get('volumen_dias', 0)
+        self.wilder = PromedioWilder(PERIODOS_RSI, *datos.get('wilder', []))
+
+    def agregar(self, fecha, cierre, retorno_diario, volumen):
+        clave = clave_barra(fecha, self.periodo)
+        if clave != self.clave:
+            if self.clave is not None:
+                # La barra anterior queda cerrada: entra al RSI y su cierre es la base del retorno
+                if self.cierre_anterior is not None:
+                    self.wilder.agregar(self.cierre - self.cierre_anterior)
+                self.cierre_anterior = self.cierre
+            self.clave = clave
+            self.retornos = WelfordMovil()
+            self.volumen_suma = 0.0
+            self.volumen_dias = 0
+
+        self.cierre = cierre
+        if retorno_diario is not None:
+            self.retornos.agregar(retorno_diario)
+        self.volumen_suma += volumen
+        self.volumen_dias += 1
+
+    def metricas(self):
+        """Métricas de la barra en curso como si cerrara hoy, o None si aún no alcanzan"""
+        desvio = self.retornos.desvio()
+        if self.cierre_anterior is None or desvio is None:
+            return None
+        return {
+            'retorno': (self.cierre / self.cierre_anterior - 1) * 100,
+            'volatilidad': desvio * FACTOR_ANUAL,
+            'volumen_promedio': self.volumen_suma / self.volumen_dias,
+            'rsi': self.wilder.rsi(self.cierre - self.cierre_anterior),
+        }
+
+    def a_dict(self):
+        return {
+            'clave': self.clave,
+            'cierre': self.cierre,
+            'cierre_anterior': self.cierre_anterior,
+            'retornos': self.retornos.a_dict(),
+            'volumen_suma': self.volumen_suma,
+            'volumen_dias': self.volumen_dias,
+            'wilder': self.wilder.a_dict(),
+        }
+
+
+class EstadoRodante:
+    """
+    Estado de los indicadores de un símbolo, actualizable de a una barra diaria.
+
+    Reúne lo necesario para producir las filas D, W y M de MetricaAccion en
+    tiempo constante por día, sin releer la historia:
+    - sumas móviles para MA20, MA50 y el volumen promedio;
+    - Welford con baja para la volatilidad de 20 días;
+    - promedios de Wilder para el RSI diario y el de cada barra W/M;
+    - deques monotónicas para el máximo y el mínimo de 52 semanas;
+    - los retornos de los últimos 30 días para la correlación con el blue.
+
+    Se guarda como JSON (a_dict/desde_dict) en EstadoIndicadores. Los valores
+    coinciden con los de materializacion.calcular_metricas salvo redondeo de
+    punto flotante; ante backfills o correcciones se reconstruye desde cero.
+    """
+
+    def __init__(self, datos=None):
+        datos = datos or {}
+        self.fecha = date.fromordinal(datos['fecha']) if datos.get('fecha') else None
+        self.cierre = datos.get('cierre')
+        self.media_20 = SumaMovil(20, datos.get('media_20', ()))
+        self.media_50 = SumaMovil(50, datos.get('media_50', ()))
+        self.volumen = SumaMovil(VENTANA_VOLATILIDAD_DIARIA, datos.get('volumen', ()))
+        self.retornos = WelfordMovil(VENTANA_VOLATILIDAD_DIARIA, datos.get('retornos', {}).get('valores', ()))
+        self.wilder = PromedioWilder(PERIODOS_RSI, *datos.get('wilder', []))
+        self.maximo_52 = ExtremoMovil(DIAS_52_SEMANAS, True, datos.get('maximo_52', ()))
+        self.minimo_52 = ExtremoMovil(DIAS_52_SEMANAS, False, datos.get('minimo_52', ()))
+        self.retornos_recientes = deque(tuple(entrada) for entrada in datos.get('retornos_recientes', ()))
+        self.barras = {periodo: BarraAbierta(periodo, datos.get('barras', {}).get(periodo)) for periodo in ('W', 'M')}
+
+    def agregar(self, fecha, maximo, minimo, cierre, volumen):
+        """
+        Incorpora el día `fecha` (posterior al último) y devuelve {periodo: métricas}.
+
+        Las métricas W y M corresponden a la barra en curso, que termina hoy.
+        La correlación con el blue no se incluye: se calcula aparte con
+        retornos_ventana_correlacion().
+        """
+        if self.fecha is not None and fecha <= self.fecha:
+            raise ValueError(f'{fecha} no es posterior al último día incorporado ({self.fecha})')
+
+        retorno = (cierre / self.cierre - 1) * 100 if self.cierre else None
+        if retorno is not None:
+            self.retornos.agregar(retorno)
+            self.wilder.agregar(cierre - self.cierre)
+        self.media_20.agregar(cierre)
+        self.media_50.agregar(cierre)
+        self.volumen.agregar(volumen)
+
+        ordinal = fecha.toordinal()
+        self.maximo_52.agregar(ordinal, maximo)
+        self.minimo_52.agregar(ordinal, minimo)
+        if retorno is not None:
+            self.retornos_recientes.append((ordinal, retorno))
+        while self.retornos_recientes and self.retornos_recientes[0][0] <= ordinal - DIAS_CORRELACION:
+            self.retornos_recientes.popleft()
+
+        for barra in self.barras.values():
+            barra.agregar(fecha, cierre, retorno, volumen)
+
+        self.fecha = fecha
+        self.cierre = cierre
+
+        comunes = {
+            'media_movil_20': self.media_20.media(),
+            'media_movil_50': self.media_50.media(),
+            'maximo_52_semanas': self.maximo_52.valor(),
+            'minimo_52_semanas': self.minimo_52.valor(),
+        }
+        metricas = {}
+        desvio = self.retornos.desvio()
+        if retorno is not None and desvio is not None:
+            metricas['D'] = {
+                'retorno': retorno,
+                'volatilidad': desvio * FACTOR_ANUAL,
+                'volumen_promedio': self.volumen.media(minimo=1),
+                'rsi': self.wilder.rsi(),
+                **comunes,
+            }
+        for periodo, barra in self.barras.items():
+            de_barra = barra.metricas()
+            if de_barra is not None:
+                metricas[periodo] = {**de_barra, **comunes}
+        return metricas
+
+    def retornos_ventana_correlacion(self):
+        """{fecha: retorno diario %} de la ventana de correlación que termina en el último día"""
+        return {date.fromordinal(ordinal): retorno for ordinal, retorno in self.retornos_recientes}
+
+    def a_dict(self):
+        return {
+            'fecha': self.fecha.toordinal() if self.fecha else None,
+            'cierre': self.cierre,
+            'media_20': self.media_20.a_dict(),
+            'media_50': self.media_50.a_dict(),
+            'volumen': self.volumen.a_dict(),
+            'retornos': self.retornos.a_dict(),
+            'wilder': self.wilder.a_dict(),
+            'maximo_52': self.maximo_52.a_dict(),
+            'minimo_52': self.minimo_52.a_dict(),
+            'retornos_recientes': [list(entrada) for entrada in self.retornos_recientes],
+            'barras': {periodo: barra.a_dict() for periodo, barra in self.barras.items()},
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(datos)
@@ -27,7 +27,15 @@ class Command(BaseCommand):
         parser.add_argument(
             '--full',
             action='store_true',
-            help='Obtener historial completo (20+ años) en lugar de solo 100 días'
+            help='Descargar historial completo (20+ años) de todos los símbolos, '
+                 'en lugar de traer solo las fechas que faltan (los símbolos nuevos '
+                 'reciben los últimos 100 días)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=1,
+            help='Cantidad de descargas simultáneas (útil con API keys premium)'
         )
     
     def handle(self, *args, **options):
@@ -68,9 +76,14 @@ class Command(BaseCommand):
         # Obtener precios
         self.stdout.write('\n[1/1] Obteniendo precios diarios...')
         
+        if options['concurrency'] > 1:
+            self.stdout.write(f"Descargas simultáneas: {options['concurrency']}")
+        
         resultados = service.obtener_multiple_precios_diarios(
             simbolos_filtrados,
-            outputsize=outputsize
+            outputsize=outputsize,
+            concurrencia=options['concurrency'],
+            incremental=not options['full']
         )
         
         # Mostrar resumen
@@ -78,20 +91,31 @@ class Command(BaseCommand):
         self.stdout.write('RESUMEN DE ACTUALIZACIÓN')
         self.stdout.write('=' * 60)
         
-        total_precios = 0
+        totales = {'total': 0, 'insertados': 0, 'actualizados': 0, 'sin_cambios': 0}
         simbolos_exitosos = 0
         
-        for simbolo, count in resultados.items():
-            if count > 0:
-                self.stdout.write(self.style.SUCCESS(f'✓ {simbolo}: {count} precios actualizados'))
+        for simbolo, resultado in resultados.items():
+            if resultado and resultado.get('al_dia'):
+                self.stdout.write(self.style.SUCCESS(f'✓ {simbolo}: al día, sin descarga'))
+                simbolos_exitosos += 1
+            elif resultado and resultado['total'] > 0:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✓ {simbolo}: {resultado['total']} precios "
+                    f"({resultado['insertados']} nuevos, {resultado['actualizados']} actualizados, "
+                    f"{resultado['sin_cambios']} sin cambios)"
+                ))
                 simbolos_exitosos += 1
-                total_precios += count
+                for clave in totales:
+                    totales[clave] += resultado[clave]
             else:
                 self.stdout.write(self.style.ERROR(f'✗ {simbolo}: No se pudieron obtener datos'))
         
         self.stdout.write('\n' + '-' * 40)
         self.stdout.write(f"Total símbolos exitosos: {simbolos_exitosos}/{len(simbolos_filtrados)}")
-        self.stdout.write(f"Total precios obtenidos: {total_precios}")
+        self.stdout.write(f"Total precios obtenidos: {totales['total']}")
+        self.stdout.write(f"   • Nuevos: {totales['insertados']}")
+        self.stdout.write(f"   • Actualizados: {totales['actualizados']}")
+        self.stdout.write(f"   • Sin cambios (escrituras evitadas): {totales['sin_cambios']}")
         
         # Estadísticas generales
         total_acciones = AccionInternacional.objects.count()
@@ -0,0 +1,86 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.services.servicios_argentinos import BCRAMonetarioService
+
+
+class Command(BaseCommand):
+    help = 'Carga la historia de variables monetarias del BCRA en IndiceEconomico'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--variable',
+            type=str,
+            choices=list(BCRAMonetarioService.VARIABLES) + ['todas'],
+            default='todas',
+            help='Variable conocida a cargar'
+        )
+        parser.add_argument(
+            '--id',
+            type=int,
+            help='ID de una variable BCRA cualquiera (requiere --tipo y --unidad)'
+        )
+        parser.add_argument(
+            '--tipo',
+            type=str,
+            help='Tipo de IndiceEconomico con el que se guarda la variable de --id'
+        )
+        parser.add_argument(
+            '--unidad',
+            type=str,
+            help='Unidad de la variable de --id'
+        )
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Fecha inicial YYYY-MM-DD (por defecto, continúa desde la última ventana completa del backfill)'
+        )
+        parser.add_argument(
+            '--hasta',
+            type=str,
+            help='Fecha final YYYY-MM-DD (por defecto, hoy)'
+        )
+    
+    def handle(self, *args, **options):
+        self.stdout.write('=' * 60)
+        self.stdout.write('BACKFILL DE VARIABLES MONETARIAS BCRA')
+        self.stdout.write('=' * 60)
+        
+        desde = self._parsear_fecha(options['desde'])
+        hasta = self._parsear_fecha(options['hasta'])
+        servicio = BCRAMonetarioService()
+        
+        if options['id'] is not None:
+            if not options['tipo'] or not options['unidad']:
+                raise CommandError('--id requiere --tipo y --unidad')
+            variables = {options['tipo']: (options['id'], options['unidad'])}
+        elif options['variable'] == 'todas':
+            variables = BCRAMonetarioService.VARIABLES
+        else:
+            variables = {options['variable']: BCRAMonetarioService.VARIABLES[options['variable']]}
+        
+        total = 0
+        sin_cambios = 0
+        interrumpidas = []
+        for tipo, (variable_id, unidad) in variables.items():
+            resultado = servicio.backfill_variable(variable_id, tipo, unidad, desde=desde, hasta=hasta)
+            total += resultado['registros']
+            sin_cambios += resultado['sin_cambios']
+            if resultado['interrumpido']:
+                interrumpidas.append(tipo)
+        
+        if interrumpidas:
+            raise CommandError(
+                f'Backfill incompleto para {", ".join(interrumpidas)} ({total} registros cargados, '
+                f'{sin_cambios} sin cambios); volver a correrlo retoma desde la última ventana completa'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ Backfill completado: {total} registros ({sin_cambios} sin cambios, no reescritos)'
+        ))
+    
+    def _parsear_fecha(self, valor):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Fecha inválida: {valor} (usar YYYY-MM-DD)')
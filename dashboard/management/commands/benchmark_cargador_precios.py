@@ -0,0 +1,145 @@
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from dashboard.almacen_precios import AlmacenPrecios
+from dashboard.analytics import AnalizadorMercadoInternacional
+from dashboard.models import AccionInternacional, PrecioAccion
+
+
+SIMBOLO_BENCHMARK = '__BENCH__'
+
+
+class Rollback(Exception):
+    """Descarta los datos sintéticos al terminar"""
+
+
+def _cargar_con_instancias(simbolo, desde):
+    """Cargador anterior: una instancia de PrecioAccion y un dict por fila"""
+    precios = PrecioAccion.objects.filter(accion__simbolo=simbolo, fecha__gte=desde).order_by('fecha')
+    data = []
+    for precio in precios:
+        data.append({
+            'fecha': precio.fecha,
+            'apertura': float(precio.apertura),
+            'maximo': float(precio.maximo),
+            'minimo': float(precio.minimo),
+            'cierre': float(precio.cierre),
+            'cierre_ajustado': float(precio.cierre_ajustado),
+            'volumen': float(precio.volumen),
+            'retorno_diario': float(precio.retorno_diario()),
+        })
+    df = pd.DataFrame(data)
+    df.set_index('fecha', inplace=True)
+    return df
+
+
+class Command(BaseCommand):
+    help = 'Compara el cargador de precios por instancias del ORM con el vectorizado y el mapeado en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=str,
+            default='1,10,100,1000,10000',
+            help='Tamaños de historia a medir, separados por coma'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=5,
+            help='Repeticiones por medición (se informa la mejor)'
+        )
+
+    def handle(self, *args, **options):
+        tamanos = sorted(int(d) for d in options['dias'].split(','))
+        repeticiones = max(1, options['repeticiones'])
+
+        self.stdout.write('=' * 72)
+        self.stdout.write('BENCHMARK DEL CARGADOR DE PRECIOS (datos sintéticos, se descartan al final)')
+        self.stdout.write('=' * 72)
+        self.stdout.write(f"{'Días':>8} {'Instancias':>12} {'Vectorizado':>12} {'Mapeado':>12} {'Mejora':>9}")
+
+        try:
+            with transaction.atomic():
+                accion = AccionInternacional.objects.create(
+                    simbolo=SIMBOLO_BENCHMARK,
+                    nombre='Benchmark',
+                    tipo='accion'
+                )
+                analizador = AnalizadorMercadoInternacional()
+                self._crear_precios(accion, analizador.hoy, max(tamanos))
+
+                with tempfile.TemporaryDirectory() as directorio:
+                    almacen = AlmacenPrecios(directorio)
+                    almacen.reconstruir(SIMBOLO_BENCHMARK)
+
+                    for dias in tamanos:
+                        self._medir_tamano(analizador, almacen, dias, repeticiones)
+
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _crear_precios(self, accion, hoy, cantidad):
+        """Serie aleatoria de `cantidad` días consecutivos que termina hoy"""
+        generador = np.random.default_rng(0)
+        cierres = 100 * np.cumprod(1 + generador.normal(0, 0.01, cantidad))
+        aperturas = cierres * (1 + generador.normal(0, 0.005, cantidad))
+
+        PrecioAccion.objects.bulk_create(
+            [
+                PrecioAccion(
+                    accion=accion,
+                    fecha=hoy - timedelta(days=cantidad - 1 - i),
+                    apertura=Decimal(f'{aperturas[i]:.4f}'),
+                    maximo=Decimal(f'{max(aperturas[i], cierres[i]) * 1.01:.4f}'),
+                    minimo=Decimal(f'{min(aperturas[i], cierres[i]) * 0.99:.4f}'),
+                    cierre=Decimal(f'{cierres[i]:.4f}'),
+                    cierre_ajustado=Decimal(f'{cierres[i]:.4f}'),
+                    volumen=int(generador.integers(1_000_000, 50_000_000)),
+                )
+                for i in range(cantidad)
+            ],
+            batch_size=1000
+        )
+
+    def _medir_tamano(self, analizador, almacen, dias, repeticiones):
+        desde = analizador.hoy - timedelta(days=dias - 1)
+
+        instancias = self._mejor_tiempo(lambda: _cargar_con_instancias(SIMBOLO_BENCHMARK, desde), repeticiones)
+
+        with override_settings(PRECIOS_COLUMNAR_ACTIVO=False):
+            vectorizado = self._mejor_tiempo(
+                lambda: analizador.obtener_datos_dataframe(SIMBOLO_BENCHMARK, dias - 1), repeticiones
+            )
+
+        compartido = AlmacenPrecios._compartido
+        AlmacenPrecios._compartido = almacen
+        try:
+            with override_settings(PRECIOS_COLUMNAR_ACTIVO=True):
+                mapeado = self._mejor_tiempo(
+                    lambda: analizador.obtener_datos_dataframe(SIMBOLO_BENCHMARK, dias - 1), repeticiones
+                )
+        finally:
+            AlmacenPrecios._compartido = compartido
+
+        self.stdout.write(
+            f'{dias:>8} {instancias * 1000:>10.2f}ms {vectorizado * 1000:>10.2f}ms '
+            f'{mapeado * 1000:>10.2f}ms {instancias / vectorizado:>8.1f}x'
+        )
+
+    def _mejor_tiempo(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return min(tiempos)
@@ -0,0 +1,194 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+
+HOST = 'benchmark.local'
+
+MODOS = ('wsgi', 'asgi')
+
+
+def _environ(ruta):
+    ruta, _, consulta = ruta.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': ruta,
+        'QUERY_STRING': consulta,
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def _scope(ruta):
+    ruta, _, consulta = ruta.partition('?')
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': ruta,
+        'raw_path': ruta.encode('latin-1'),
+        'query_string': consulta.encode('latin-1'),
+        'root_path': '',
+        'headers': [(b'host', HOST.encode('latin-1'))],
+        'client': ('127.0.0.1', 50000),
+        'server': (HOST, 80),
+    }
+
+
+def _pedido_wsgi(handler, ruta):
+    """(segundos, status) de un GET por el handler WSGI, leyendo la respuesta entera"""
+    estado = []
+    inicio = time.perf_counter()
+    cuerpo = handler(_environ(ruta), lambda status, headers, exc_info=None: estado.append(status))
+    try:
+        b''.join(cuerpo)
+    finally:
+        if hasattr(cuerpo, 'close'):
+            cuerpo.close()
+    return time.perf_counter() - inicio, int(estado[0].split()[0])
+
+
+async def _pedido_asgi(handler, ruta):
+    """(segundos, status) de un GET por el handler ASGI, hasta el último fragmento del cuerpo"""
+    mensajes = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    estado = []
+
+    async def recibir():
+        if mensajes:
+            return mensajes.pop()
+        # El cliente sigue conectado: Django escucha la desconexión hasta terminar
+        await asyncio.Event().wait()
+
+    async def enviar(mensaje):
+        if mensaje['type'] == 'http.response.start':
+            estado.append(mensaje['status'])
+
+    inicio = time.perf_counter()
+    await handler(_scope(ruta), recibir, enviar)
+    return time.perf_counter() - inicio, estado[0]
+
+
+class Command(BaseCommand):
+    help = 'Compara latencia y requests por segundo de las vistas servidas con WSGI y con ASGI bajo concurrencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rutas',
+            type=str,
+            default='/,/mercado-internacional/',
+            help='Rutas a pedir, separadas por coma (se alternan)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=100,
+            help='Requests por modo'
+        )
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=8,
+            help='Requests en vuelo a la vez (hilos del servidor WSGI, tareas en ASGI)'
+        )
+        parser.add_argument(
+            '--modos',
+            type=str,
+            default='wsgi,asgi',
+            help=f'Modos a medir, separados por coma: {", ".join(MODOS)}'
+        )
+        parser.add_argument(
+            '--sin-cache',
+            action='store_true',
+            help='Desactivar la cache de analítica para medir el cálculo completo en cada request'
+        )
+
+    def handle(self, *args, **options):
+        rutas = [ruta.strip() for ruta in options['rutas'].split(',') if ruta.strip()]
+        modos = [modo.strip() for modo in options['modos'].split(',') if modo.strip()]
+        desconocidos = [modo for modo in modos if modo not in MODOS]
+        if desconocidos:
+            self.stderr.write(f'Modos desconocidos: {", ".join(desconocidos)}')
+            return
+        cantidad = max(1, options['requests'])
+        concurrencia = max(1, options['concurrencia'])
+        pedidos = [rutas[i % len(rutas)] for i in range(cantidad)]
+
+        self.stdout.write('=' * 72)
+        self.stdout.write(
+            f'BENCHMARK WSGI / ASGI: {cantidad} requests, concurrencia {concurrencia}, '
+            f'cache de analítica {"desactivada" if options["sin_cache"] else "activa"}'
+        )
+        self.stdout.write(f'Rutas: {", ".join(rutas)}')
+        self.stdout.write('=' * 72)
+        self.stdout.write(
+            f"{'Modo':<16} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'máx.':>9} {'errores':>8}"
+        )
+
+        ajustes = {
+            'ALLOWED_HOSTS': [HOST],
+            'DEBUG': False,
+            'ANALITICA_CACHE_ACTIVA': getattr(settings, 'ANALITICA_CACHE_ACTIVA', True) and not options['sin_cache'],
+        }
+        for modo in modos:
+            with override_settings(**ajustes):
+                if modo == 'wsgi':
+                    duracion, resultados = self._medir_wsgi(pedidos, rutas, concurrencia)
+                else:
+                    duracion, resultados = asyncio.run(self._medir_asgi(pedidos, rutas, concurrencia))
+            self._informar(modo, duracion, resultados)
+
+    def _medir_wsgi(self, pedidos, rutas, concurrencia):
+        """Servidor WSGI con hilos simulado: `concurrencia` hilos atendiendo la cola de pedidos"""
+        handler = WSGIHandler()
+        for ruta in rutas:
+            _pedido_wsgi(handler, ruta)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as hilos:
+            resultados = list(hilos.map(lambda ruta: _pedido_wsgi(handler, ruta), pedidos))
+        return time.perf_counter() - inicio, resultados
+
+    async def _medir_asgi(self, pedidos, rutas, concurrencia):
+        """Servidor ASGI simulado: un event loop con hasta `concurrencia` requests en vuelo"""
+        handler = ASGIHandler()
+        for ruta in rutas:
+            await _pedido_asgi(handler, ruta)
+
+        limite = asyncio.Semaphore(concurrencia)
+
+        async def pedir(ruta):
+            async with limite:
+                return await _pedido_asgi(handler, ruta)
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(pedir(ruta) for ruta in pedidos))
+        return time.perf_counter() - inicio, resultados
+
+    def _informar(self, modo, duracion, resultados):
+        tiempos = sorted(segundos * 1000 for segundos, _ in resultados)
+        errores = sum(1 for _, estado in resultados if estado >= 400)
+        cuantiles = statistics.quantiles(tiempos, n=100, method='inclusive') if len(tiempos) > 1 else tiempos * 99
+        self.stdout.write(
+            f'{modo:<16} {len(resultados) / duracion:>8.1f} {cuantiles[49]:>7.1f}ms {cuantiles[94]:>7.1f}ms '
+            f'{cuantiles[98]:>7.1f}ms {tiempos[-1]:>7.1f}ms {errores:>8}'
+        )
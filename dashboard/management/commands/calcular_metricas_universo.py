@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from dashboard.analytics import AnalizadorMercadoInternacional
+from dashboard.models import AccionInternacional
+from dashboard.paralelo import procesos_por_defecto
+
+
+class Command(BaseCommand):
+    help = 'Calcula la tabla de métricas de todo el universo de símbolos repartiéndolo en un pool de procesos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simbolos',
+            type=str,
+            help='Símbolos específicos separados por coma (por defecto, todos los activos)'
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Días de historia para las métricas'
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            help='Procesos del pool (por defecto, ANALITICA_PROCESOS o uno por núcleo)'
+        )
+        parser.add_argument(
+            '--comparar',
+            action='store_true',
+            help='Calcular también en un solo proceso y mostrar la mejora'
+        )
+
+    def handle(self, *args, **options):
+        if options['simbolos']:
+            simbolos = [s.strip().upper() for s in options['simbolos'].split(',')]
+        else:
+            simbolos = list(AccionInternacional.objects.filter(activo=True).values_list('simbolo', flat=True))
+        procesos = options['procesos'] or procesos_por_defecto()
+        dias = options['dias']
+
+        self.stdout.write('=' * 72)
+        self.stdout.write(f'MÉTRICAS DEL UNIVERSO: {len(simbolos)} símbolos, {dias} días, {procesos} procesos')
+        self.stdout.write('=' * 72)
+
+        analizador = AnalizadorMercadoInternacional()
+        inicio = time.perf_counter()
+        metricas = analizador.generar_tabla_metricas_paralela(simbolos, dias, procesos)
+        paralelo = time.perf_counter() - inicio
+
+        self.stdout.write(
+            f"{'Símbolo':<10} {'Precio':>10} {'Retorno %':>10} {'Volat. %':>9} {'MA20':>10} {'Días':>5}"
+        )
+        for fila in metricas:
+            self.stdout.write(
+                f"{fila['simbolo']:<10} {fila['ultimo_precio']:>10} {fila['retorno_periodo']:>10} "
+                f"{fila['volatilidad_anual']:>9} {fila['media_movil_20'] or '-':>10} {fila['dias_analizados']:>5}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✅ {len(metricas)} símbolos en {paralelo:.2f}s con {procesos} procesos'
+        ))
+
+        if options['comparar']:
+            inicio = time.perf_counter()
+            secuenciales = analizador.generar_tabla_metricas_paralela(simbolos, dias, procesos=1)
+            secuencial = time.perf_counter() - inicio
+            iguales = 'iguales' if secuenciales == metricas else 'DISTINTOS'
+            self.stdout.write(
+                f'En un solo proceso: {secuencial:.2f}s ({secuencial / paralelo:.1f}x); resultados {iguales}'
+            )
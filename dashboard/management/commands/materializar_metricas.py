@@ -0,0 +1,73 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.materializacion import PERIODOS, materializar_metricas
+from dashboard.paralelo import procesos_por_defecto
+
+
+class Command(BaseCommand):
+    help = 'Recalcula MetricaAccion (retorno, volatilidad, RSI, medias, 52 semanas, correlación con el blue) y el estado incremental de indicadores'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simbolos',
+            type=str,
+            help='Símbolos específicos separados por coma (por defecto, todos los activos)'
+        )
+        parser.add_argument(
+            '--periodos',
+            type=str,
+            default=','.join(PERIODOS),
+            help='Períodos a calcular separados por coma (D, W, M)'
+        )
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Guardar solo métricas desde esta fecha YYYY-MM-DD (se calculan con toda la historia)'
+        )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            help='Procesos para calcular los símbolos en paralelo (por defecto, ANALITICA_PROCESOS o uno por núcleo)'
+        )
+    
+    def handle(self, *args, **options):
+        simbolos = None
+        if options['simbolos']:
+            simbolos = [s.strip().upper() for s in options['simbolos'].split(',')]
+        
+        periodos = [p.strip().upper() for p in options['periodos'].split(',') if p.strip()]
+        invalidos = set(periodos) - set(PERIODOS)
+        if invalidos:
+            raise CommandError(f"Períodos inválidos: {', '.join(sorted(invalidos))}")
+        
+        desde = None
+        if options['desde']:
+            try:
+                desde = datetime.strptime(options['desde'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError(f"Fecha inválida: {options['desde']} (formato YYYY-MM-DD)")
+        
+        self.stdout.write('=' * 60)
+        self.stdout.write('MATERIALIZACIÓN DE MÉTRICAS')
+        self.stdout.write('=' * 60)
+        
+        procesos = options['procesos'] or procesos_por_defecto()
+        self.stdout.write(f'Procesos: {procesos}')
+        
+        resultados = materializar_metricas(simbolos, periodos=periodos, desde=desde, procesos=procesos)
+        
+        totales = {'total': 0, 'insertados': 0, 'actualizados': 0, 'sin_cambios': 0}
+        for simbolo, resultado in resultados.items():
+            for campo in totales:
+                totales[campo] += resultado[campo]
+            self.stdout.write(
+                f"  {simbolo}: {resultado['total']} métricas "
+                f"({resultado['insertados']} nuevas, {resultado['actualizados']} actualizadas, "
+                f"{resultado['sin_cambios']} sin cambios)"
+            )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {len(resultados)} símbolos, {totales['total']} métricas "
+            f"({totales['insertados']} nuevas, {totales['actualizados']} actualizadas, "
+            f"{totales['sin_cambios']} sin cambios)"
+        ))
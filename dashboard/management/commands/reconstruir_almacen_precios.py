@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from dashboard.almacen_precios import AlmacenPrecios
+from dashboard.models import AccionInternacional
+
+
+class Command(BaseCommand):
+    help = 'Regenera desde la base el almacén columnar de precios (un .npy por símbolo)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--simbolos',
+            type=str,
+            help='Símbolos específicos separados por coma (ej: AAPL,MSFT)'
+        )
+    
+    def handle(self, *args, **options):
+        if options['simbolos']:
+            simbolos = [s.strip().upper() for s in options['simbolos'].split(',')]
+        else:
+            simbolos = list(AccionInternacional.objects.values_list('simbolo', flat=True))
+        
+        almacen = AlmacenPrecios.compartido()
+        self.stdout.write(f'Reconstruyendo {len(simbolos)} símbolos en {almacen.directorio}...')
+        
+        total = 0
+        for simbolo in simbolos:
+            filas = almacen.reconstruir(simbolo)
+            total += filas
+            self.stdout.write(f'  {simbolo}: {filas} filas')
+        
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Almacén columnar reconstruido: {total} filas'))
@@ -0,0 +1,329 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+
+from .almacen_precios import dataframes_desde_bd
+from .indicadores_incrementales import DIAS_CORRELACION, EstadoRodante, clave_barra
+from .models import AccionInternacional, Cotizacion, EstadoIndicadores, MetricaAccion, PrecioAccion
+from .paralelo import ejecutar_por_simbolo
+from .services.ingesta import sincronizar_filas
+
+
+PERIODOS = [codigo for codigo, _ in MetricaAccion.PERIODO_CHOICES]
+
+# Regla de pandas.resample para cerrar cada barra semanal/mensual
+REGLAS_PERIODO = {'W': 'W-FRI', 'M': 'ME'}
+
+CAMPOS_METRICA = [
+    'retorno', 'volatilidad', 'volumen_promedio', 'rsi', 'media_movil_20', 'media_movil_50',
+    'maximo_52_semanas', 'minimo_52_semanas', 'correlacion_dolar_blue',
+]
+
+VENTANA_VOLATILIDAD_DIARIA = 20
+PERIODOS_RSI = 14
+VENTANA_CORRELACION = '30D'
+MINIMO_CORRELACION = 5
+
+
+def rsi_wilder(cierres, periodos=PERIODOS_RSI):
+    """RSI con el suavizado de Wilder (media exponencial con alpha = 1/periodos)"""
+    cambios = cierres.diff()
+    ganancias = cambios.clip(lower=0).ewm(alpha=1 / periodos, adjust=False, min_periods=periodos).mean()
+    perdidas = (-cambios.clip(upper=0)).ewm(alpha=1 / periodos, adjust=False, min_periods=periodos).mean()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + ganancias / perdidas)
+    # Sin pérdidas en la ventana el RSI es 100
+    return rsi.where(perdidas != 0, 100.0).where(ganancias.notna())
+
+
+def _series_diarias(df, blue):
+    """Indicadores que se calculan sobre la serie diaria y se muestrean en cada barra"""
+    cierres = df['cierre']
+    diarias = pd.DataFrame(index=df.index)
+    diarias['media_movil_20'] = cierres.rolling(20).mean()
+    diarias['media_movil_50'] = cierres.rolling(50).mean()
+    diarias['maximo_52_semanas'] = df['maximo'].rolling('365D').max()
+    diarias['minimo_52_semanas'] = df['minimo'].rolling('365D').min()
+
+    # Retornos de cada serie contra su observación anterior, en las fechas que tienen ambas
+    comunes = pd.concat(
+        [cierres.pct_change() * 100, blue.pct_change() * 100], axis=1, join='inner', keys=['accion', 'blue']
+    ).dropna()
+    if len(comunes) >= MINIMO_CORRELACION:
+        correlacion = comunes['accion'].rolling(VENTANA_CORRELACION, min_periods=MINIMO_CORRELACION).corr(
+            comunes['blue']
+        )
+        diarias['correlacion_dolar_blue'] = correlacion.reindex(df.index)
+    else:
+        diarias['correlacion_dolar_blue'] = np.nan
+    return diarias
+
+
+def calcular_metricas(df, blue, periodo):
+    """
+    Métricas de un símbolo para cada barra del período (D, W o M).
+
+    `df` son los precios diarios indexados por fecha y `blue` la venta del
+    dólar blue, ambos con DatetimeIndex. Cada fila corresponde al último día
+    hábil de la barra:
+    - retorno: variación % del cierre contra la barra anterior.
+    - volatilidad: desvío de los retornos diarios anualizado (√252), en los
+      últimos 20 días para D y dentro de la barra para W y M.
+    - volumen_promedio: de los mismos días que la volatilidad.
+    - rsi: Wilder de 14 barras del mismo período.
+    - medias móviles, extremos de 52 semanas y correlación de los retornos
+      diarios con los del blue (30 días corridos, el mismo criterio que la
+      analítica del dashboard): valores diarios al cierre de la barra.
+
+    Se omiten las barras sin retorno (la primera) o sin volatilidad (una
+    semana o mes con un solo día hábil, hasta que se complete otro).
+    """
+    retornos_diarios = df['cierre'].pct_change() * 100
+    diarias = _series_diarias(df, blue)
+
+    if periodo == 'D':
+        barras = pd.DataFrame(index=df.index)
+        barras['cierre'] = df['cierre']
+        barras['volatilidad'] = retornos_diarios.rolling(VENTANA_VOLATILIDAD_DIARIA, min_periods=2).std()
+        barras['volumen_promedio'] = df['volumen'].rolling(VENTANA_VOLATILIDAD_DIARIA, min_periods=1).mean()
+        barras['fecha'] = df.index
+    else:
+        agrupado = pd.DataFrame({
+            'cierre': df['cierre'],
+            'retorno_diario': retornos_diarios,
+            'volumen': df['volumen'],
+            'fecha': df.index,
+        }).resample(REGLAS_PERIODO[periodo])
+        barras = pd.DataFrame({
+            'cierre': agrupado['cierre'].last(),
+            'volatilidad': agrupado['retorno_diario'].std(),
+            'volumen_promedio': agrupado['volumen'].mean(),
+            'fecha': agrupado['fecha'].max(),
+        }).dropna(subset=['cierre'])
+
+    barras['volatilidad'] = barras['volatilidad'] * np.sqrt(252)
+    barras['retorno'] = barras['cierre'].pct_change() * 100
+    barras['rsi'] = rsi_wilder(barras['cierre'])
+    barras = barras.set_index('fecha')
+    barras = barras.join(diarias)
+
+    return barras.dropna(subset=['retorno', 'volatilidad'])[CAMPOS_METRICA]
+
+
+def _serie_blue(desde=None):
+    """Venta del dólar blue por fecha, en una consulta"""
+    cotizaciones = Cotizacion.objects.filter(tipo='blue')
+    if desde is not None:
+        cotizaciones = cotizaciones.filter(fecha__gte=desde)
+    serie = pd.Series(dict(cotizaciones.values_list('fecha', 'venta')), dtype='float64')
+    serie.index = pd.DatetimeIndex(serie.index)
+    return serie.sort_index()
+
+
+def materializar_metricas(simbolos=None, periodos=None, desde=None, procesos=1):
+    """
+    Calcula y guarda MetricaAccion para los símbolos indicados (por defecto, los activos).
+
+    Los indicadores se calculan sobre toda la historia, que sale de una sola
+    consulta; con `desde` solo se guardan las filas a partir de esa fecha. La
+    escritura usa sincronizar_filas: solo se reescriben las filas que
+    cambiaron y cada símbolo registra su versión como 'metricas:<SIMBOLO>'.
+    Se borran las filas W/M que dejaron de ser cierre de barra y se reconstruye
+    el EstadoIndicadores del símbolo para las actualizaciones incrementales.
+
+    Con `procesos` > 1 el cálculo de cada símbolo corre en un pool de procesos
+    (ver paralelo.ejecutar_por_simbolo); la escritura queda en este proceso.
+    """
+    if simbolos is None:
+        simbolos = list(AccionInternacional.objects.filter(activo=True).values_list('simbolo', flat=True))
+    periodos = periodos or PERIODOS
+
+    acciones = AccionInternacional.objects.in_bulk(simbolos, field_name='simbolo')
+    precios = dataframes_desde_bd(list(acciones))
+    blue = _serie_blue()
+    resultados = {}
+
+    calculados = ejecutar_por_simbolo(
+        _calcular_simbolo,
+        precios,
+        procesos,
+        extras={'blue': blue, 'periodos': periodos, 'desde': desde}
+    )
+
+    for simbolo, (por_periodo, estado) in calculados.items():
+        accion = acciones[simbolo]
+        filas = [
+            {'accion_id': accion.id, 'fecha': fecha, 'periodo': periodo, **valores}
+            for periodo, metricas in por_periodo.items()
+            for fecha, valores in metricas
+        ]
+
+        with transaction.atomic():
+            resultados[simbolo] = sincronizar_filas(
+                MetricaAccion,
+                ['accion_id', 'fecha', 'periodo'],
+                CAMPOS_METRICA,
+                filas,
+                clave_estado=f'metricas:{simbolo}'
+            )
+            for periodo, metricas in por_periodo.items():
+                if periodo != 'D':
+                    _eliminar_sobrantes(accion, periodo, {fecha for fecha, _ in metricas}, desde)
+            _guardar_estado(accion, EstadoRodante.desde_dict(estado))
+
+    return resultados
+
+
+def _calcular_simbolo(simbolo, df, extras):
+    """
+    Métricas y estado incremental de un símbolo, sin tocar la base (tarea del pool).
+
+    Devuelve ({periodo: [(fecha, valores)]}, estado como dict).
+    """
+    estado = _reconstruir_estado(df)
+    df = df.set_axis(pd.DatetimeIndex(df.index), axis=0)
+    por_periodo = {}
+    for periodo in extras['periodos']:
+        metricas = calcular_metricas(df, extras['blue'], periodo)
+        if extras['desde'] is not None:
+            metricas = metricas[metricas.index >= pd.Timestamp(extras['desde'])]
+        metricas = metricas.astype(object).where(metricas.notna(), None)
+        por_periodo[periodo] = [
+            (fecha.date(), valores) for fecha, valores in zip(metricas.index, metricas.to_dict('records'))
+        ]
+    return por_periodo, estado.a_dict()
+
+
+def _reconstruir_estado(df):
+    """EstadoRodante con toda la historia de un símbolo ya cargada"""
+    estado = EstadoRodante()
+    columnas = df[['maximo', 'minimo', 'cierre', 'volumen']].itertuples(index=False)
+    for fecha, (maximo, minimo, cierre, volumen) in zip(df.index, columnas):
+        estado.agregar(fecha, maximo, minimo, cierre, volumen)
+    return estado
+
+
+def _guardar_estado(accion, estado):
+    EstadoIndicadores.objects.update_or_create(
+        accion=accion,
+        defaults={'fecha': estado.fecha, 'estado': estado.a_dict()}
+    )
+
+
+def _eliminar_sobrantes(accion, periodo, fechas_validas, desde=None):
+    """Borra las filas W/M de fechas que ya no cierran una barra (la barra siguió abierta)"""
+    existentes = MetricaAccion.objects.filter(accion=accion, periodo=periodo)
+    if desde is not None:
+        existentes = existentes.filter(fecha__gte=desde)
+    sobrantes = [pk for pk, fecha in existentes.values_list('pk', 'fecha') if fecha not in fechas_validas]
+    if sobrantes:
+        MetricaAccion.objects.filter(pk__in=sobrantes).delete()
+
+
+def _inicio_barra(fecha, periodo):
+    """Primer día corrido de la barra W/M que contiene a `fecha`"""
+    if periodo == 'W':
+        return fecha.fromordinal(clave_barra(fecha, 'W') - 6)
+    return fecha.replace(day=1)
+
+
+def _retornos_blue(desde):
+    """
+    {fecha: retorno diario %} del blue desde `desde`.
+
+    El primer retorno se calcula contra la última cotización anterior a
+    `desde`, como en la serie completa de calcular_metricas.
+    """
+    cotizaciones = Cotizacion.objects.filter(tipo='blue')
+    anterior = cotizaciones.filter(fecha__lt=desde).order_by('-fecha').values_list('fecha', 'venta').first()
+    ventas = ([anterior] if anterior else []) + list(
+        cotizaciones.filter(fecha__gte=desde).order_by('fecha').values_list('fecha', 'venta')
+    )
+    return {
+        fecha: (float(venta) / float(venta_anterior) - 1) * 100
+        for (_, venta_anterior), (fecha, venta) in zip(ventas, ventas[1:])
+    }
+
+
+def _correlacion_blue(retornos, blue):
+    """
+    Correlación entre los retornos {fecha: retorno} de la ventana y los del blue de las mismas fechas.
+
+    Mismo criterio que la correlación móvil de calcular_metricas: al menos
+    MINIMO_CORRELACION fechas en común y None si alguna serie es constante.
+    """
+    comunes = [(retorno, blue[fecha]) for fecha, retorno in retornos.items() if fecha in blue]
+    if len(comunes) < MINIMO_CORRELACION:
+        return None
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlacion = np.corrcoef(np.array(comunes, dtype='f8').T)[0, 1]
+    return None if np.isnan(correlacion) else float(correlacion)
+
+
+def actualizar_metricas_incrementales(simbolo, resultado=None):
+    """
+    Agrega a MetricaAccion los días nuevos de un símbolo sin releer su historia.
+
+    Parte del EstadoIndicadores guardado y lo avanza un día a la vez (O(1)
+    por día): escribe la fila D de cada día y la fila W/M de la barra en curso,
+    que reemplaza a la del día anterior de la misma barra.
+
+    `resultado` es el de la ingesta (insertados/actualizados). Si no hay
+    estado (o es de un formato anterior), si se corrigieron precios ya
+    incorporados o si se insertaron fechas anteriores al estado (un
+    backfill), recalcula todo con materializar_metricas.
+    """
+    accion = AccionInternacional.objects.get(simbolo=simbolo)
+    registro = EstadoIndicadores.objects.filter(accion=accion).first()
+    # Un estado sin retornos_recientes es anterior a la correlación por retornos
+    if registro is None or 'retornos_recientes' not in registro.estado or (resultado and resultado['actualizados']):
+        return materializar_metricas([simbolo]).get(simbolo)
+
+    nuevas = list(
+        PrecioAccion.objects.filter(accion=accion, fecha__gt=registro.fecha)
+        .order_by('fecha')
+        .values_list('fecha', 'maximo', 'minimo', 'cierre', 'volumen')
+    )
+    if resultado and len(nuevas) < resultado['insertados']:
+        return materializar_metricas([simbolo]).get(simbolo)
+    if not nuevas:
+        return {'insertados': 0, 'actualizados': 0, 'sin_cambios': 0, 'total': 0}
+
+    estado = EstadoRodante.desde_dict(registro.estado)
+    blue = _retornos_blue(nuevas[0][0] - timedelta(days=DIAS_CORRELACION - 1))
+
+    filas = {}
+    reemplazadas = {}  # periodo -> fechas cuyas filas W/M pasan a ser de una barra aún abierta
+    for fecha, maximo, minimo, cierre, volumen in nuevas:
+        anterior = estado.fecha
+        metricas = estado.agregar(fecha, float(maximo), float(minimo), float(cierre), float(volumen))
+        correlacion = _correlacion_blue(estado.retornos_ventana_correlacion(), blue)
+
+        for periodo, valores in metricas.items():
+            if periodo != 'D':
+                if clave_barra(anterior, periodo) == clave_barra(fecha, periodo):
+                    reemplazadas.setdefault(periodo, []).append((_inicio_barra(fecha, periodo), fecha))
+                    filas.pop((periodo, anterior), None)
+            filas[(periodo, fecha)] = {
+                'accion_id': accion.id, 'fecha': fecha, 'periodo': periodo,
+                **valores, 'correlacion_dolar_blue': correlacion,
+            }
+
+    with transaction.atomic():
+        for periodo, rangos in reemplazadas.items():
+            for inicio, fecha in rangos:
+                MetricaAccion.objects.filter(
+                    accion=accion, periodo=periodo, fecha__gte=inicio, fecha__lt=fecha
+                ).delete()
+        guardado = sincronizar_filas(
+            MetricaAccion,
+            ['accion_id', 'fecha', 'periodo'],
+            CAMPOS_METRICA,
+            list(filas.values()),
+            clave_estado=f'metricas:{simbolo}'
+        )
+        _guardar_estado(accion, estado)
+
+    return guardado
@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-16 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_accioninternacional_pais_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoIngesta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(help_text='Fuente de datos (ej: cotizaciones:blue, indices:reservas, precios:AAPL)', max_length=50, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0, help_text='Se incrementa cada vez que la ingesta escribe datos nuevos o distintos')),
+                ('ultima_verificacion', models.DateTimeField(blank=True, help_text='Última vez que la ingesta comparó datos de esta fuente', null=True)),
+                ('ultima_escritura', models.DateTimeField(blank=True, help_text='Última vez que la ingesta escribió datos de esta fuente', null=True)),
+                ('escrituras_evitadas', models.PositiveBigIntegerField(default=0, help_text='Filas recibidas sin cambios que no se reescribieron')),
+            ],
+            options={
+                'verbose_name': 'Estado de Ingesta',
+                'verbose_name_plural': 'Estados de Ingesta',
+                'ordering': ['clave'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-16 21:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_estadoingesta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoIndicadores',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Último día incorporado al estado')),
+                ('estado', models.JSONField(default=dict, help_text='Sumas móviles, promedios de Wilder, acumuladores de Welford y deques de extremos')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('accion', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estado_indicadores', to='dashboard.accioninternacional')),
+            ],
+            options={
+                'verbose_name': 'Estado de Indicadores',
+                'verbose_name_plural': 'Estados de Indicadores',
+            },
+        ),
+    ]
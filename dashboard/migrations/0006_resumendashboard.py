@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-10-16 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_estadoindicadores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datos', models.JSONField(default=dict, help_text='Cotizaciones, índices, brecha cambiaria y totales ya calculados')),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen del Dashboard',
+                'verbose_name_plural': 'Resumen del Dashboard',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_resumendashboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estadoingesta',
+            name='avance',
+            field=models.DateField(blank=True, help_text='Última fecha completada por una carga por ventanas (ej: backfill:reservas)', null=True),
+        ),
+    ]
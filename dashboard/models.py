@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 class Cotizacion(models.Model):
     TIPOS_DOLAR = [
@@ -369,4 +371,139 @@ class MetricaAccion(models.Model):
         verbose_name_plural = 'Métricas de Acciones'
     
     def __str__(self):
-        return f'{self.accion.simbolo} - {self.fecha} ({self.get_periodo_display()}): {self.retorno:.2f}%'
\ No newline at end of file
+        return f'{self.accion.simbolo} - {self.fecha} ({self.get_periodo_display()}): {self.retorno:.2f}%'
+
+
+class EstadoIndicadores(models.Model):
+    """
+    Estado rodante de los indicadores de un símbolo (ver indicadores_incrementales).
+    
+    Permite agregar cada día nuevo a MetricaAccion en tiempo constante; se
+    reconstruye completo cuando se recalculan las métricas desde la historia.
+    """
+    
+    accion = models.OneToOneField(
+        AccionInternacional,
+        on_delete=models.CASCADE,
+        related_name='estado_indicadores'
+    )
+    
+    fecha = models.DateField(
+        help_text='Último día incorporado al estado'
+    )
+    
+    estado = models.JSONField(
+        default=dict,
+        help_text='Sumas móviles, promedios de Wilder, acumuladores de Welford y deques de extremos'
+    )
+    
+    actualizado = models.DateTimeField(
+        auto_now=True
+    )
+    
+    class Meta:
+        verbose_name = 'Estado de Indicadores'
+        verbose_name_plural = 'Estados de Indicadores'
+    
+    def __str__(self):
+        return f'{self.accion.simbolo} al {self.fecha}'
+
+
+class ResumenDashboard(models.Model):
+    """
+    Última foto de cotizaciones e índices, lista para mostrar en el inicio.
+    
+    Fila única que la ingesta reescribe después de guardar cotizaciones o
+    índices (ver dashboard.resumen): tiene el último y el anterior valor de
+    cada tipo con los campos derivados (spread, variación, brecha cambiaria)
+    ya calculados, así el dashboard se arma con una sola lectura.
+    """
+    
+    datos = models.JSONField(
+        default=dict,
+        help_text='Cotizaciones, índices, brecha cambiaria y totales ya calculados'
+    )
+    
+    actualizado = models.DateTimeField(
+        auto_now=True
+    )
+    
+    class Meta:
+        verbose_name = 'Resumen del Dashboard'
+        verbose_name_plural = 'Resumen del Dashboard'
+    
+    def __str__(self):
+        return f'Resumen al {self.actualizado:%d/%m/%Y %H:%M}'
+
+
+class EstadoIngesta(models.Model):
+    """
+    Marca liviana por fuente de datos, mantenida por la ingesta.
+    
+    En lugar de reescribir filas sin cambios (y su `actualizado`), cada lote
+    toca solo este registro: la última verificación siempre, y la versión y
+    la última escritura únicamente cuando hubo escrituras reales.
+    
+    Ejemplo de registro:
+    - clave: 'precios:AAPL'
+    - version: 42
+    - escrituras_evitadas: 12800
+    """
+    
+    clave = models.CharField(
+        max_length=50,
+        unique=True,
+        help_text='Fuente de datos (ej: cotizaciones:blue, indices:reservas, precios:AAPL)'
+    )
+    
+    version = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Se incrementa cada vez que la ingesta escribe datos nuevos o distintos'
+    )
+    
+    ultima_verificacion = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Última vez que la ingesta comparó datos de esta fuente'
+    )
+    
+    ultima_escritura = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Última vez que la ingesta escribió datos de esta fuente'
+    )
+    
+    escrituras_evitadas = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Filas recibidas sin cambios que no se reescribieron'
+    )
+    
+    avance = models.DateField(
+        null=True,
+        blank=True,
+        help_text='Última fecha completada por una carga por ventanas (ej: backfill:reservas)'
+    )
+    
+    class Meta:
+        ordering = ['clave']
+        verbose_name = 'Estado de Ingesta'
+        verbose_name_plural = 'Estados de Ingesta'
+    
+    def __str__(self):
+        return f'{self.clave} v{self.version}'
+    
+    @classmethod
+    def registrar(cls, clave, escritas=0, evitadas=0):
+        """Registra una verificación de la fuente y sube la versión si hubo escrituras"""
+        ahora = timezone.now()
+        cls.objects.get_or_create(clave=clave)
+        
+        cambios = {
+            'ultima_verificacion': ahora,
+            'escrituras_evitadas': F('escrituras_evitadas') + evitadas,
+        }
+        if escritas:
+            cambios['version'] = F('version') + 1
+            cambios['ultima_escritura'] = ahora
+        
+        cls.objects.filter(clave=clave).update(**cambios)
@@ -0,0 +1,146 @@
+import hashlib
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+
+_SALT_CURSOR = 'dashboard.paginacion'
+
+SIGUIENTE = 's'
+ANTERIOR = 'a'
+
+
+def codificar_cursor(fila, direccion):
+    """Cursor opaco (firmado) que apunta a `fila` para seguir en `direccion`"""
+    return signing.dumps([direccion, fila.fecha.isoformat(), fila.tipo], salt=_SALT_CURSOR)
+
+
+def decodificar_cursor(cursor):
+    """(direccion, fecha ISO, tipo) de un cursor, o None si falta, está alterado o no se entiende"""
+    if not cursor:
+        return None
+    try:
+        direccion, fecha, tipo = signing.loads(cursor, salt=_SALT_CURSOR)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if direccion not in (SIGUIENTE, ANTERIOR):
+        return None
+    return direccion, fecha, tipo
+
+
+class PaginaCursor:
+    """Página de una paginación por cursor; se usa como page_obj en los templates"""
+
+    def __init__(self, filas, cursor_siguiente, cursor_anterior, total_aproximado=None):
+        self.object_list = filas
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self.total_aproximado = total_aproximado
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+
+def paginar_por_cursor(queryset, cursor, tamano):
+    """
+    Página de `tamano` filas de un queryset ordenado por (-fecha, tipo).
+
+    En vez de OFFSET busca a partir de la última fila vista: la siguiente
+    página son las filas con fecha menor, o la misma fecha y un tipo
+    posterior, y la anterior lo mismo en sentido inverso (recorrida al revés
+    y dada vuelta). Así la consulta usa los índices de fecha y (tipo, fecha)
+    y cuesta lo mismo en la primera página que en la milésima. Se pide una
+    fila de más para saber si hay otra página en esa dirección.
+    """
+    posicion = decodificar_cursor(cursor)
+    direccion = posicion[0] if posicion else SIGUIENTE
+
+    if posicion is None:
+        filas = list(queryset.order_by('-fecha', 'tipo')[:tamano + 1])
+    elif direccion == SIGUIENTE:
+        _, fecha, tipo = posicion
+        filas = list(
+            queryset.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, tipo__gt=tipo))
+            .order_by('-fecha', 'tipo')[:tamano + 1]
+        )
+    else:
+        _, fecha, tipo = posicion
+        filas = list(
+            queryset.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, tipo__lt=tipo))
+            .order_by('fecha', '-tipo')[:tamano + 1]
+        )
+
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    if direccion == ANTERIOR:
+        filas.reverse()
+
+    # Venir desde una dirección asegura que hay filas del otro lado
+    if direccion == SIGUIENTE:
+        hay_siguiente, hay_anterior = hay_mas, posicion is not None
+    else:
+        hay_siguiente, hay_anterior = True, hay_mas
+
+    return PaginaCursor(
+        filas,
+        codificar_cursor(filas[-1], SIGUIENTE) if filas and hay_siguiente else None,
+        codificar_cursor(filas[0], ANTERIOR) if filas and hay_anterior else None,
+    )
+
+
+def total_aproximado(queryset):
+    """
+    COUNT(*) del queryset, cacheado PAGINACION_TOTAL_TTL segundos.
+
+    La clave es el SQL de la consulta, así cada combinación de filtros tiene
+    su propio total. Puede atrasarse hasta el TTL respecto de la tabla, que
+    para mostrar "~N registros" alcanza.
+    """
+    sql, parametros = queryset.order_by().query.sql_with_params()
+    clave = 'paginacion:total:' + hashlib.sha256(repr((sql, parametros)).encode('utf-8')).hexdigest()
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.order_by().count()
+        cache.set(clave, total, timeout=getattr(settings, 'PAGINACION_TOTAL_TTL', 300))
+    return total
+
+
+class PaginacionCursorMixin:
+    """
+    Reemplaza la paginación por OFFSET de un ListView por la de cursor.
+
+    El cursor llega en el parámetro `cursor` y el template recibe page_obj
+    (un PaginaCursor con cursor_siguiente, cursor_anterior y, si
+    PAGINACION_TOTAL_APROXIMADO, total_aproximado) y `filtros`, la query
+    string sin el cursor para armar los enlaces.
+    """
+
+    parametro_cursor = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        pagina = paginar_por_cursor(queryset, self.request.GET.get(self.parametro_cursor), page_size)
+        if getattr(settings, 'PAGINACION_TOTAL_APROXIMADO', True):
+            pagina.total_aproximado = total_aproximado(queryset)
+        return None, pagina, pagina.object_list, pagina.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filtros = self.request.GET.copy()
+        filtros.pop(self.parametro_cursor, None)
+        filtros.pop('page', None)
+        context['filtros'] = filtros.urlencode()
+        return context
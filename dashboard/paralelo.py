@@ -0,0 +1,94 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+from django.conf import settings
+
+from .almacen_precios import COLUMNAS, dataframe_desde_matriz
+
+
+# Estado de cada proceso del pool, fijado por _iniciar_proceso
+_memoria = None
+_matriz = None
+_extras = None
+
+
+def procesos_por_defecto():
+    """Procesos del pool: ANALITICA_PROCESOS o un proceso por núcleo"""
+    return getattr(settings, 'ANALITICA_PROCESOS', None) or os.cpu_count() or 1
+
+
+def _empaquetar(datos, destino):
+    """Copia los DataFrames de precios en `destino`, uno detrás de otro; devuelve [(simbolo, inicio, fin)]"""
+    tramos = []
+    inicio = 0
+    for simbolo, df in datos.items():
+        fin = inicio + len(df)
+        destino[inicio:fin, 0] = np.array(df.index, dtype='datetime64[D]').astype('int64')
+        destino[inicio:fin, 1:] = df[COLUMNAS].to_numpy(dtype='f8')
+        tramos.append((simbolo, inicio, fin))
+        inicio = fin
+    return tramos
+
+
+def _iniciar_proceso(nombre, forma, extras):
+    global _memoria, _matriz, _extras
+    import django
+    django.setup()
+
+    _memoria = shared_memory.SharedMemory(name=nombre)
+    _matriz = np.ndarray(forma, dtype='f8', buffer=_memoria.buf, order='F')
+    _matriz.flags.writeable = False
+    _extras = extras
+
+
+def _procesar_bloque(funcion, bloque):
+    return [
+        (simbolo, funcion(simbolo, dataframe_desde_matriz(_matriz[inicio:fin]), _extras))
+        for simbolo, inicio, fin in bloque
+    ]
+
+
+def ejecutar_por_simbolo(funcion, datos, procesos=None, extras=None, tamano_bloque=None):
+    """
+    Aplica `funcion(simbolo, df, extras)` a cada símbolo de `datos` en un pool de procesos.
+
+    `datos` es {simbolo: DataFrame de precios} (COLUMNAS indexadas por fecha).
+    Los precios se copian una vez a un bloque de memoria compartida con el
+    formato del almacén columnar; cada proceso lo mapea al arrancar y arma
+    sus DataFrames como vistas, así que ningún precio viaja serializado. Los
+    símbolos se reparten en bloques (por defecto, cuatro por proceso para
+    emparejar la carga) y solo vuelven los resultados.
+
+    `funcion` tiene que estar definida a nivel de módulo y no debe usar la
+    base: los procesos no comparten la conexión del que los lanza. `extras`
+    se envía una vez a cada proceso. Devuelve {simbolo: resultado} en el
+    orden de `datos`. Con un solo proceso (o un solo símbolo) corre en el
+    proceso actual, sin memoria compartida.
+    """
+    procesos = min(procesos or procesos_por_defecto(), len(datos))
+    if procesos <= 1:
+        return {simbolo: funcion(simbolo, df[COLUMNAS], extras) for simbolo, df in datos.items()}
+
+    forma = (sum(len(df) for df in datos.values()), 1 + len(COLUMNAS))
+    memoria = shared_memory.SharedMemory(create=True, size=max(1, forma[0] * forma[1] * 8))
+    try:
+        tramos = _empaquetar(datos, np.ndarray(forma, dtype='f8', buffer=memoria.buf, order='F'))
+        tamano_bloque = tamano_bloque or math.ceil(len(tramos) / (procesos * 4))
+        bloques = [tramos[i:i + tamano_bloque] for i in range(0, len(tramos), tamano_bloque)]
+
+        resultados = {}
+        with ProcessPoolExecutor(
+            max_workers=procesos,
+            initializer=_iniciar_proceso,
+            initargs=(memoria.name, forma, extras)
+        ) as pool:
+            for parcial in pool.map(_procesar_bloque, [funcion] * len(bloques), bloques):
+                resultados.update(parcial)
+        return resultados
+    finally:
+        memoria.close()
+        memoria.unlink()
+
@@ -0,0 +1,173 @@
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+# Listas de parámetros de largo variable: "IN (%s, %s, %s)" -> "IN (...)"
+_LISTA_PARAMETROS = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_NUMEROS = re.compile(r'\b\d+\b')
+_TEXTOS = re.compile(r"'(?:[^']|'')*'")
+
+_historial = deque(maxlen=200)
+_por_vista = {}
+_lock = threading.Lock()
+
+
+def huella(sql):
+    """SQL normalizado: mismas huellas = misma consulta con otros valores (posible N+1)"""
+    sql = _TEXTOS.sub('?', sql)
+    sql = _NUMEROS.sub('?', sql)
+    sql = _LISTA_PARAMETROS.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+class RegistroConsultas:
+    """execute_wrapper que anota sql, parámetros y duración de cada consulta"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append({
+                'alias': self.alias,
+                'sql': sql,
+                'params': params,
+                'many': many,
+                'ms': (time.perf_counter() - inicio) * 1000,
+            })
+
+
+def plan_de_consulta(alias, sql, params):
+    """EXPLAIN QUERY PLAN (SQLite) o EXPLAIN de una consulta SELECT, como lista de líneas"""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return []
+    conexion = connections[alias]
+    prefijo = 'EXPLAIN QUERY PLAN ' if conexion.vendor == 'sqlite' else 'EXPLAIN '
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(prefijo + sql, params)
+            return [' '.join(str(columna) for columna in fila) for fila in cursor.fetchall()]
+    except Exception as e:
+        return [f'(sin plan: {e})']
+
+
+def analizar(consultas, lentas=5):
+    """Totales, las `lentas` consultas más lentas y las huellas repetidas de una request"""
+    huellas = Counter(huella(consulta['sql']) for consulta in consultas)
+    exactas = Counter((consulta['sql'], repr(consulta['params'])) for consulta in consultas)
+    return {
+        'consultas': len(consultas),
+        'ms': sum(consulta['ms'] for consulta in consultas),
+        'duplicadas': sum(veces - 1 for veces in exactas.values()),
+        'repetidas': [
+            {'huella': texto, 'veces': veces}
+            for texto, veces in huellas.most_common()
+            if veces > 1
+        ],
+        'lentas': sorted(consultas, key=lambda consulta: consulta['ms'], reverse=True)[:lentas],
+    }
+
+
+def resumen_por_vista():
+    """Estadísticas acumuladas por vista en este proceso, de la más pesada a la más liviana"""
+    with _lock:
+        vistas = [dict(datos, vista=vista) for vista, datos in _por_vista.items()]
+    for datos in vistas:
+        datos['consultas_promedio'] = round(datos['consultas_total'] / datos['requests'], 1)
+        datos['ms_promedio'] = round(datos['ms_total'] / datos['requests'], 1)
+    return sorted(vistas, key=lambda datos: datos['consultas_max'], reverse=True)
+
+
+def ultimas_requests():
+    with _lock:
+        return list(reversed(_historial))
+
+
+def _registrar(vista, ruta, analisis, excedida, datos_precios=None):
+    with _lock:
+        datos = _por_vista.setdefault(vista, {
+            'requests': 0, 'consultas_total': 0, 'consultas_max': 0,
+            'ms_total': 0.0, 'ms_max': 0.0, 'excedidas': 0, 'ultima': None,
+        })
+        datos['requests'] += 1
+        datos['consultas_total'] += analisis['consultas']
+        datos['consultas_max'] = max(datos['consultas_max'], analisis['consultas'])
+        datos['ms_total'] += analisis['ms']
+        datos['ms_max'] = max(datos['ms_max'], analisis['ms'])
+        datos['excedidas'] += int(excedida)
+        datos['ultima'] = analisis
+        _historial.append({
+            'vista': vista, 'ruta': ruta, 'excedida': excedida, 'datos_precios': datos_precios, **analisis
+        })
+
+
+class PerfilSQLMiddleware:
+    """
+    Mide las consultas SQL de cada request (opt-in con PERFIL_SQL_ACTIVO).
+
+    Registra cantidad de consultas, tiempo total de SQL, las más lentas con
+    su plan (EXPLAIN QUERY PLAN en SQLite) y las huellas que se repiten, que
+    delatan los N+1. Cuando una vista supera PERFIL_SQL_MAX_CONSULTAS o
+    PERFIL_SQL_MAX_MS lo informa por consola con el detalle. Las cifras de
+    cada request van en las cabeceras X-Consultas-SQL y X-Tiempo-SQL-ms y el
+    acumulado por vista se ve en la página perfil_sql.
+    Si la vista dejó request.datos_precios (el reuso de ventanas de precios
+    de su ContextoDatos), la página lo muestra junto a cada request.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFIL_SQL_ACTIVO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.max_consultas = getattr(settings, 'PERFIL_SQL_MAX_CONSULTAS', 30)
+        self.max_ms = getattr(settings, 'PERFIL_SQL_MAX_MS', 200)
+        self.lentas = getattr(settings, 'PERFIL_SQL_LENTAS', 5)
+
+    def __call__(self, request):
+        registros = [RegistroConsultas(alias) for alias in connections]
+        with ExitStack() as pila:
+            for registro in registros:
+                pila.enter_context(connections[registro.alias].execute_wrapper(registro))
+            response = self.get_response(request)
+
+        coincidencia = request.resolver_match
+        vista = coincidencia.view_name if coincidencia else request.path
+        if vista == 'perfil_sql':
+            return response
+
+        analisis = analizar([consulta for registro in registros for consulta in registro.consultas], self.lentas)
+        for consulta in analisis['lentas']:
+            consulta['plan'] = plan_de_consulta(consulta['alias'], consulta['sql'], consulta['params'])
+
+        excedida = analisis['consultas'] > self.max_consultas or analisis['ms'] > self.max_ms
+        _registrar(vista, request.path, analisis, excedida, getattr(request, 'datos_precios', None))
+
+        response['X-Consultas-SQL'] = str(analisis['consultas'])
+        response['X-Tiempo-SQL-ms'] = f"{analisis['ms']:.1f}"
+        if excedida:
+            self._informar(vista, analisis)
+        return response
+
+    def _informar(self, vista, analisis):
+        print(
+            f"⚠ Presupuesto SQL excedido en {vista}: {analisis['consultas']} consultas "
+            f"(máx. {self.max_consultas}), {analisis['ms']:.1f}ms (máx. {self.max_ms}ms), "
+            f"{analisis['duplicadas']} duplicadas"
+        )
+        for repetida in analisis['repetidas'][:5]:
+            print(f"  {repetida['veces']}x {repetida['huella'][:160]}")
+        for consulta in analisis['lentas']:
+            print(f"  {consulta['ms']:.1f}ms {consulta['sql'][:160]}")
+            for linea in consulta['plan']:
+                print(f'      {linea}')
@@ -0,0 +1,127 @@
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Cotizacion, IndiceEconomico, ResumenDashboard
+
+
+# El resumen es una única fila
+PK_RESUMEN = 1
+
+
+def _ultimas_dos(modelo):
+    """{tipo: [último, anterior]} de un modelo con (tipo, fecha), en una consulta"""
+    filas = modelo.objects.annotate(
+        orden=Window(RowNumber(), partition_by=[F('tipo')], order_by=F('fecha').desc())
+    ).filter(orden__lte=2).order_by('tipo', 'orden')
+
+    por_tipo = {}
+    for fila in filas:
+        por_tipo.setdefault(fila.tipo, []).append(fila)
+    return por_tipo
+
+
+def _variacion(actual, anterior):
+    if not anterior:
+        return None
+    return float((actual - anterior) / anterior * 100)
+
+
+def calcular_resumen():
+    """
+    Arma el resumen del dashboard desde la base.
+
+    Para cada tipo de dólar y de índice toma el último valor y el anterior
+    (por fecha) y deja calculados diferencia, spread, variación y la brecha
+    entre el blue y el oficial. Los valores son float y las fechas texto ISO
+    para guardarlo como JSON.
+    """
+    cotizaciones = []
+    ultimas_cotizaciones = _ultimas_dos(Cotizacion)
+    for tipo, _ in Cotizacion.TIPOS_DOLAR:
+        if tipo not in ultimas_cotizaciones:
+            continue
+        actual, *previas = ultimas_cotizaciones[tipo]
+        anterior = previas[0] if previas else None
+        cotizaciones.append({
+            'tipo': actual.get_tipo_display(),
+            'codigo': tipo,
+            'fecha': actual.fecha.isoformat(),
+            'compra': float(actual.compra),
+            'venta': float(actual.venta),
+            'diferencia': float(actual.diferencia_precio()),
+            'spread': actual.spread_porcentual(),
+            'venta_anterior': float(anterior.venta) if anterior else None,
+            'fecha_anterior': anterior.fecha.isoformat() if anterior else None,
+            'variacion': _variacion(actual.venta, anterior.venta if anterior else None),
+            'actualizado': actual.actualizado.isoformat(),
+        })
+
+    indices = []
+    ultimos_indices = _ultimas_dos(IndiceEconomico)
+    for tipo, _ in IndiceEconomico.TIPOS_INDICE:
+        if tipo not in ultimos_indices:
+            continue
+        actual, *previos = ultimos_indices[tipo]
+        anterior = previos[0] if previos else None
+        indices.append({
+            'nombre': actual.get_tipo_display(),
+            'codigo': tipo,
+            'fecha': actual.fecha.isoformat(),
+            'valor': float(actual.valor),
+            'unidad': actual.unidad,
+            'valor_anterior': float(anterior.valor) if anterior else None,
+            'variacion': _variacion(actual.valor, anterior.valor if anterior else None),
+            'actualizado': actual.actualizado.isoformat(),
+        })
+
+    ventas = {cotizacion['codigo']: cotizacion['venta'] for cotizacion in cotizaciones}
+    brecha = None
+    if ventas.get('oficial') and 'blue' in ventas:
+        brecha = (ventas['blue'] - ventas['oficial']) / ventas['oficial'] * 100
+
+    return {
+        'cotizaciones': cotizaciones,
+        'indices': indices,
+        'brecha_cambiaria': brecha,
+        'total_cotizaciones': Cotizacion.objects.count(),
+        'total_indices': IndiceEconomico.objects.count(),
+    }
+
+
+def actualizar_resumen():
+    """Recalcula y guarda el resumen del dashboard"""
+    datos = calcular_resumen()
+    ResumenDashboard.objects.update_or_create(pk=PK_RESUMEN, defaults={'datos': datos})
+    return datos
+
+
+def programar_actualizacion_resumen():
+    """Recalcula el resumen cuando confirme la transacción actual (o ya, fuera de una)"""
+    transaction.on_commit(actualizar_resumen)
+
+
+def _preparar(datos):
+    """Convierte las fechas ISO del resumen guardado de vuelta a date/datetime"""
+    for fila in datos['cotizaciones'] + datos['indices']:
+        fila['fecha'] = date.fromisoformat(fila['fecha'])
+        fila['actualizado'] = datetime.fromisoformat(fila['actualizado'])
+        if fila.get('fecha_anterior'):
+            fila['fecha_anterior'] = date.fromisoformat(fila['fecha_anterior'])
+    return datos
+
+
+def obtener_resumen():
+    """
+    Resumen del dashboard con una sola lectura, listo para el template.
+
+    Convierte las fechas de vuelta a date/datetime. Si todavía no existe (base
+    recién migrada) lo calcula y lo guarda.
+    """
+    datos = ResumenDashboard.objects.filter(pk=PK_RESUMEN).values_list('datos', flat=True).first()
+    if datos is None:
+        datos = actualizar_resumen()
+    return _preparar(datos)
+
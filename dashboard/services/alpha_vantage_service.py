@@ -1,19 +1,79 @@
+import numpy as np
 import requests
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date, timedelta
+from decimal import Decimal
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from dashboard.almacen_precios import AlmacenPrecios
 from dashboard.models import AccionInternacional, PrecioAccion
+from .cache_http import CacheHTTP
+from .ingesta import sincronizar_filas
+from .json_incremental import LectorObjetoJSON
+from .limitador_tasa import LimitadorTasa
+
+
+# Campos de PrecioAccion que vienen de la serie diaria
+CAMPOS_PRECIO = [
+    'apertura', 'maximo', 'minimo', 'cierre', 'cierre_ajustado',
+    'volumen', 'dividendo', 'split'
+]
+
+CUATRO_DECIMALES = Decimal('0.0001')
+
+
+def _a_decimal(valor):
+    """Convierte un valor de la API a Decimal con la precisión de los modelos"""
+    return Decimal(str(valor)).quantize(CUATRO_DECIMALES)
+
+
+def _es_aviso_de_limite(mensaje):
+    """Indica si un 'Note'/'Information' de Alpha Vantage es un aviso de rate limit"""
+    mensaje = mensaje.lower()
+    return any(
+        indicio in mensaje
+        for indicio in ('call frequency', 'rate limit', 'requests per', 'request per')
+    )
+
+
+def _acumular(resultado, parcial):
+    """Suma los contadores de un lote guardado al resultado total"""
+    for clave in ('insertados', 'actualizados', 'sin_cambios', 'total'):
+        resultado[clave] += parcial[clave]
+
+
+class SerieEnDisco:
+    """Serie diaria descargada a disco y pendiente de parsear en streaming"""
+    
+    def __init__(self, response, params, desde=None):
+        self.response = response
+        self.params = params
+        self.desde = desde
 
 
 class AlphaVantageService:
     """Servicio para interactuar con la API de Alpha Vantage"""
     
-    def __init__(self, api_key=None):
+    # Filas por sentencia INSERT ... ON CONFLICT
+    TAMANO_LOTE = 1000
+    
+    # Barras que devuelve outputsize=compact (con margen para feriados)
+    DIAS_HABILES_COMPACT = 95
+    
+    # Las series diarias incluyen la barra de hoy: se cachean poco tiempo
+    TTL_RESPUESTA = 60 * 60
+    
+    def __init__(self, api_key=None, limitador=None, cache=None):
         self.api_key = api_key or getattr(settings, 'ALPHA_VANTAGE_API_KEY', '')
         self.base_url = getattr(settings, 'ALPHA_VANTAGE_BASE_URL', 'https://www.alphavantage.co/query')
         self.timeout = 30
+        self.limitador = limitador or LimitadorTasa.para_alpha_vantage()
+        self.cache = cache or CacheHTTP.compartida()
         self.session = requests.Session()
         
         # Headers para evitar bloqueos
@@ -22,34 +82,49 @@ class AlphaVantageService:
             'Accept': 'application/json'
         })
     
-    def _make_request(self, params):
-        """Método base para hacer requests con manejo de errores"""
+    def _make_request(self, params, en_archivo=False):
+        """
+        Método base para hacer requests con manejo de errores.
+        
+        Con en_archivo=True no parsea la respuesta: devuelve el cuerpo en disco
+        para leerlo en streaming, y la validación queda a cargo del llamador.
+        """
         try:
             params['apikey'] = self.api_key
             
-            response = self.session.get(
-                self.base_url,
-                params=params,
-                timeout=self.timeout
-            )
+            if en_archivo:
+                buscar, descargar = self.cache.buscar_archivo, self.cache.descargar_archivo
+            else:
+                buscar, descargar = self.cache.buscar, self.cache.descargar
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Verificar si hay error en la respuesta de Alpha Vantage
-                if 'Error Message' in data:
-                    error_msg = data.get('Error Message', 'Error desconocido')
-                    print(f"  ✗ Error Alpha Vantage: {error_msg[:100]}")
+            response = buscar(self.base_url, params)
+            
+            if response is None:
+                # Cuota compartida con los demás procesos que usan la misma API key
+                if not self.limitador.adquirir():
+                    print("  ✗ Cupo diario de Alpha Vantage agotado")
                     return None
                 
-                # Verificar rate limit
-                if 'Note' in data and 'call frequency' in data['Note']:
-                    print(f"  ⚠️ Rate limit alcanzado: {data['Note'][:100]}")
-                    return None
+                response = descargar(
+                    self.session,
+                    self.base_url,
+                    params=params,
+                    ttl=self.TTL_RESPUESTA,
+                    timeout=self.timeout
+                )
+            
+            if response.status_code == 200:
+                if en_archivo:
+                    return response
                 
+                data = response.json()
+                if not self._validar_respuesta(data, response, params):
+                    return None
                 return data
             else:
                 print(f"  ✗ Error HTTP {response.status_code}")
+                if en_archivo:
+                    response.cerrar()
                 return None
                 
         except requests.exceptions.Timeout:
@@ -62,8 +137,46 @@ class AlphaVantageService:
             print(f"  ✗ Error inesperado: {e}")
             return None
     
+    def _validar_respuesta(self, data, response, params):
+        """Detecta errores y avisos de rate limit en las claves de primer nivel"""
+        # Verificar si hay error en la respuesta de Alpha Vantage
+        if 'Error Message' in data:
+            error_msg = data.get('Error Message', 'Error desconocido')
+            print(f"  ✗ Error Alpha Vantage: {error_msg[:100]}")
+            self.cache.invalidar(self.base_url, params)
+            return False
+        
+        # Verificar rate limit
+        aviso = data.get('Note') or data.get('Information')
+        if aviso and _es_aviso_de_limite(aviso):
+            print(f"  ⚠️ Rate limit alcanzado: {aviso[:100]}")
+            self.cache.invalidar(self.base_url, params)
+            if not response.desde_cache:
+                self.limitador.registrar_limite(aviso)
+            return False
+        
+        if not response.desde_cache:
+            self.limitador.registrar_exito()
+        return True
+    
     def obtener_precio_diario(self, simbolo, outputsize='compact'):
         """Obtiene datos diarios históricos (compact=100 días, full=20+ años)"""
+        filas = self._descargar_serie_diaria(simbolo, outputsize)
+        
+        if filas is None:
+            return None
+        if isinstance(filas, SerieEnDisco):
+            return self._guardar_serie_stream(simbolo, filas)
+        
+        return self._guardar_serie(simbolo, filas)
+    
+    def _descargar_serie_diaria(self, simbolo, outputsize='compact', desde=None):
+        """
+        Descarga y parsea la serie diaria (desde una fecha, inclusive) sin tocar la base de datos.
+        
+        Con outputsize='full' el documento puede pesar varios MB: se deja en
+        disco y se devuelve un SerieEnDisco para parsearlo en streaming.
+        """
         params = {
             'function': 'TIME_SERIES_DAILY',
             'symbol': simbolo,
@@ -71,6 +184,14 @@ class AlphaVantageService:
         }
         
         print(f"  Obteniendo datos diarios para {simbolo}...")
+        
+        if outputsize == 'full':
+            response = self._make_request(params, en_archivo=True)
+            if response is None:
+                print(f"    ✗ No se pudieron obtener datos para {simbolo}")
+                return None
+            return SerieEnDisco(response, params, desde)
+        
         data = self._make_request(params)
         
         if not data:
@@ -84,78 +205,310 @@ class AlphaVantageService:
             print(f"    ✗ No hay 'Time Series (Daily)' en la respuesta")
             return None
         
-        return self._procesar_datos_diarios(data, simbolo)
+        filas = self._parsear_serie_diaria(data)
+        if desde is not None:
+            filas = {fecha: campos for fecha, campos in filas.items() if fecha >= desde}
+        return filas
     
     def _procesar_datos_diarios(self, data, simbolo):
-        """Procesa datos diarios históricos y los guarda en la base de datos"""
+        """Procesa la serie diaria completa y la guarda con upserts masivos"""
+        return self._guardar_serie(simbolo, self._parsear_serie_diaria(data))
+    
+    def _parsear_serie_diaria(self, data):
+        """Convierte 'Time Series (Daily)' en un dict {fecha: campos}"""
         time_series = data.get('Time Series (Daily)', {})
-        precios_guardados = []
+        filas = {}
+        today = date.today()
+        
+        for fecha_str, valores in time_series.items():
+            fila = self._parsear_entrada_diaria(fecha_str, valores, today)
+            if fila is not None:
+                filas[fila[0]] = fila[1]
         
+        return filas
+    
+    def _parsear_entrada_diaria(self, fecha_str, valores, today):
+        """Devuelve (fecha, campos) para una entrada de la serie, o None si se descarta"""
         try:
-            accion = AccionInternacional.objects.get(simbolo=simbolo)
-        except AccionInternacional.DoesNotExist:
-            print(f"    ✗ Acción {simbolo} no encontrada en la base de datos")
-            return []
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+            
+            # FILTRAR FECHAS FUTURAS
+            if fecha > today:
+                print(f"      ⚠️ Saltando fecha futura: {fecha_str}")
+                return None
+            
+            return fecha, self._parsear_valores_diarios(valores)
+            
+        except Exception as e:
+            print(f"      Error procesando {fecha_str}: {e}")
+            return None
+    
+    def _guardar_serie(self, simbolo, filas, accion=None):
+        """Guarda las filas parseadas de un símbolo e informa el resultado"""
+        if accion is None:
+            try:
+                accion = AccionInternacional.objects.get(simbolo=simbolo)
+            except AccionInternacional.DoesNotExist:
+                print(f"    ✗ Acción {simbolo} no encontrada en la base de datos")
+                return None
         
-        count = 0
-        today = date.today()
+        resultado = self._guardar_precios_bulk(accion, filas)
+        self._despues_de_guardar(accion, resultado)
         
-        for fecha_str, valores in time_series.items():
+        print(
+            f"    ✓ {simbolo}: {resultado['total']} precios procesados "
+            f"({resultado['insertados']} nuevos, {resultado['actualizados']} actualizados, "
+            f"{resultado['sin_cambios']} sin cambios)"
+        )
+        return resultado
+    
+    def _guardar_serie_stream(self, simbolo, serie, accion=None):
+        """
+        Parsea una serie en disco de a una entrada y la escribe en lotes de TAMANO_LOTE.
+        
+        La memoria usada no depende de cuánta historia tenga el símbolo. Los
+        lotes van en una transacción: si el cuerpo resulta truncado o inválido
+        se descarta todo lo escrito y se devuelve None.
+        """
+        try:
+            if accion is None:
+                try:
+                    accion = AccionInternacional.objects.get(simbolo=simbolo)
+                except AccionInternacional.DoesNotExist:
+                    print(f"    ✗ Acción {simbolo} no encontrada en la base de datos")
+                    return None
+            
+            resultado = {'insertados': 0, 'actualizados': 0, 'sin_cambios': 0, 'total': 0}
+            lector = LectorObjetoJSON(serie.response.iter_content(), 'Time Series (Daily)')
+            today = date.today()
+            lote = {}
+            
             try:
-                fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+                with transaction.atomic():
+                    for fecha_str, valores in lector.entradas():
+                        fila = self._parsear_entrada_diaria(fecha_str, valores, today)
+                        if fila is None or (serie.desde is not None and fila[0] < serie.desde):
+                            continue
+                        
+                        lote[fila[0]] = fila[1]
+                        if len(lote) >= self.TAMANO_LOTE:
+                            _acumular(resultado, self._guardar_precios_bulk(accion, lote))
+                            lote = {}
+                    
+                    if lote:
+                        _acumular(resultado, self._guardar_precios_bulk(accion, lote))
+                    self._despues_de_guardar(accion, resultado)
+            except ValueError as e:
+                print(f"    ✗ Respuesta inválida para {simbolo}: {e}")
+                self.cache.invalidar(self.base_url, serie.params)
+                return None
+        finally:
+            serie.response.cerrar()
+        
+        if not lector.serie_encontrada:
+            self._validar_respuesta(lector.otros, serie.response, serie.params)
+            print(f"    ✗ No hay 'Time Series (Daily)' en la respuesta")
+            return None
+        
+        self._validar_respuesta(lector.otros, serie.response, serie.params)
+        print(
+            f"    ✓ {simbolo}: {resultado['total']} precios procesados en streaming "
+            f"({resultado['insertados']} nuevos, {resultado['actualizados']} actualizados, "
+            f"{resultado['sin_cambios']} sin cambios)"
+        )
+        return resultado
+    
+    def _parsear_valores_diarios(self, valores):
+        """Convierte los valores de una fecha de Alpha Vantage a campos de PrecioAccion"""
+        cierre = valores.get('4. close', '0')
+        return {
+            'apertura': _a_decimal(valores.get('1. open', '0')),
+            'maximo': _a_decimal(valores.get('2. high', '0')),
+            'minimo': _a_decimal(valores.get('3. low', '0')),
+            'cierre': _a_decimal(cierre),
+            'cierre_ajustado': _a_decimal(valores.get('5. adjusted close', cierre)),
+            'volumen': int(float(valores.get('6. volume', 0))),
+            'dividendo': _a_decimal(valores.get('7. dividend amount', '0')),
+            'split': _a_decimal(valores.get('8. split coefficient', '1')),
+        }
+    
+    def _guardar_precios_bulk(self, accion, filas):
+        """
+        Guarda un lote {fecha: campos} de precios en pocas sentencias.
+        
+        sincronizar_filas compara contra lo ya almacenado y escribe solo las
+        filas nuevas o modificadas; las idénticas quedan como 'sin_cambios' y
+        se registran en EstadoIngesta bajo 'precios:<SIMBOLO>'.
+        """
+        return sincronizar_filas(
+            PrecioAccion,
+            ['accion_id', 'fecha'],
+            CAMPOS_PRECIO,
+            [{'accion_id': accion.id, 'fecha': fecha, **campos} for fecha, campos in filas.items()],
+            clave_estado=f'precios:{accion.simbolo}',
+            batch_size=self.TAMANO_LOTE
+        )
+    
+    def _despues_de_guardar(self, accion, resultado):
+        """
+        Al confirmarse lo escrito, actualiza lo derivado de los precios del símbolo:
+        su archivo en el almacén columnar y sus filas de MetricaAccion.
+        """
+        escribio = resultado['insertados'] or resultado['actualizados']
+        almacen = AlmacenPrecios.compartido()
+        reconstruir = getattr(settings, 'PRECIOS_COLUMNAR_ACTIVO', False) and (
+            escribio or not almacen.al_dia(accion.simbolo)
+        )
+        materializar = escribio and getattr(settings, 'METRICAS_MATERIALIZAR_EN_INGESTA', True)
+        if not (reconstruir or materializar):
+            return
+        
+        def actualizar_derivados():
+            if reconstruir:
+                try:
+                    almacen.reconstruir(accion.simbolo)
+                except Exception as e:
+                    print(f"    ✗ No se pudo actualizar el almacén columnar de {accion.simbolo}: {e}")
+            if materializar:
+                # Import diferido: materializacion depende de services.ingesta
+                from dashboard.materializacion import actualizar_metricas_incrementales
+                try:
+                    actualizar_metricas_incrementales(accion.simbolo, resultado)
+                except Exception as e:
+                    print(f"    ✗ No se pudieron materializar las métricas de {accion.simbolo}: {e}")
+        
+        transaction.on_commit(actualizar_derivados)
+    
+    def obtener_multiple_precios_diarios(self, simbolos, outputsize='compact', concurrencia=1,
+                                         incremental=False):
+        """
+        Obtiene precios diarios para múltiples símbolos (el limitador regula el ritmo).
+        
+        Las descargas y el parseo JSON corren en un pool de `concurrencia` hilos;
+        el hilo que llama es el único escritor y agrupa las series recibidas en
+        lotes de al menos TAMANO_LOTE filas por transacción.
+        
+        En modo incremental se omiten los símbolos ya al día y, para el resto,
+        se elige compact/full según el hueco y solo se escriben fechas nuevas.
+        """
+        resultados = {simbolo: None for simbolo in simbolos}
+        acciones = AccionInternacional.objects.in_bulk(simbolos, field_name='simbolo')
+        self._ajustar_pool_conexiones(concurrencia)
+        
+        if incremental:
+            plan = self._planificar_incremental(simbolos)
+        else:
+            plan = {simbolo: (outputsize, None) for simbolo in simbolos}
+        
+        for simbolo in simbolos:
+            if simbolo not in plan:
+                print(f"  {simbolo}: al día, no se descarga")
+                resultados[simbolo] = {
+                    'insertados': 0, 'actualizados': 0, 'sin_cambios': 0, 'total': 0,
+                    'al_dia': True
+                }
+        
+        pendientes = []
+        filas_pendientes = 0
+        
+        with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as executor:
+            futuros = {
+                executor.submit(self._descargar_serie_diaria, simbolo, tamano, desde): simbolo
+                for simbolo, (tamano, desde) in plan.items()
+            }
+            
+            for i, futuro in enumerate(as_completed(futuros)):
+                simbolo = futuros[futuro]
+                print(f"  Recibido {i+1}/{len(futuros)}: {simbolo}")
                 
-                # FILTRAR FECHAS FUTURAS
-                if fecha > today:
-                    print(f"      ⚠️ Saltando fecha futura: {fecha_str}")
+                try:
+                    filas = futuro.result()
+                except Exception as e:
+                    print(f"    ✗ Error descargando {simbolo}: {e}")
                     continue
                 
-                # Crear o actualizar precio
-                precio, created = PrecioAccion.objects.update_or_create(
-                    accion=accion,
-                    fecha=fecha,
-                    defaults={
-                        'apertura': float(valores.get('1. open', 0)),
-                        'maximo': float(valores.get('2. high', 0)),
-                        'minimo': float(valores.get('3. low', 0)),
-                        'cierre': float(valores.get('4. close', 0)),
-                        'cierre_ajustado': float(valores.get('5. adjusted close', valores.get('4. close', 0))),
-                        'volumen': int(float(valores.get('6. volume', 0))),
-                        'dividendo': float(valores.get('7. dividend amount', 0)),
-                        'split': float(valores.get('8. split coefficient', 1))
-                    }
-                )
+                if filas is None:
+                    continue
+                if simbolo not in acciones:
+                    print(f"    ✗ Acción {simbolo} no encontrada en la base de datos")
+                    if isinstance(filas, SerieEnDisco):
+                        filas.response.cerrar()
+                    continue
                 
-                precios_guardados.append(precio)
-                count += 1
+                # Las series completas se escriben en streaming, en sus propios lotes
+                if isinstance(filas, SerieEnDisco):
+                    resultados[simbolo] = self._guardar_serie_stream(simbolo, filas, acciones[simbolo])
+                    continue
                 
-                # Limitar para no sobrecargar en la primera ejecución
-                if count >= 30:  # Solo primeros 30 días
-                    break
-                    
-            except Exception as e:
-                print(f"      Error procesando {fecha_str}: {e}")
-                continue
+                pendientes.append((simbolo, filas))
+                filas_pendientes += len(filas)
+                
+                if filas_pendientes >= self.TAMANO_LOTE:
+                    self._escribir_lote(pendientes, acciones, resultados)
+                    pendientes = []
+                    filas_pendientes = 0
+        
+        if pendientes:
+            self._escribir_lote(pendientes, acciones, resultados)
         
-        print(f"    ✓ {simbolo}: {count} precios procesados")
-        return precios_guardados
+        return resultados
     
-    def obtener_multiple_precios_diarios(self, simbolos, outputsize='compact'):
-        """Obtiene precios diarios para múltiples símbolos con delay"""
-        resultados = {}
+    def _planificar_incremental(self, simbolos):
+        """
+        Decide qué descargar para cada símbolo a partir de su última fecha guardada.
         
-        for i, simbolo in enumerate(simbolos):
-            print(f"  Procesando {i+1}/{len(simbolos)}: {simbolo}")
-            
-            # Obtener datos
-            precios = self.obtener_precio_diario(simbolo, outputsize)
-            resultados[simbolo] = len(precios) if precios else 0
+        Devuelve {simbolo: (outputsize, desde)} solo para los símbolos atrasados.
+        Se vuelve a pedir la última fecha guardada para corregir una barra parcial.
+        Los símbolos sin precios reciben compact: el historial completo se pide
+        explícitamente (actualizar_mercado_internacional --full).
+        """
+        ultimas = ultimas_fechas_almacenadas(simbolos)
+        objetivo = ultimo_dia_habil()
+        plan = {}
+        
+        for simbolo in simbolos:
+            ultima = ultimas.get(simbolo)
+            if ultima is None:
+                print(f"  {simbolo}: sin precios guardados (compact)")
+                plan[simbolo] = ('compact', None)
+                continue
+            if ultima >= objetivo:
+                continue
             
-            # Esperar 15 segundos entre llamadas para no exceder límite
-            if i < len(simbolos) - 1:
-                print(f"    Esperando 12 segundos por rate limit...")
-                time.sleep(12)
+            hueco = int(np.busday_count(ultima, objetivo))
+            outputsize = 'compact' if hueco < self.DIAS_HABILES_COMPACT else 'full'
+            print(f"  {simbolo}: última fecha {ultima}, faltan {hueco} días hábiles ({outputsize})")
+            plan[simbolo] = (outputsize, ultima)
         
-        return resultados
+        return plan
+    
+    def _escribir_lote(self, pendientes, acciones, resultados):
+        """Escribe varias series en una sola transacción"""
+        with transaction.atomic():
+            for simbolo, filas in pendientes:
+                resultados[simbolo] = self._guardar_serie(simbolo, filas, acciones[simbolo])
+    
+    def _ajustar_pool_conexiones(self, concurrencia):
+        """Dimensiona el pool HTTP de la sesión para los hilos de descarga"""
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, concurrencia))
+        self.session.mount('https://', adaptador)
+        self.session.mount('http://', adaptador)
+
+
+def ultimo_dia_habil(hoy=None):
+    """Último día hábil anterior a hoy, cuya barra diaria ya debería estar publicada"""
+    hoy = hoy or date.today()
+    return np.busday_offset(hoy, -1, roll='forward').astype(date)
+
+
+def ultimas_fechas_almacenadas(simbolos):
+    """Devuelve {simbolo: última fecha en PrecioAccion} con una sola consulta agregada"""
+    return dict(
+        PrecioAccion.objects.filter(accion__simbolo__in=simbolos)
+        .values('accion__simbolo')
+        .annotate(ultima=Max('fecha'))
+        .values_list('accion__simbolo', 'ultima')
+    )
 
 
 # Función helper para uso rápido
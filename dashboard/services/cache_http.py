@@ -0,0 +1,340 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import requests
+from django.conf import settings
+
+
+# TTL para respuestas que no cambian nunca (rangos históricos cerrados)
+INMUTABLE = None
+
+# Parámetros que no forman parte de la identidad de una respuesta
+PARAMETROS_IGNORADOS = {'apikey'}
+
+
+class SinRespuestaGrabada(requests.exceptions.ConnectionError):
+    """No hay respuesta grabada para un request en modo replay"""
+
+
+def ttl_para_rango(hasta, ttl_abierto):
+    """TTL para una serie: inmutable si el rango cerró antes de hoy, corto si incluye hoy"""
+    if hasta is not None and hasta < date.today():
+        return INMUTABLE
+    return ttl_abierto
+
+
+class RespuestaCacheada:
+    """Respuesta HTTP mínima (status_code, content, json()) servida desde disco o red"""
+
+    def __init__(self, status_code, content, desde_cache=False):
+        self.status_code = status_code
+        self.content = content
+        self.desde_cache = desde_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class RespuestaArchivo:
+    """
+    Respuesta HTTP cuyo cuerpo quedó en disco, para leerla por bloques.
+
+    Se crea con el archivo ya abierto: si el desalojo LRU de otro hilo borra
+    la entrada mientras tanto, el cuerpo sigue legible hasta cerrar().
+    """
+
+    def __init__(self, status_code, archivo, desde_cache=False, temporal=False):
+        self.status_code = status_code
+        self.archivo = archivo
+        self.ruta = Path(archivo.name)
+        self.desde_cache = desde_cache
+        self.temporal = temporal
+
+    def iter_content(self, chunk_size=64 * 1024):
+        while True:
+            bloque = self.archivo.read(chunk_size)
+            if not bloque:
+                break
+            yield bloque
+
+    def cerrar(self):
+        """Cierra el cuerpo y lo borra si era un archivo temporal fuera de la cache"""
+        self.archivo.close()
+        if self.temporal:
+            try:
+                self.ruta.unlink()
+            except OSError:
+                pass
+
+
+class CacheHTTP:
+    """
+    Cache de respuestas HTTP en disco, direccionada por contenido.
+
+    La clave es un SHA-256 de la URL y los parámetros ordenados. Cada entrada
+    guarda el cuerpo y un archivo .meta con la expiración; los aciertos
+    actualizan el mtime, que se usa para desalojar por LRU cuando el tamaño
+    total supera el máximo configurado.
+
+    Modos:
+    - 'normal': sirve desde disco si no expiró; si no, descarga y graba.
+    - 'replay': solo sirve lo grabado (sin mirar la expiración) y nunca usa la
+      red, para correr la ingesta completa contra fixtures.
+    - 'desactivado': siempre va a la red y no graba nada.
+    """
+
+    MODOS = ('normal', 'replay', 'desactivado')
+
+    _compartida = None
+    _lock_compartida = threading.Lock()
+
+    def __init__(self, directorio, tamano_maximo, modo='normal'):
+        if modo not in self.MODOS:
+            raise ValueError(f'Modo de cache inválido: {modo}')
+        self.directorio = Path(directorio)
+        self.tamano_maximo = tamano_maximo
+        self.modo = modo
+        self._lock = threading.Lock()
+        self._tamano_actual = None
+
+    @classmethod
+    def compartida(cls):
+        """Instancia única por proceso configurada desde settings"""
+        with cls._lock_compartida:
+            if cls._compartida is None:
+                cls._compartida = cls(
+                    directorio=getattr(settings, 'HTTP_CACHE_DIR', 'http_cache'),
+                    tamano_maximo=getattr(settings, 'HTTP_CACHE_TAMANO_MAXIMO', 200 * 1024 * 1024),
+                    modo=getattr(settings, 'HTTP_CACHE_MODO', 'normal')
+                )
+            return cls._compartida
+
+    def clave(self, url, params=None):
+        """Hash estable de la URL y los parámetros relevantes"""
+        params = {
+            k: str(v) for k, v in (params or {}).items()
+            if k not in PARAMETROS_IGNORADOS
+        }
+        identidad = json.dumps([url, sorted(params.items())], ensure_ascii=False)
+        return hashlib.sha256(identidad.encode('utf-8')).hexdigest()
+
+    def _rutas(self, clave):
+        carpeta = self.directorio / clave[:2]
+        return carpeta / f'{clave}.body', carpeta / f'{clave}.meta'
+
+    def _meta_vigente(self, ruta_cuerpo, ruta_meta):
+        """Lee el .meta de una entrada vigente y la marca como usada; None si no sirve"""
+        try:
+            meta = json.loads(ruta_meta.read_text(encoding='utf-8'))
+            expira = meta.get('expira')
+            if self.modo == 'normal' and expira is not None and expira < time.time():
+                return None
+            os.utime(ruta_cuerpo)
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def buscar(self, url, params=None):
+        """Devuelve la respuesta grabada y vigente, o None"""
+        if self.modo == 'desactivado':
+            return None
+
+        ruta_cuerpo, ruta_meta = self._rutas(self.clave(url, params))
+        meta = self._meta_vigente(ruta_cuerpo, ruta_meta)
+        if meta is None:
+            return None
+        try:
+            contenido = ruta_cuerpo.read_bytes()
+        except OSError:
+            return None
+
+        return RespuestaCacheada(meta.get('status', 200), contenido, desde_cache=True)
+
+    def buscar_archivo(self, url, params=None):
+        """Como buscar(), pero sin cargar el cuerpo en memoria"""
+        if self.modo == 'desactivado':
+            return None
+
+        ruta_cuerpo, ruta_meta = self._rutas(self.clave(url, params))
+        meta = self._meta_vigente(ruta_cuerpo, ruta_meta)
+        if meta is None:
+            return None
+        try:
+            archivo = open(ruta_cuerpo, 'rb')
+        except OSError:
+            # Desalojada entre la lectura del .meta y la apertura
+            return None
+
+        return RespuestaArchivo(meta.get('status', 200), archivo, desde_cache=True)
+
+    def descargar(self, cliente, url, params=None, ttl=INMUTABLE, **kwargs):
+        """Hace el request con `cliente` (Session o módulo requests) y graba la respuesta"""
+        if self.modo == 'replay':
+            raise SinRespuestaGrabada(f'Sin respuesta grabada para {url} {params or ""}')
+
+        response = cliente.get(url, params=params, **kwargs)
+        respuesta = RespuestaCacheada(response.status_code, response.content)
+
+        if self.modo == 'normal' and response.status_code == 200 and ttl != 0:
+            self._guardar(self.clave(url, params), url, params, respuesta, ttl)
+
+        return respuesta
+
+    def descargar_archivo(self, cliente, url, params=None, ttl=INMUTABLE, tamano_bloque=64 * 1024,
+                          **kwargs):
+        """
+        Descarga en streaming directo a disco, con memoria constante.
+
+        Si la respuesta es cacheable el archivo queda como entrada de la cache;
+        si no, se devuelve un temporal que se borra con RespuestaArchivo.cerrar().
+        """
+        if self.modo == 'replay':
+            raise SinRespuestaGrabada(f'Sin respuesta grabada para {url} {params or ""}')
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=self.directorio, suffix='.tmp')
+        tamano = 0
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                with cliente.get(url, params=params, stream=True, **kwargs) as response:
+                    for bloque in response.iter_content(tamano_bloque):
+                        archivo.write(bloque)
+                        tamano += len(bloque)
+                    status_code = response.status_code
+        except Exception:
+            os.unlink(temporal)
+            raise
+
+        if self.modo == 'normal' and status_code == 200 and ttl != 0:
+            clave = self.clave(url, params)
+            ruta_cuerpo, _ = self._rutas(clave)
+            ruta_cuerpo.parent.mkdir(parents=True, exist_ok=True)
+            anterior = self._tamano_archivo(ruta_cuerpo)
+            os.replace(temporal, ruta_cuerpo)
+            # Abierto antes de registrar: el desalojo que dispare puede borrar esta misma entrada
+            archivo = open(ruta_cuerpo, 'rb')
+            try:
+                self._registrar(clave, url, params, status_code, ttl, tamano, anterior)
+            except Exception:
+                archivo.close()
+                raise
+            return RespuestaArchivo(status_code, archivo)
+
+        return RespuestaArchivo(status_code, open(temporal, 'rb'), temporal=True)
+
+    def get(self, cliente, url, params=None, ttl=INMUTABLE, **kwargs):
+        """Sirve desde disco si hay una respuesta vigente; si no, descarga"""
+        respuesta = self.buscar(url, params)
+        if respuesta is not None:
+            return respuesta
+        return self.descargar(cliente, url, params=params, ttl=ttl, **kwargs)
+
+    def invalidar(self, url, params=None):
+        """Elimina una entrada (por ejemplo, un aviso de rate limit que no debe servirse)"""
+        if self.modo != 'normal':
+            return
+        for ruta in self._rutas(self.clave(url, params)):
+            try:
+                tamano = ruta.stat().st_size
+                ruta.unlink()
+            except OSError:
+                continue
+            with self._lock:
+                if self._tamano_actual is not None:
+                    self._tamano_actual -= tamano
+
+    def _guardar(self, clave, url, params, respuesta, ttl):
+        ruta_cuerpo, _ = self._rutas(clave)
+        ruta_cuerpo.parent.mkdir(parents=True, exist_ok=True)
+        anterior = self._tamano_archivo(ruta_cuerpo)
+        self._escribir_atomico(ruta_cuerpo, respuesta.content)
+        self._registrar(clave, url, params, respuesta.status_code, ttl, len(respuesta.content), anterior)
+
+    def _registrar(self, clave, url, params, status_code, ttl, tamano, anterior=0):
+        """
+        Escribe el .meta de un cuerpo ya guardado y aplica el límite de tamaño.
+
+        `anterior` es el tamaño del cuerpo que se reemplazó con la misma clave.
+        """
+        _, ruta_meta = self._rutas(clave)
+        meta = {
+            'url': url,
+            'params': {k: v for k, v in (params or {}).items() if k not in PARAMETROS_IGNORADOS},
+            'status': status_code,
+            'guardado': time.time(),
+            'expira': None if ttl is INMUTABLE else time.time() + ttl,
+        }
+        self._escribir_atomico(ruta_meta, json.dumps(meta).encode('utf-8'))
+
+        with self._lock:
+            if self._tamano_actual is None:
+                self._tamano_actual = self._calcular_tamano()
+            else:
+                self._tamano_actual += tamano - anterior
+            if self._tamano_actual > self.tamano_maximo:
+                self._desalojar()
+
+    def _escribir_atomico(self, ruta, contenido):
+        descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, ruta)
+        except Exception:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+
+    @staticmethod
+    def _tamano_archivo(ruta):
+        try:
+            return ruta.stat().st_size
+        except OSError:
+            return 0
+
+    def _cuerpos(self):
+        """
+        (modificación, tamaño, ruta) de cada cuerpo guardado, con un stat por archivo.
+
+        Otro proceso puede desalojar o invalidar entre el listado y el stat:
+        los que ya no están se omiten.
+        """
+        cuerpos = []
+        for ruta in self.directorio.glob('*/*.body'):
+            try:
+                info = ruta.stat()
+            except FileNotFoundError:
+                continue
+            cuerpos.append((info.st_mtime, info.st_size, ruta))
+        return cuerpos
+
+    def _calcular_tamano(self):
+        return sum(tamano for _, tamano, _ in self._cuerpos())
+
+    def _desalojar(self):
+        """Borra las entradas usadas hace más tiempo hasta quedar en el 90% del máximo"""
+        cuerpos = sorted(self._cuerpos())
+        tamano = sum(tamano for _, tamano, _ in cuerpos)
+        objetivo = self.tamano_maximo * 0.9
+
+        for _, tamano_entrada, ruta in cuerpos:
+            if tamano <= objetivo:
+                break
+            for archivo in (ruta, ruta.with_suffix('.meta')):
+                try:
+                    archivo.unlink()
+                except OSError:
+                    pass
+            tamano -= tamano_entrada
+
+        self._tamano_actual = tamano
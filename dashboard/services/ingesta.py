@@ -0,0 +1,106 @@
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import models, transaction
+
+from dashboard.models import EstadoIngesta
+
+
+def _normalizar(campo, valor):
+    """Lleva un valor entrante al mismo tipo y precisión con que vuelve de la base"""
+    valor = campo.to_python(valor)
+    if isinstance(campo, models.DecimalField) and valor is not None:
+        valor = valor.quantize(Decimal(1).scaleb(-campo.decimal_places))
+    return valor
+
+
+def _filtro_claves(campos_clave, filas):
+    """Filtro que abarca todas las claves del lote (rango para fechas, IN para el resto)"""
+    filtro = {}
+    for campo in campos_clave:
+        valores = {fila[campo] for fila in filas}
+        if all(isinstance(valor, date) for valor in valores):
+            filtro[f'{campo}__range'] = (min(valores), max(valores))
+        else:
+            filtro[f'{campo}__in'] = valores
+    return filtro
+
+
+def sincronizar_filas(modelo, campos_clave, campos_valor, filas, clave_estado,
+                      batch_size=1000, devolver_objetos=False):
+    """
+    Inserta o actualiza un lote de filas escribiendo solo lo que cambió.
+    
+    Lee los valores guardados de todo el lote en una consulta, los compara con
+    los entrantes y manda a bulk_create(update_conflicts=True) únicamente las
+    filas nuevas o distintas, en una transacción. Las filas idénticas no se
+    tocan (su campo auto_now, como `actualizado`, queda igual); en su lugar se registra la
+    verificación en EstadoIngesta, una vez por clave de estado.
+    
+    `clave_estado` es un str o una función fila -> str (ej: una clave por tipo).
+    Devuelve los contadores insertados/actualizados/sin_cambios/total y, con
+    devolver_objetos=True, la lista de (instancia, estado) en el orden recibido.
+    """
+    resultado = {'insertados': 0, 'actualizados': 0, 'sin_cambios': 0, 'total': len(filas)}
+    if devolver_objetos:
+        resultado['objetos'] = []
+    if not filas:
+        return resultado
+    
+    opts = modelo._meta
+    campos = {nombre: opts.get_field(nombre) for nombre in campos_clave + campos_valor}
+    # Marca de tiempo de la fila (actualizado, calculado...): se escribe junto con los valores
+    marca = next(campo.attname for campo in opts.concrete_fields if getattr(campo, 'auto_now', False))
+    filas = [
+        {nombre: _normalizar(campos[nombre], fila[nombre]) for nombre in campos}
+        for fila in filas
+    ]
+    
+    existentes = {
+        tuple(guardada[2:2 + len(campos_clave)]): guardada
+        for guardada in modelo.objects.filter(**_filtro_claves(campos_clave, filas)).values_list(
+            'pk', marca, *campos_clave, *campos_valor
+        )
+    }
+    
+    a_escribir = []
+    contadores = defaultdict(lambda: [0, 0])  # clave_estado -> [escritas, evitadas]
+    for fila in filas:
+        clave = tuple(fila[nombre] for nombre in campos_clave)
+        guardada = existentes.get(clave)
+        estado = clave_estado(fila) if callable(clave_estado) else clave_estado
+        objeto = modelo(**fila)
+        
+        if guardada is None:
+            situacion = 'insertado'
+        elif tuple(guardada[2 + len(campos_clave):]) == tuple(fila[n] for n in campos_valor):
+            situacion = 'sin_cambios'
+            objeto.pk = guardada[0]
+            setattr(objeto, marca, guardada[1])
+        else:
+            situacion = 'actualizado'
+        
+        if situacion == 'sin_cambios':
+            resultado['sin_cambios'] += 1
+            contadores[estado][1] += 1
+        else:
+            resultado['insertados' if situacion == 'insertado' else 'actualizados'] += 1
+            contadores[estado][0] += 1
+            a_escribir.append(objeto)
+        
+        if devolver_objetos:
+            resultado['objetos'].append((objeto, situacion))
+    
+    with transaction.atomic():
+        modelo.objects.bulk_create(
+            a_escribir,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=campos_clave,
+            update_fields=campos_valor + [marca]
+        )
+        for estado, (escritas, evitadas) in contadores.items():
+            EstadoIngesta.registrar(estado, escritas=escritas, evitadas=evitadas)
+    
+    return resultado
@@ -0,0 +1,109 @@
+import codecs
+import json
+
+
+class LectorObjetoJSON:
+    """
+    Lector incremental de un documento JSON cuyo nivel superior es un objeto.
+
+    Recorre los bloques de bytes de a uno y entrega de a una las entradas del
+    objeto anidado bajo `clave_serie` (por ejemplo 'Time Series (Daily)'), sin
+    construir nunca el documento completo en memoria. El resto de las claves
+    de primer nivel ('Meta Data', 'Note', 'Error Message'...) son pequeñas y
+    quedan en `self.otros` a medida que aparecen.
+
+        lector = LectorObjetoJSON(response.iter_content(65536), 'Time Series (Daily)')
+        for fecha, valores in lector.entradas():
+            ...
+        lector.otros  # {'Meta Data': {...}}
+    """
+
+    # Caracteres ya consumidos a partir de los cuales se recorta el buffer
+    UMBRAL_RECORTE = 64 * 1024
+
+    def __init__(self, bloques, clave_serie):
+        self._bloques = iter(bloques)
+        self._decodificador = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._agotado = False
+        self.clave_serie = clave_serie
+        self.otros = {}
+        self.serie_encontrada = False
+
+    def _leer_mas(self):
+        """Agrega el siguiente bloque al buffer; False si ya no quedan datos"""
+        if self._agotado:
+            return False
+        if self._pos > self.UMBRAL_RECORTE:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        try:
+            bloque = next(self._bloques)
+        except StopIteration:
+            self._buffer += self._decodificador.decode(b'', final=True)
+            self._agotado = True
+            return False
+        self._buffer += self._decodificador.decode(bloque)
+        return True
+
+    def _caracter(self):
+        """Devuelve el siguiente carácter no blanco sin consumirlo"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._leer_mas():
+                raise ValueError('JSON incompleto')
+
+    def _esperar(self, caracteres):
+        caracter = self._caracter()
+        if caracter not in caracteres:
+            raise ValueError(f'Se esperaba {caracteres!r} y llegó {caracter!r}')
+        self._pos += 1
+        return caracter
+
+    def _valor(self):
+        """Decodifica el siguiente valor completo, leyendo más bloques si hace falta"""
+        self._caracter()
+        while True:
+            try:
+                valor, fin = self._json.raw_decode(self._buffer, self._pos)
+                # Un número al final del buffer podría continuar en el próximo bloque
+                if fin < len(self._buffer) or self._agotado:
+                    self._pos = fin
+                    return valor
+            except json.JSONDecodeError:
+                if self._agotado:
+                    raise
+            self._leer_mas()
+
+    def entradas(self):
+        """Genera (clave, valor) para cada entrada del objeto `clave_serie`"""
+        self._esperar('{')
+        if self._caracter() == '}':
+            return
+
+        while True:
+            clave = self._valor()
+            self._esperar(':')
+
+            if clave == self.clave_serie:
+                self.serie_encontrada = True
+                self._esperar('{')
+                if self._caracter() == '}':
+                    self._pos += 1
+                else:
+                    while True:
+                        subclave = self._valor()
+                        self._esperar(':')
+                        yield subclave, self._valor()
+                        if self._esperar(',}') == '}':
+                            break
+            else:
+                self.otros[clave] = self._valor()
+
+            if self._esperar(',}') == '}':
+                return
@@ -0,0 +1,203 @@
+import sqlite3
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from django.conf import settings
+
+
+class LimitadorTasa:
+    """
+    Token bucket con presupuesto por minuto y por día, compartido entre procesos.
+
+    El estado vive en un archivo SQLite pequeño y cada operación corre dentro de
+    una transacción BEGIN IMMEDIATE, de modo que los cron jobs, el comando de
+    gestión y las actualizaciones disparadas desde la web consumen la misma
+    cuota de la API key sin pisarse.
+
+    El cupo diario se reinicia a la medianoche de `zona_horaria`, la del
+    proveedor, no la del servidor. Los presupuestos configurados se aplican
+    al registro existente al crear el limitador.
+    """
+
+    # Factor de reducción de la capacidad por minuto al recibir un aviso de límite
+    FACTOR_PENALIZACION = 0.5
+    # Tokens de capacidad recuperados por cada llamada exitosa
+    RECUPERACION_POR_EXITO = 0.5
+    # Segundos de pausa tras un aviso de límite por minuto
+    PAUSA_TRAS_AVISO = 60
+
+    def __init__(self, nombre, por_minuto, por_dia, ruta, zona_horaria='UTC'):
+        self.nombre = nombre
+        self.por_minuto = por_minuto
+        self.por_dia = por_dia
+        self.ruta = str(ruta)
+        self.zona_horaria = ZoneInfo(zona_horaria)
+        self._inicializar()
+
+    @classmethod
+    def para_alpha_vantage(cls):
+        """Crea el limitador compartido configurado para Alpha Vantage"""
+        return cls(
+            nombre='alpha_vantage',
+            por_minuto=getattr(settings, 'ALPHA_VANTAGE_LLAMADAS_POR_MINUTO', 5),
+            por_dia=getattr(settings, 'ALPHA_VANTAGE_LLAMADAS_POR_DIA', 25),
+            ruta=getattr(settings, 'ALPHA_VANTAGE_LIMITADOR_DB', 'alpha_vantage_limitador.sqlite3'),
+            zona_horaria=getattr(settings, 'ALPHA_VANTAGE_ZONA_HORARIA_CUOTA', 'America/New_York')
+        )
+
+    def _conectar(self):
+        return sqlite3.connect(self.ruta, timeout=30, isolation_level=None)
+
+    def _dia(self, ahora):
+        """Fecha ISO de `ahora` en la zona horaria del proveedor"""
+        return datetime.fromtimestamp(ahora, self.zona_horaria).date().isoformat()
+
+    def _inicializar(self):
+        conexion = self._conectar()
+        try:
+            conexion.execute('BEGIN IMMEDIATE')
+            conexion.execute('''
+                CREATE TABLE IF NOT EXISTS limitador (
+                    nombre TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    capacidad REAL NOT NULL,
+                    ultimo_relleno REAL NOT NULL,
+                    dia TEXT NOT NULL,
+                    usados_dia INTEGER NOT NULL,
+                    bloqueado_hasta REAL NOT NULL,
+                    por_minuto REAL NOT NULL DEFAULT 0
+                )
+            ''')
+            columnas = {fila[1] for fila in conexion.execute('PRAGMA table_info(limitador)')}
+            if 'por_minuto' not in columnas:
+                conexion.execute('ALTER TABLE limitador ADD COLUMN por_minuto REAL NOT NULL DEFAULT 0')
+            # Si cambió el presupuesto por minuto configurado, la capacidad (quizás
+            # reducida por avisos) se reemplaza por la nueva; si no, se conserva
+            ahora = time.time()
+            conexion.execute(
+                '''
+                INSERT INTO limitador
+                    (nombre, tokens, capacidad, ultimo_relleno, dia, usados_dia, bloqueado_hasta, por_minuto)
+                VALUES (?, ?, ?, ?, ?, 0, 0, ?)
+                ON CONFLICT (nombre) DO UPDATE SET
+                    capacidad = CASE WHEN por_minuto = excluded.por_minuto
+                                     THEN capacidad ELSE excluded.capacidad END,
+                    tokens = MIN(tokens, excluded.capacidad),
+                    por_minuto = excluded.por_minuto
+                ''',
+                (self.nombre, self.por_minuto, self.por_minuto, ahora, self._dia(ahora), self.por_minuto)
+            )
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        finally:
+            conexion.close()
+
+    def _transaccion(self, operacion):
+        """Ejecuta operacion(estado, ahora) con el registro bloqueado y guarda el resultado"""
+        conexion = self._conectar()
+        try:
+            conexion.execute('BEGIN IMMEDIATE')
+            fila = conexion.execute(
+                'SELECT tokens, capacidad, ultimo_relleno, dia, usados_dia, bloqueado_hasta '
+                'FROM limitador WHERE nombre = ?',
+                (self.nombre,)
+            ).fetchone()
+            estado = dict(zip(
+                ['tokens', 'capacidad', 'ultimo_relleno', 'dia', 'usados_dia', 'bloqueado_hasta'],
+                fila
+            ))
+            ahora = time.time()
+            self._rellenar(estado, ahora)
+
+            resultado = operacion(estado, ahora)
+
+            conexion.execute(
+                'UPDATE limitador SET tokens = ?, capacidad = ?, ultimo_relleno = ?, dia = ?, '
+                'usados_dia = ?, bloqueado_hasta = ? WHERE nombre = ?',
+                (estado['tokens'], estado['capacidad'], estado['ultimo_relleno'], estado['dia'],
+                 estado['usados_dia'], estado['bloqueado_hasta'], self.nombre)
+            )
+            conexion.execute('COMMIT')
+            return resultado
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        finally:
+            conexion.close()
+
+    def _rellenar(self, estado, ahora):
+        """Repone tokens según el tiempo transcurrido y reinicia el cupo diario"""
+        hoy = self._dia(ahora)
+        if estado['dia'] != hoy:
+            estado['dia'] = hoy
+            estado['usados_dia'] = 0
+
+        transcurrido = max(0.0, ahora - estado['ultimo_relleno'])
+        estado['tokens'] = min(
+            estado['capacidad'],
+            estado['tokens'] + transcurrido * estado['capacidad'] / 60
+        )
+        estado['ultimo_relleno'] = ahora
+
+    def intentar_adquirir(self):
+        """
+        Intenta consumir un token.
+
+        Devuelve 0 si se pudo, los segundos a esperar antes de reintentar, o
+        None si el cupo diario está agotado.
+        """
+        def operacion(estado, ahora):
+            if estado['usados_dia'] >= self.por_dia:
+                return None
+            if estado['bloqueado_hasta'] > ahora:
+                return estado['bloqueado_hasta'] - ahora
+            if estado['tokens'] < 1:
+                return (1 - estado['tokens']) * 60 / estado['capacidad']
+
+            estado['tokens'] -= 1
+            estado['usados_dia'] += 1
+            return 0
+
+        return self._transaccion(operacion)
+
+    def adquirir(self):
+        """Espera solo lo necesario hasta obtener un token; False si no queda cupo diario"""
+        while True:
+            espera = self.intentar_adquirir()
+            if espera is None:
+                return False
+            if espera == 0:
+                return True
+            print(f"    Esperando {espera:.1f} segundos por rate limit...")
+            time.sleep(espera)
+
+    def registrar_exito(self):
+        """Recupera gradualmente la capacidad reducida por avisos previos"""
+        def operacion(estado, ahora):
+            estado['capacidad'] = min(
+                self.por_minuto,
+                estado['capacidad'] + self.RECUPERACION_POR_EXITO
+            )
+
+        self._transaccion(operacion)
+
+    def registrar_limite(self, mensaje):
+        """Adapta el presupuesto a partir de un aviso 'Note'/'Information' de la API"""
+        mensaje = (mensaje or '').lower()
+
+        def operacion(estado, ahora):
+            if 'per minute' not in mensaje and ('per day' in mensaje or 'daily' in mensaje):
+                # Otra instancia (o la propia API) ya agotó el cupo del día
+                estado['usados_dia'] = max(estado['usados_dia'], self.por_dia)
+            else:
+                estado['capacidad'] = max(1.0, estado['capacidad'] * self.FACTOR_PENALIZACION)
+                estado['tokens'] = 0.0
+                estado['bloqueado_hasta'] = ahora + self.PAUSA_TRAS_AVISO
+
+        self._transaccion(operacion)
+
+    def estado(self):
+        """Devuelve una copia del estado actual del limitador"""
+        return self._transaccion(lambda estado, ahora: dict(estado))
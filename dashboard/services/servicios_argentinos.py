@@ -1,59 +1,110 @@
+import time
 import requests
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-from datetime import datetime, timedelta
-from dashboard.models import Cotizacion, IndiceEconomico
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import date, datetime, timedelta
+from django.db.models import Count
+from dashboard.models import Cotizacion, EstadoIngesta, IndiceEconomico
+from dashboard.resumen import programar_actualizacion_resumen
+from .cache_http import CacheHTTP, ttl_para_rango
+from .ingesta import sincronizar_filas
+from .sesion_http import obtener_sesion
+
+# Mensaje para cada estado devuelto por sincronizar_filas
+ESTADOS_COTIZACION = {
+    'insertado': 'creada',
+    'actualizado': 'actualizada',
+    'sin_cambios': 'sin cambios',
+}
+
+
+def _despues_de_guardar(resultado):
+    """Si sincronizar_filas escribió algo, el resumen del dashboard quedó viejo"""
+    if resultado['insertados'] or resultado['actualizados']:
+        programar_actualizacion_resumen()
+
 
 class DolarAPIService:
     BASE_URL = 'https://dolarapi.com/v1'
+    TTL_RESPUESTA = 60  # Cotizaciones en vivo
 
     def __init__(self):
         self.timeout = 10
-        self.headers = {
-            'User-Agent': 'DashboardFinanciero/1.0',
-            'Accept': 'application/json'
-        }
+        self.cache = CacheHTTP.compartida()
+        self.session = obtener_sesion()
 
     def obtener_cotizaciones(self):
+        return self.guardar_cotizaciones(self.descargar_cotizaciones())
+
+    def descargar_cotizaciones(self):
+        """Consulta blue, mep y ccl en paralelo, sin tocar la base de datos"""
         tipos = {
             'blue': 'dolares/blue',
             'mep': 'dolares/bolsa', 
             'ccl': 'dolares/contadoconliqui'
         }
 
-        cotizaciones_guardadas = []
-        fecha_hoy = datetime.now().date()
+        with ThreadPoolExecutor(max_workers=len(tipos)) as executor:
+            futuros = {
+                tipo: executor.submit(self._descargar_tipo, tipo, endpoint)
+                for tipo, endpoint in tipos.items()
+            }
+            datos = {tipo: futuro.result() for tipo, futuro in futuros.items()}
 
-        for tipo, endpoint in tipos.items():
-            try:
-                url = f'{self.BASE_URL}/{endpoint}'
-                response = requests.get(url, timeout=self.timeout, headers=self.headers)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    cotizacion, created = Cotizacion.objects.update_or_create(
-                        tipo=tipo,
-                        fecha=fecha_hoy,
-                        defaults={
-                            'compra': data['compra'],
-                            'venta': data['venta']
-                        }
-                    )
-                    cotizaciones_guardadas.append(cotizacion)
-                    accion = 'creada' if created else 'actualizada'
-                    print(f'Cotización {tipo} {accion}: ${cotizacion.venta}')
-                else:
-                    print(f'Error al obtener {tipo}: HTTP {response.status_code}')
-            
-            except requests.exceptions.Timeout:
-                print(f'Timeout al obtener {tipo}')
-            except requests.exceptions.ConnectionError:
-                print(f'Sin conexión al obtener {tipo}')
-            except Exception as e:
-                print(f'Error inesperado al obtener {tipo}: {e}')
+        return {tipo: data for tipo, data in datos.items() if data is not None}
+
+    def _descargar_tipo(self, tipo, endpoint):
+        """Devuelve el JSON de un endpoint de DolarAPI, o None si falla"""
+        try:
+            url = f'{self.BASE_URL}/{endpoint}'
+            response = self.cache.get(self.session, url, ttl=self.TTL_RESPUESTA, timeout=self.timeout)
+
+            if response.status_code == 200:
+                return response.json()
+            print(f'Error al obtener {tipo}: HTTP {response.status_code}')
         
-        return cotizaciones_guardadas
+        except requests.exceptions.Timeout:
+            print(f'Timeout al obtener {tipo}')
+        except requests.exceptions.ConnectionError:
+            print(f'Sin conexión al obtener {tipo}')
+        except Exception as e:
+            print(f'Error inesperado al obtener {tipo}: {e}')
+        
+        return None
+
+    def guardar_cotizaciones(self, datos):
+        """
+        Guarda las cotizaciones descargadas con fecha de hoy.
+        
+        Las que no cambiaron desde la última consulta no se reescriben: solo
+        se registra la verificación en EstadoIngesta ('cotizaciones:<tipo>').
+        """
+        fecha_hoy = datetime.now().date()
+        try:
+            resultado = sincronizar_filas(
+                Cotizacion,
+                ['tipo', 'fecha'],
+                ['compra', 'venta'],
+                [
+                    {'tipo': tipo, 'fecha': fecha_hoy, 'compra': data['compra'], 'venta': data['venta']}
+                    for tipo, data in datos.items()
+                ],
+                clave_estado=lambda fila: f"cotizaciones:{fila['tipo']}",
+                devolver_objetos=True
+            )
+        except Exception as e:
+            print(f'Error inesperado al guardar cotizaciones: {e}')
+            return []
+        _despues_de_guardar(resultado)
+        
+        for cotizacion, estado in resultado['objetos']:
+            print(f'Cotización {cotizacion.tipo} {ESTADOS_COTIZACION[estado]}: ${cotizacion.venta}')
+        if resultado['sin_cambios']:
+            print(f"Escrituras evitadas: {resultado['sin_cambios']} cotizaciones sin cambios")
+        
+        return [cotizacion for cotizacion, _ in resultado['objetos']]
 
     def obtener_cotizacion_especifica(self, tipo):
         endpoints = {
@@ -68,19 +119,11 @@ class DolarAPIService:
         
         try:
             url = f'{self.BASE_URL}/{endpoints[tipo]}'
-            response = requests.get(url, timeout=self.timeout)
+            response = self.cache.get(self.session, url, ttl=self.TTL_RESPUESTA, timeout=self.timeout)
 
             if response.status_code == 200:
-                data = response.json()
-                cotizacion, created = Cotizacion.objects.update_or_create(
-                    tipo=tipo,
-                    fecha=datetime.now().date(),
-                    defaults={
-                        'compra': data['compra'],
-                        'venta': data['venta']
-                    }
-                )
-                return cotizacion
+                cotizaciones = self.guardar_cotizaciones({tipo: response.json()})
+                return cotizaciones[0] if cotizaciones else None
         except Exception as e:
             print(f'Error: {e}')
             return None
@@ -89,22 +132,27 @@ class DolarAPIService:
 class BCRACambiarioService:
     """Dólar oficial de Estadísticas Cambiarias v1.0 - Sin token"""
     BASE_URL = 'https://api.bcra.gob.ar/estadisticascambiarias/v1.0'
+    TTL_RESPUESTA = 5 * 60  # Cotización del día
 
     def __init__(self):
         self.timeout = 15
-        self.session = requests.Session()
-        self.session.verify = False
-        self.session.headers.update({
-            'User-Agent': 'DashboardFinanciero/1.0',
-            'Accept': 'application/json'
-        })
+        self.cache = CacheHTTP.compartida()
+        self.session = obtener_sesion()
+        self.verify = False  # El certificado del BCRA no valida
 
     def obtener_dolar_oficial(self):
         """Obtiene la cotización del dólar oficial del día actual"""
+        return self.guardar_dolar_oficial(self.descargar_dolar_oficial())
+
+    def descargar_dolar_oficial(self):
+        """Devuelve (fecha, cotización USD) del BCRA sin tocar la base de datos, o None"""
         try:
             # Método 1: Endpoint general de cotizaciones del día
             url = f'{self.BASE_URL}/Cotizaciones'
-            response = self.session.get(url, timeout=self.timeout)
+            response = self.cache.get(
+                self.session, url, ttl=self.TTL_RESPUESTA,
+                timeout=self.timeout, verify=self.verify
+            )
 
             if response.status_code == 200:
                 data = response.json()
@@ -122,18 +170,7 @@ class BCRACambiarioService:
                                 
                                 if fecha_str and cotizacion_valor is not None:
                                     fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-                                    
-                                    cotizacion, created = Cotizacion.objects.update_or_create(
-                                        tipo='oficial',
-                                        fecha=fecha,
-                                        defaults={
-                                            'compra': cotizacion_valor,
-                                            'venta': cotizacion_valor
-                                        }
-                                    )
-                                    accion = 'creada' if created else 'actualizada'
-                                    print(f'Cotización oficial (BCRA) {accion}: ${cotizacion.venta}')
-                                    return cotizacion
+                                    return fecha, cotizacion_valor
                     
                     print("No se encontró USD en los detalles de la respuesta")
                     return None
@@ -148,6 +185,30 @@ class BCRACambiarioService:
             print(f'Error al obtener dólar oficial: {e}')
             return None
 
+    def guardar_dolar_oficial(self, dato):
+        """Guarda el (fecha, valor) devuelto por descargar_dolar_oficial"""
+        if dato is None:
+            return None
+
+        fecha, cotizacion_valor = dato
+        try:
+            resultado = sincronizar_filas(
+                Cotizacion,
+                ['tipo', 'fecha'],
+                ['compra', 'venta'],
+                [{'tipo': 'oficial', 'fecha': fecha, 'compra': cotizacion_valor, 'venta': cotizacion_valor}],
+                clave_estado='cotizaciones:oficial',
+                devolver_objetos=True
+            )
+        except Exception as e:
+            print(f'Error al guardar dólar oficial: {e}')
+            return None
+        _despues_de_guardar(resultado)
+
+        cotizacion, estado = resultado['objetos'][0]
+        print(f'Cotización oficial (BCRA) {ESTADOS_COTIZACION[estado]}: ${cotizacion.venta}')
+        return cotizacion
+
 
 class BCRAMonetarioService:
     """Reservas y tasa de interés de Estadísticas v4.0 - Sin token"""
@@ -156,18 +217,34 @@ class BCRAMonetarioService:
     # IDs según documentación previa
     RESERVAS_ID = 1      # Reservas Internacionales
     TASA_POLITICA_ID = 7 # Tasa de Política Monetaria
+    
+    # Rangos que llegan hasta hoy; los cerrados en el pasado son inmutables
+    TTL_RANGO_ABIERTO = 5 * 60
+    
+    # Variables conocidas: tipo de IndiceEconomico -> (ID BCRA, unidad)
+    VARIABLES = {
+        'reservas': (RESERVAS_ID, 'Millones USD'),
+        'tasa': (TASA_POLITICA_ID, '%'),
+    }
+    
+    # Backfill histórico
+    INICIO_HISTORICO = date(2000, 1, 1)
+    TAMANO_PAGINA = 1000
+    DIAS_POR_VENTANA = 365
 
     def __init__(self):
         self.timeout = 15
-        self.session = requests.Session()
-        self.session.verify = False
-        self.session.headers.update({
-            'User-Agent': 'DashboardFinanciero/1.0',
-            'Accept': 'application/json'
-        })
+        self.cache = CacheHTTP.compartida()
+        self.session = obtener_sesion()
+        self.verify = False  # El certificado del BCRA no valida
 
     def _obtener_dato_variable(self, variable_id, nombre_variable, unidad):
         """Método genérico para obtener cualquier variable monetaria"""
+        dato = self._descargar_dato_variable(variable_id, nombre_variable)
+        return self._guardar_dato_variable(dato, nombre_variable, unidad)
+
+    def _descargar_dato_variable(self, variable_id, nombre_variable):
+        """Devuelve (fecha, valor) del último dato de una variable, o None"""
         try:
             url = f'{self.BASE_URL}/Monetarias/{variable_id}'
             
@@ -178,7 +255,12 @@ class BCRAMonetarioService:
                 'Hasta': hoy.strftime('%Y-%m-%d')
             }
             
-            response = self.session.get(url, params=params, timeout=self.timeout)
+            response = self.cache.get(
+                self.session, url, params=params,
+                ttl=ttl_para_rango(hoy, self.TTL_RANGO_ABIERTO),
+                timeout=self.timeout,
+                verify=self.verify
+            )
             
             if response.status_code == 200:
                 data = response.json()
@@ -193,18 +275,7 @@ class BCRAMonetarioService:
                         valor = ultimo_dato.get('valor')
                         
                         if fecha_str and valor is not None:
-                            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-                            
-                            indice, created = IndiceEconomico.objects.update_or_create(
-                                tipo=nombre_variable,
-                                fecha=fecha,
-                                defaults={
-                                    'valor': valor,
-                                    'unidad': unidad
-                                }
-                            )
-                            print(f'{nombre_variable.capitalize()} guardadas: {valor:,.2f} {unidad}')
-                            return indice
+                            return datetime.strptime(fecha_str, '%Y-%m-%d').date(), valor
                     else:
                         print(f"No hay datos en 'detalle' para {nombre_variable}")
                 else:
@@ -218,6 +289,155 @@ class BCRAMonetarioService:
         
         return None
 
+    def _guardar_dato_variable(self, dato, nombre_variable, unidad):
+        """Guarda el (fecha, valor) de una variable como IndiceEconomico"""
+        if dato is None:
+            return None
+
+        fecha, valor = dato
+        try:
+            resultado = sincronizar_filas(
+                IndiceEconomico,
+                ['tipo', 'fecha'],
+                ['valor', 'unidad'],
+                [{'tipo': nombre_variable, 'fecha': fecha, 'valor': valor, 'unidad': unidad}],
+                clave_estado=f'indices:{nombre_variable}',
+                devolver_objetos=True
+            )
+        except Exception as e:
+            print(f'Error al guardar {nombre_variable}: {e}')
+            return None
+        _despues_de_guardar(resultado)
+
+        indice, estado = resultado['objetos'][0]
+        if estado == 'sin_cambios':
+            print(f'{nombre_variable.capitalize()} sin cambios: {valor:,.2f} {unidad}')
+        else:
+            print(f'{nombre_variable.capitalize()} guardadas: {valor:,.2f} {unidad}')
+        return indice
+
+    def backfill_variable(self, variable_id, nombre_variable, unidad, desde=None, hasta=None):
+        """
+        Carga la historia de una variable monetaria en IndiceEconomico.
+        
+        Recorre el rango en ventanas cronológicas de DIAS_POR_VENTANA días;
+        cada ventana se pagina con Offset/Limit y se guarda completa en una
+        transacción con upserts masivos. El avance propio del backfill queda en
+        EstadoIngesta ('backfill:<tipo>'), independiente de la última fecha de
+        IndiceEconomico que mueve la consulta diaria: sin `desde`, el backfill
+        retoma desde la última ventana completa o desde INICIO_HISTORICO.
+        
+        Si una ventana no se puede descargar, el backfill se corta ahí y el
+        resultado queda con interrumpido=True.
+        """
+        hasta = hasta or datetime.now().date()
+        clave_avance = f'backfill:{nombre_variable}'
+        avance = EstadoIngesta.objects.filter(clave=clave_avance).values_list('avance', flat=True).first()
+        inicio_pendiente = avance + timedelta(days=1) if avance else self.INICIO_HISTORICO
+        if desde is None:
+            desde = inicio_pendiente
+        # Solo un rango contiguo a lo ya cargado extiende el avance; uno
+        # posterior dejaría un hueco que el próximo backfill saltearía
+        registrar_avance = desde <= inicio_pendiente
+        
+        resultado = {
+            'ventanas': 0, 'registros': 0, 'sin_cambios': 0, 'escritos': 0,
+            'desde': desde, 'hasta': hasta, 'interrumpido': False
+        }
+        if desde > hasta:
+            print(f'{nombre_variable.capitalize()}: ya al día hasta {hasta}')
+            return resultado
+        
+        print(f'Backfill de {nombre_variable} (ID {variable_id}) desde {desde} hasta {hasta}...')
+        inicio_ventana = desde
+        
+        while inicio_ventana <= hasta:
+            fin_ventana = min(hasta, inicio_ventana + timedelta(days=self.DIAS_POR_VENTANA - 1))
+            detalle = self._descargar_rango_variable(variable_id, inicio_ventana, fin_ventana)
+            
+            if detalle is None:
+                print(f'  ✗ Backfill interrumpido en {inicio_ventana}; se retoma desde ahí')
+                resultado['interrumpido'] = True
+                break
+            
+            filas = [
+                {
+                    'tipo': nombre_variable,
+                    'fecha': datetime.strptime(dato['fecha'], '%Y-%m-%d').date(),
+                    'valor': dato['valor'],
+                    'unidad': unidad
+                }
+                for dato in detalle
+                if dato.get('fecha') and dato.get('valor') is not None
+            ]
+            guardado = sincronizar_filas(
+                IndiceEconomico,
+                ['tipo', 'fecha'],
+                ['valor', 'unidad'],
+                filas,
+                clave_estado=f'indices:{nombre_variable}',
+                batch_size=self.TAMANO_PAGINA
+            )
+            if registrar_avance and (avance is None or fin_ventana > avance):
+                avance = fin_ventana
+                EstadoIngesta.objects.update_or_create(clave=clave_avance, defaults={'avance': avance})
+            
+            print(f"  {inicio_ventana} → {fin_ventana}: {len(filas)} registros "
+                  f"({guardado['sin_cambios']} sin cambios)")
+            resultado['ventanas'] += 1
+            resultado['registros'] += len(filas)
+            resultado['sin_cambios'] += guardado['sin_cambios']
+            resultado['escritos'] += guardado['insertados'] + guardado['actualizados']
+            inicio_ventana = fin_ventana + timedelta(days=1)
+        
+        if resultado['escritos']:
+            programar_actualizacion_resumen()
+        if not resultado['interrumpido']:
+            print(f'✓ {nombre_variable.capitalize()}: {resultado["registros"]} registros en {resultado["ventanas"]} ventanas')
+        return resultado
+
+    def _descargar_rango_variable(self, variable_id, desde, hasta):
+        """Devuelve todo el 'detalle' de una variable en [desde, hasta] paginando, o None si falla"""
+        url = f'{self.BASE_URL}/Monetarias/{variable_id}'
+        detalle = []
+        offset = 0
+        
+        while True:
+            params = {
+                'Desde': desde.strftime('%Y-%m-%d'),
+                'Hasta': hasta.strftime('%Y-%m-%d'),
+                'Offset': offset,
+                'Limit': self.TAMANO_PAGINA
+            }
+            try:
+                response = self.cache.get(
+                    self.session, url, params=params,
+                    ttl=ttl_para_rango(hasta, self.TTL_RANGO_ABIERTO),
+                    timeout=self.timeout,
+                    verify=self.verify
+                )
+            except Exception as e:
+                print(f'  Error al obtener variable {variable_id}: {e}')
+                return None
+            
+            if response.status_code == 404:
+                # Sin datos en el rango
+                return detalle
+            if response.status_code != 200:
+                print(f'  Error HTTP {response.status_code} al obtener variable {variable_id}')
+                return None
+            
+            data = response.json()
+            pagina = []
+            for variable_data in data.get('results') or []:
+                pagina.extend(variable_data.get('detalle') or [])
+            detalle.extend(pagina)
+            offset += len(pagina)
+            
+            total = (data.get('metadata') or {}).get('resultset', {}).get('count')
+            if len(pagina) < self.TAMANO_PAGINA or (total is not None and offset >= total):
+                return detalle
+
     def obtener_reservas(self):
         """Obtiene las Reservas Internacionales"""
         return self._obtener_dato_variable(
@@ -235,6 +455,21 @@ class BCRAMonetarioService:
         )
 
 
+# Tiempo máximo (segundos) que se espera a cada fuente en actualizar_todos_los_datos
+TIMEOUTS_FUENTES = {
+    'dolar_oficial': 20,
+    'cotizaciones_mercado': 20,
+    'reservas': 20,
+    'tasa': 20,
+}
+
+
+def _medir(funcion):
+    """Ejecuta una descarga y devuelve (resultado, segundos)"""
+    inicio = time.perf_counter()
+    return funcion(), time.perf_counter() - inicio
+
+
 def actualizar_todos_los_datos():
     print('='*60)
     print('INICIANDO ACTUALIZACIÓN DE DATOS')
@@ -244,32 +479,77 @@ def actualizar_todos_los_datos():
     bcra_cambiario = BCRACambiarioService()  # Dólar oficial
     bcra_monetario = BCRAMonetarioService()  # Reservas y tasa
 
-    print('\n[1/4] Obteniendo dólar oficial del BCRA...')
-    dolar_oficial = bcra_cambiario.obtener_dolar_oficial()
+    # Las cuatro descargas son independientes: corren en paralelo y la
+    # actualización tarda lo que la fuente más lenta. Los hilos solo hacen
+    # I/O de red; la escritura queda en este hilo (SQLite admite un escritor).
+    descargas = {
+        'dolar_oficial': bcra_cambiario.descargar_dolar_oficial,
+        'cotizaciones_mercado': dolar_service.descargar_cotizaciones,
+        'reservas': lambda: bcra_monetario._descargar_dato_variable(
+            bcra_monetario.RESERVAS_ID, 'reservas'
+        ),
+        'tasa': lambda: bcra_monetario._descargar_dato_variable(
+            bcra_monetario.TASA_POLITICA_ID, 'tasa'
+        ),
+    }
+    datos = {fuente: None for fuente in descargas}
+    tiempos = {fuente: None for fuente in descargas}
+    errores = {}
+
+    print('\nConsultando BCRA (oficial, reservas, tasa) y DolarAPI (blue, mep, ccl) en paralelo...')
+    inicio = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(descargas))
+    try:
+        futuros = {
+            fuente: executor.submit(_medir, funcion)
+            for fuente, funcion in descargas.items()
+        }
+        for fuente, futuro in futuros.items():
+            restante = TIMEOUTS_FUENTES[fuente] - (time.perf_counter() - inicio)
+            try:
+                datos[fuente], tiempos[fuente] = futuro.result(timeout=max(0, restante))
+            except FuturesTimeoutError:
+                errores[fuente] = 'timeout'
+                print(f' {fuente}: sin respuesta tras {TIMEOUTS_FUENTES[fuente]}s')
+            except Exception as e:
+                errores[fuente] = str(e)
+                print(f' {fuente}: error {e}')
+    finally:
+        # No bloquear por una fuente colgada; su hilo termina por su propio timeout HTTP
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for fuente, segundos in tiempos.items():
+        if segundos is not None:
+            print(f' {fuente}: {segundos:.2f}s')
+
+    print('\nGuardando dólar oficial del BCRA...')
+    dolar_oficial = bcra_cambiario.guardar_dolar_oficial(datos['dolar_oficial'])
     if dolar_oficial:
         print(f' Dólar oficial obtenido: ${dolar_oficial.venta}')
     else:
         print(' No se pudo obtener el dólar oficial')
 
-    print('\n[2/4] Obteniendo cotizaciones de mercado (blue, mep, ccl)...')
-    cotizaciones_mercado = dolar_service.obtener_cotizaciones()
+    print('\nGuardando cotizaciones de mercado (blue, mep, ccl)...')
+    cotizaciones_mercado = dolar_service.guardar_cotizaciones(datos['cotizaciones_mercado'] or {})
     if cotizaciones_mercado:
         print(f' Cotizaciones obtenidas: {len(cotizaciones_mercado)}')
     else:
         print(' No se pudieron obtener las cotizaciones')
 
-    print('\n[3/4] Obteniendo reservas del BCRA...')
-    reservas = bcra_monetario.obtener_reservas()
+    print('\nGuardando reservas del BCRA...')
+    reservas = bcra_monetario._guardar_dato_variable(datos['reservas'], 'reservas', 'Millones USD')
     if not reservas:
         print(' No se pudieron obtener las reservas')
 
-    print('\n[4/4] Obteniendo tasa del BCRA...')
-    tasa = bcra_monetario.obtener_tasa_politica()
+    print('\nGuardando tasa del BCRA...')
+    tasa = bcra_monetario._guardar_dato_variable(datos['tasa'], 'tasa', '%')
     if not tasa:
         print(' No se pudo obtener la tasa')
+
+    duracion_total = time.perf_counter() - inicio
     
     print('\n' + '='*60)
-    print('ACTUALIZACIÓN COMPLETADA')
+    print(f'ACTUALIZACIÓN COMPLETADA en {duracion_total:.2f}s')
     print('='*60)
 
     # Combinar todas las cotizaciones
@@ -285,21 +565,38 @@ def actualizar_todos_los_datos():
         'cotizaciones_mercado': cotizaciones_mercado,
         'reservas': reservas,
         'tasa': tasa,
+        'tiempos': {
+            fuente: round(segundos, 3) if segundos is not None else None
+            for fuente, segundos in tiempos.items()
+        },
+        'errores': errores,
+        'duracion_total': round(duracion_total, 3),
         'timestamp': datetime.now()
     }
 
 
+def _eliminar_por_tipo(consulta, prefijo):
+    """
+    Borra las filas de `consulta` y sube la versión en EstadoIngesta de cada
+    tipo afectado ('<prefijo><tipo>'), para que la cache de analítica y el GET
+    condicional dejen de servir resultados calculados con ellas.
+    """
+    por_tipo = dict(consulta.values_list('tipo').annotate(cantidad=Count('id')).order_by())
+    consulta.delete()
+    for tipo, cantidad in por_tipo.items():
+        EstadoIngesta.registrar(f'{prefijo}{tipo}', escritas=cantidad)
+    return sum(por_tipo.values())
+
+
 def limpiar_datos_antiguos(dias=90):
     fecha_limite = datetime.now().date() - timedelta(days=dias)
     print(f'Eliminando datos anteriores a {fecha_limite}...')
 
-    cotizaciones_viejas = Cotizacion.objects.filter(fecha__lt=fecha_limite)
-    cantidad_cot = cotizaciones_viejas.count()
-    cotizaciones_viejas.delete()
-
-    indices_viejos = IndiceEconomico.objects.filter(fecha__lt=fecha_limite)
-    cantidad_ind = indices_viejos.count()
-    indices_viejos.delete()
+    cantidad_cot = _eliminar_por_tipo(Cotizacion.objects.filter(fecha__lt=fecha_limite), 'cotizaciones:')
+    cantidad_ind = _eliminar_por_tipo(IndiceEconomico.objects.filter(fecha__lt=fecha_limite), 'indices:')
+    
+    if cantidad_cot or cantidad_ind:
+        programar_actualizacion_resumen()
     
     print(f'✓ Eliminadas {cantidad_cot} cotizaciones')
     print(f'✓ Eliminados {cantidad_ind} índices económicos')
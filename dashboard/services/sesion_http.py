@@ -0,0 +1,54 @@
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+_sesion = None
+_lock = threading.Lock()
+
+
+def obtener_sesion():
+    """
+    Session HTTP única por proceso para los servicios argentinos.
+
+    Reutiliza conexiones keep-alive (un pool por host) en lugar de pagar un
+    handshake TCP+TLS por request, y reintenta errores transitorios con
+    backoff exponencial y jitter. Es segura para usar desde varios hilos.
+    """
+    global _sesion
+    with _lock:
+        if _sesion is None:
+            _sesion = _crear_sesion()
+        return _sesion
+
+
+def _crear_sesion():
+    reintentos = Retry(
+        total=getattr(settings, 'HTTP_REINTENTOS', 3),
+        connect=getattr(settings, 'HTTP_REINTENTOS', 3),
+        read=getattr(settings, 'HTTP_REINTENTOS', 3),
+        backoff_factor=getattr(settings, 'HTTP_BACKOFF', 0.5),
+        backoff_jitter=getattr(settings, 'HTTP_BACKOFF_JITTER', 0.5),
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=getattr(settings, 'HTTP_POOL_HOSTS', 10),
+        pool_maxsize=getattr(settings, 'HTTP_POOL_TAMANO', 10),
+        max_retries=reintentos
+    )
+
+    sesion = requests.Session()
+    sesion.mount('https://', adaptador)
+    sesion.mount('http://', adaptador)
+    sesion.headers.update({
+        'User-Agent': 'DashboardFinanciero/1.0',
+        'Accept': 'application/json',
+        'Connection': 'keep-alive'
+    })
+    return sesion
@@ -1,3 +1,721 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core import signing
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from . import analytics
+from .almacen_precios import AlmacenPrecios, dataframes_desde_bd
+from .indicadores_incrementales import EstadoRodante, ExtremoMovil, PromedioWilder, SumaMovil, WelfordMovil
+from .materializacion import actualizar_metricas_incrementales, calcular_metricas, materializar_metricas, rsi_wilder
+from .models import AccionInternacional, Cotizacion, EstadoIngesta, IndiceEconomico, MetricaAccion, PrecioAccion
+from .paginacion import ANTERIOR, paginar_por_cursor
+from .services.alpha_vantage_service import AlphaVantageService, SerieEnDisco
+from .services.cache_http import CacheHTTP, RespuestaArchivo, RespuestaCacheada
+from .services.ingesta import sincronizar_filas
+from .services.json_incremental import LectorObjetoJSON
+from .services.limitador_tasa import LimitadorTasa
+from .services.servicios_argentinos import BCRAMonetarioService, limpiar_datos_antiguos
+
+
+def _precios_aleatorios(dias, semilla=7, inicio=date(2024, 1, 1)):
+    """DataFrame de precios diarios hábiles (caminata aleatoria) indexado por fecha"""
+    generador = np.random.default_rng(semilla)
+    fechas = pd.bdate_range(inicio, periods=dias)
+    cierres = np.round(100 * np.cumprod(1 + generador.normal(0, 0.02, dias)), 2)
+    return pd.DataFrame({
+        'apertura': cierres,
+        'maximo': np.round(cierres * (1 + generador.uniform(0, 0.02, dias)), 2),
+        'minimo': np.round(cierres * (1 - generador.uniform(0, 0.02, dias)), 2),
+        'cierre': cierres,
+        'volumen': generador.integers(1_000, 100_000, dias).astype('f8'),
+    }, index=fechas)
+
+
+def _vacio(valor):
+    return valor is None or pd.isna(valor)
+
+
+class BackfillBCRATests(TestCase):
+    def setUp(self):
+        self.servicio = BCRAMonetarioService()
+        self.servicio.DIAS_POR_VENTANA = 5000
+
+    def _backfill(self, **kwargs):
+        with mock.patch.object(self.servicio, '_descargar_rango_variable', return_value=[]) as descarga:
+            resultado = self.servicio.backfill_variable(1, 'reservas', 'Millones USD', hasta=date(2025, 12, 31), **kwargs)
+        return resultado, descarga
+
+    def test_dato_diario_reciente_no_saltea_la_historia(self):
+        IndiceEconomico.objects.create(tipo='reservas', fecha=date(2025, 12, 20), valor=40000, unidad='Millones USD')
+
+        resultado, descarga = self._backfill()
+
+        self.assertEqual(resultado['desde'], BCRAMonetarioService.INICIO_HISTORICO)
+        self.assertEqual(descarga.call_args_list[0].args[1], BCRAMonetarioService.INICIO_HISTORICO)
+        self.assertEqual(EstadoIngesta.objects.get(clave='backfill:reservas').avance, date(2025, 12, 31))
+
+    def test_retoma_desde_el_avance_registrado(self):
+        EstadoIngesta.objects.create(clave='backfill:reservas', avance=date(2010, 6, 30))
+
+        resultado, descarga = self._backfill()
+
+        self.assertEqual(resultado['desde'], date(2010, 7, 1))
+        self.assertEqual(descarga.call_args_list[0].args[1], date(2010, 7, 1))
+
+    def test_rango_no_contiguo_no_mueve_el_avance(self):
+        self._backfill(desde=date(2020, 1, 1))
+
+        self.assertFalse(EstadoIngesta.objects.filter(clave='backfill:reservas', avance__isnull=False).exists())
+
+    def test_corte_queda_marcado_y_el_resumen_se_programa_una_vez(self):
+        self.servicio.DIAS_POR_VENTANA = 10
+        ventanas = [
+            [{'fecha': '2025-01-02', 'valor': 1}],
+            [{'fecha': '2025-01-12', 'valor': 2}],
+            None,
+        ]
+        with mock.patch.object(self.servicio, '_descargar_rango_variable', side_effect=ventanas), \
+                mock.patch('dashboard.services.servicios_argentinos.programar_actualizacion_resumen') as resumen:
+            resultado = self.servicio.backfill_variable(
+                1, 'reservas', 'Millones USD', desde=date(2025, 1, 1), hasta=date(2025, 12, 31)
+            )
+
+        self.assertTrue(resultado['interrumpido'])
+        self.assertEqual((resultado['ventanas'], resultado['escritos']), (2, 2))
+        resumen.assert_called_once()
+
+    def test_comando_falla_si_se_interrumpe(self):
+        with mock.patch.object(BCRAMonetarioService, '_descargar_rango_variable', return_value=None), \
+                self.assertRaises(CommandError):
+            call_command('backfill_bcra', variable='reservas', desde='2025-01-01', hasta='2025-01-31', stdout=StringIO())
+
+
+class LimpiarDatosAntiguosTests(TestCase):
+    def test_borrar_sube_la_version_de_los_tipos_afectados(self):
+        viejo = date.today() - timedelta(days=200)
+        Cotizacion.objects.create(tipo='blue', fecha=viejo, compra=1000, venta=1050)
+        Cotizacion.objects.create(tipo='mep', fecha=date.today(), compra=1100, venta=1150)
+        IndiceEconomico.objects.create(tipo='reservas', fecha=viejo, valor=40000, unidad='Millones USD')
+
+        with mock.patch('dashboard.services.servicios_argentinos.programar_actualizacion_resumen'):
+            resultado = limpiar_datos_antiguos(dias=90)
+
+        self.assertEqual(resultado, {'cotizaciones': 1, 'indices': 1})
+        versiones = dict(EstadoIngesta.objects.values_list('clave', 'version'))
+        self.assertEqual(versiones, {'cotizaciones:blue': 1, 'indices:reservas': 1})
+
+
+class CacheHTTPTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.cache = CacheHTTP(directorio.name, tamano_maximo=10 * 1024 * 1024)
+
+    def test_cuerpo_desalojado_despues_de_buscar_archivo_sigue_legible(self):
+        contenido = b'{"Time Series (Daily)": {}}' * 1000
+        self.cache._guardar(self.cache.clave('https://api', {'s': 'AAPL'}), 'https://api', {'s': 'AAPL'},
+                            RespuestaCacheada(200, contenido), ttl=60)
+
+        respuesta = self.cache.buscar_archivo('https://api', {'s': 'AAPL'})
+        self.cache.tamano_maximo = 0
+        self.cache._desalojar()
+
+        self.assertFalse(respuesta.ruta.exists())
+        self.assertEqual(b''.join(respuesta.iter_content(4096)), contenido)
+        respuesta.cerrar()
+        self.assertIsNone(self.cache.buscar_archivo('https://api', {'s': 'AAPL'}))
+
+    def _guardar(self, simbolo, contenido):
+        params = {'s': simbolo}
+        self.cache._guardar(self.cache.clave('https://api', params), 'https://api', params,
+                            RespuestaCacheada(200, contenido), ttl=60)
+
+    def test_cuerpo_borrado_durante_el_listado_se_omite(self):
+        self._guardar('AAPL', b'a' * 100)
+        desaparecido = Path(self.cache.directorio, 'zz', 'borrado.body')
+        listado = list(self.cache.directorio.glob('*/*.body')) + [desaparecido]
+
+        with mock.patch.object(Path, 'glob', return_value=listado):
+            self.assertEqual(self.cache._calcular_tamano(), 100)
+            self.cache.tamano_maximo = 50
+            self.cache._desalojar()
+
+        self.assertEqual(self.cache._tamano_actual, 0)
+
+    def test_reemplazar_una_entrada_no_suma_dos_veces(self):
+        self._guardar('AAPL', b'a' * 100)
+        self._guardar('MSFT', b'b' * 100)
+        self._guardar('AAPL', b'a' * 300)
+
+        self.assertEqual(self.cache._tamano_actual, 400)
+        self.assertEqual(self.cache._tamano_actual, self.cache._calcular_tamano())
+
+
+class LimitadorTasaTests(SimpleTestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = f'{directorio.name}/limitador.sqlite3'
+
+    def _limitador(self, por_minuto=5, por_dia=25):
+        return LimitadorTasa('prueba', por_minuto, por_dia, self.ruta, zona_horaria='America/New_York')
+
+    def test_un_presupuesto_nuevo_se_aplica_al_registro_existente(self):
+        limitador = self._limitador()
+        limitador.registrar_limite('Our standard API rate limit is 5 requests per minute')
+        self.assertEqual(self._limitador().estado()['capacidad'], 2.5)
+
+        self.assertEqual(self._limitador(por_minuto=75).estado()['capacidad'], 75)
+        self.assertEqual(self._limitador(por_minuto=3).estado()['capacidad'], 3)
+
+    def test_el_dia_es_el_del_proveedor(self):
+        # 03:00 UTC del 2 de enero son las 22:00 del 1 de enero en Nueva York
+        ahora = datetime(2026, 1, 2, 3, 0, tzinfo=timezone.utc).timestamp()
+        with mock.patch('dashboard.services.limitador_tasa.time.time', return_value=ahora):
+            self.assertEqual(self._limitador().estado()['dia'], '2026-01-01')
+
+
+class LectorObjetoJSONTests(SimpleTestCase):
+    DOCUMENTO = {
+        'Meta Data': {'1. Information': 'Daily "ajustado" \\ con ñ y €', '2. Symbol': 'AAPL'},
+        'Time Series (Daily)': {
+            '2024-01-03': {'1. open': '184.22', '6. volume': 58414460},
+            '2024-01-02': {'1. open': '187.15', '6. volume': 82488700, '7. nota': 'a\nb\u00e9'},
+        },
+        'Note': None,
+    }
+
+    def _entradas(self, contenido, tamano):
+        bloques = [contenido[i:i + tamano] for i in range(0, len(contenido), tamano)]
+        lector = LectorObjetoJSON(bloques, 'Time Series (Daily)')
+        return lector, list(lector.entradas())
+
+    def test_bloques_partidos_en_cualquier_byte(self):
+        contenido = json.dumps(self.DOCUMENTO, ensure_ascii=False, indent=2).encode('utf-8')
+        for tamano in (1, 2, 3, 7, len(contenido)):
+            with self.subTest(tamano=tamano):
+                lector, entradas = self._entradas(contenido, tamano)
+                self.assertEqual(dict(entradas), self.DOCUMENTO['Time Series (Daily)'])
+                self.assertEqual(lector.otros, {'Meta Data': self.DOCUMENTO['Meta Data'], 'Note': None})
+                self.assertTrue(lector.serie_encontrada)
+
+    def test_numero_al_final_de_un_bloque_no_se_corta(self):
+        lector, entradas = self._entradas(b'{"Time Series (Daily)": {"a": 12345}}', 17)
+        self.assertEqual(entradas, [('a', 12345)])
+
+    def test_sin_serie(self):
+        lector, entradas = self._entradas(b'{"Note": "Thank you for using Alpha Vantage!"}', 5)
+        self.assertEqual(entradas, [])
+        self.assertFalse(lector.serie_encontrada)
+        self.assertIn('Note', lector.otros)
+
+    def test_documento_truncado(self):
+        contenido = json.dumps(self.DOCUMENTO).encode('utf-8')
+        for corte in (1, len(contenido) // 2, len(contenido) - 1):
+            with self.subTest(corte=corte), self.assertRaises(ValueError):
+                self._entradas(contenido[:corte], 4)
+
+
+class GuardarSerieStreamTests(TestCase):
+    def setUp(self):
+        self.accion = AccionInternacional.objects.create(simbolo='AAPL', nombre='Apple')
+        self.servicio = AlphaVantageService(api_key='demo', limitador=mock.Mock(), cache=mock.Mock())
+        self.servicio.TAMANO_LOTE = 2
+
+    def _serie(self, contenido):
+        archivo = tempfile.NamedTemporaryFile(delete=False)
+        archivo.write(contenido)
+        archivo.seek(0)
+        return SerieEnDisco(RespuestaArchivo(200, archivo, temporal=True), {'symbol': 'AAPL'})
+
+    def _documento(self):
+        serie = {
+            f'2024-01-0{dia}': {'1. open': '10', '2. high': '11', '3. low': '9', '4. close': '10.5', '6. volume': '100'}
+            for dia in range(2, 7)
+        }
+        return json.dumps({'Meta Data': {}, 'Time Series (Daily)': serie}).encode('utf-8')
+
+    def test_cuerpo_truncado_no_deja_escrituras_ni_cuenta_exito(self):
+        contenido = self._documento()
+        resultado = self.servicio._guardar_serie_stream('AAPL', self._serie(contenido[:-40]), self.accion)
+
+        self.assertIsNone(resultado)
+        self.assertFalse(PrecioAccion.objects.exists())
+        self.assertFalse(EstadoIngesta.objects.filter(clave='precios:AAPL', version__gt=0).exists())
+        self.servicio.limitador.registrar_exito.assert_not_called()
+        self.servicio.cache.invalidar.assert_called_once()
+
+    def test_cuerpo_completo(self):
+        resultado = self.servicio._guardar_serie_stream('AAPL', self._serie(self._documento()), self.accion)
+
+        self.assertEqual((resultado['insertados'], resultado['total']), (5, 5))
+        self.assertEqual(PrecioAccion.objects.count(), 5)
+        self.servicio.limitador.registrar_exito.assert_called_once()
+
+
+class AlmacenPreciosTests(TestCase):
+    def setUp(self):
+        self.accion = AccionInternacional.objects.create(simbolo='AAPL', nombre='Apple')
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.almacen = AlmacenPrecios(self.directorio.name)
+        self._escribir(_precios_aleatorios(60))
+
+    def _escribir(self, precios):
+        """Precios como los deja la ingesta: filas nuevas y la versión de 'precios:AAPL' subida"""
+        PrecioAccion.objects.bulk_create([
+            PrecioAccion(accion=self.accion, fecha=fecha.date(), cierre_ajustado=fila['cierre'], **fila.to_dict())
+            for fecha, fila in precios.iterrows()
+        ])
+        EstadoIngesta.registrar('precios:AAPL', escritas=len(precios))
+
+    def test_ida_y_vuelta_igual_que_la_base(self):
+        self.assertEqual(self.almacen.reconstruir('AAPL'), 60)
+        desde = date(2024, 2, 1)
+
+        pd.testing.assert_frame_equal(
+            self.almacen.dataframe('AAPL', 1, desde=desde),
+            dataframes_desde_bd(['AAPL'], desde=desde)['AAPL']
+        )
+        pd.testing.assert_frame_equal(self.almacen.dataframe('AAPL', 1), dataframes_desde_bd(['AAPL'])['AAPL'])
+
+    def test_archivo_viejo_no_se_usa(self):
+        self.almacen.reconstruir('AAPL')
+        self._escribir(_precios_aleatorios(1, inicio=date(2024, 6, 3)))
+
+        self.assertFalse(self.almacen.al_dia('AAPL'))
+        with mock.patch.object(AlmacenPrecios, '_compartido', self.almacen), \
+                override_settings(PRECIOS_COLUMNAR_ACTIVO=True):
+            leidos = analytics.AnalizadorMercadoInternacional()._leer_dataframes(['AAPL'], date(2024, 1, 1))
+        self.assertEqual(len(leidos['AAPL']), 61)
+
+        self.almacen.reconstruir('AAPL')
+        self.assertTrue(self.almacen.al_dia('AAPL'))
+        self.assertEqual([ruta.name for ruta in Path(self.directorio.name).glob('*.npy')], ['AAPL.v2.npy'])
+
+
+@override_settings(ANALITICA_CACHE_ACTIVA=False, PRECIOS_COLUMNAR_ACTIVO=False)
+class CorrelacionDolarBlueTests(TestCase):
+    HOY = date(2024, 3, 1)
+
+    def setUp(self):
+        generador = np.random.default_rng(11)
+        for semilla, simbolo in enumerate(('AAPL', 'MSFT')):
+            accion = AccionInternacional.objects.create(simbolo=simbolo, nombre=simbolo)
+            precios = _precios_aleatorios(25, semilla=semilla, inicio=date(2024, 1, 25))
+            PrecioAccion.objects.bulk_create([
+                PrecioAccion(accion=accion, fecha=fecha.date(), cierre_ajustado=fila['cierre'], **fila.to_dict())
+                for fecha, fila in precios.iterrows()
+            ])
+        for tipo in ('blue', 'mep'):
+            ventas = 1000 * np.cumprod(1 + generador.normal(0, 0.01, 35))
+            Cotizacion.objects.bulk_create([
+                Cotizacion(tipo=tipo, fecha=date(2024, 1, 27) + timedelta(days=dia), compra=round(venta, 2), venta=round(venta, 2))
+                for dia, venta in enumerate(ventas)
+            ])
+
+    def test_igual_a_la_matriz_leyendo_solo_el_simbolo(self):
+        contexto = analytics.ContextoDatos(hoy=self.HOY)
+        correlacion = analytics.AnalizadorMercadoInternacional(contexto=contexto).calcular_correlacion_dolar_blue('AAPL')
+
+        matriz = analytics.AnalizadorMercadoInternacional(
+            contexto=analytics.ContextoDatos(hoy=self.HOY)
+        ).calcular_matriz_correlacion(dias=30)
+        self.assertIsNotNone(correlacion)
+        self.assertEqual(correlacion, round(float(matriz.loc['AAPL', 'dolar_blue']), 3))
+        self.assertEqual(contexto.estadisticas()['fallos'], 1)
+
+
+class PlanificarIncrementalTests(TestCase):
+    OBJETIVO = date(2025, 3, 14)  # viernes
+
+    def _con_ultima_fecha(self, simbolo, dias_habiles_antes):
+        accion = AccionInternacional.objects.create(simbolo=simbolo, nombre=simbolo)
+        fecha = np.busday_offset(self.OBJETIVO, -dias_habiles_antes).astype(date)
+        PrecioAccion.objects.create(
+            accion=accion, fecha=fecha, apertura=1, maximo=1, minimo=1, cierre=1, cierre_ajustado=1, volumen=1
+        )
+        return fecha
+
+    def test_hueco_elige_compact_o_full(self):
+        servicio = AlphaVantageService(api_key='demo', limitador=mock.Mock(), cache=mock.Mock())
+        limite = servicio.DIAS_HABILES_COMPACT
+        corto = self._con_ultima_fecha('CORTO', 10)
+        borde = self._con_ultima_fecha('BORDE', limite - 1)
+        largo = self._con_ultima_fecha('LARGO', limite)
+        self._con_ultima_fecha('ALDIA', 0)
+
+        with mock.patch('dashboard.services.alpha_vantage_service.ultimo_dia_habil', return_value=self.OBJETIVO):
+            plan = servicio._planificar_incremental(['NUEVO', 'CORTO', 'BORDE', 'LARGO', 'ALDIA'])
+
+        self.assertEqual(plan, {
+            'NUEVO': ('compact', None),
+            'CORTO': ('compact', corto),
+            'BORDE': ('compact', borde),
+            'LARGO': ('full', largo),
+        })
+
+
+class IndicadoresTecnicosTests(SimpleTestCase):
+    """La librería vectorizada contra las mismas cuentas en pandas, símbolo por símbolo"""
+
+    def setUp(self):
+        paneles = [_precios_aleatorios(120, semilla=semilla) for semilla in (1, 2, 3)]
+        self.columnas = {
+            campo: np.column_stack([panel[campo].to_numpy() for panel in paneles])
+            for campo in ('maximo', 'minimo', 'cierre', 'volumen')
+        }
+        # Huecos distintos por símbolo: un día suelto y una racha
+        self.columnas['cierre'][[5, 40, 41, 42], 1] = np.nan
+        self.columnas['volumen'][70, 2] = np.nan
+
+    def _serie(self, campo, columna, validos):
+        return pd.Series(self.columnas[campo][validos, columna])
+
+    def _referencias(self, columna):
+        """{indicador: serie pandas} sobre las observaciones válidas del símbolo, y la máscara"""
+        validos = np.logical_and.reduce([np.isfinite(matriz[:, columna]) for matriz in self.columnas.values()])
+        alto, bajo = self._serie('maximo', columna, validos), self._serie('minimo', columna, validos)
+        cierre, volumen = self._serie('cierre', columna, validos), self._serie('volumen', columna, validos)
+
+        def wilder(serie, periodos):
+            return serie.ewm(alpha=1 / periodos, adjust=False).mean().where(serie.index >= serie.index[0] + periodos - 1)
+
+        cambios = cierre.diff().iloc[1:]
+        ganancias, perdidas = wilder(cambios.clip(lower=0), 14), wilder(-cambios.clip(upper=0), 14)
+        rsi = (100 - 100 / (1 + ganancias / perdidas)).where(perdidas != 0, 100.0).where(ganancias.notna())
+
+        rapida = cierre.ewm(span=12, adjust=False).mean()
+        lenta = cierre.ewm(span=26, adjust=False).mean()
+        linea = (rapida - lenta).where(cierre.index >= 25)
+        senal = linea.iloc[25:].ewm(span=9, adjust=False).mean()
+        senal = senal.where(senal.index >= 25 + 8)
+
+        media, desvio = cierre.rolling(20).mean(), cierre.rolling(20).std(ddof=0)
+        anterior = cierre.shift(1).fillna(cierre)
+        rango = pd.concat([alto - bajo, (alto - anterior).abs(), (bajo - anterior).abs()], axis=1).max(axis=1)
+
+        return validos, {
+            'media_movil_20': media,
+            'media_exponencial_20': cierre.ewm(span=20, adjust=False).mean().where(cierre.index >= 19),
+            'rsi': rsi.reindex(cierre.index),
+            'macd': linea,
+            'macd_senal': senal.reindex(cierre.index),
+            'macd_histograma': (linea - senal).reindex(cierre.index),
+            'bollinger_superior': media + 2 * desvio,
+            'bollinger_inferior': media - 2 * desvio,
+            'atr': wilder(rango, 14),
+            'obv': (np.sign(cierre.diff()).fillna(0) * volumen).cumsum(),
+        }
+
+    def test_coinciden_con_pandas_con_huecos(self):
+        resultado = analytics.indicadores_tecnicos(
+            self.columnas['maximo'], self.columnas['minimo'], self.columnas['cierre'], self.columnas['volumen']
+        )
+        for columna in range(3):
+            validos, referencias = self._referencias(columna)
+            for nombre, referencia in referencias.items():
+                with self.subTest(simbolo=columna, indicador=nombre):
+                    calculado = resultado[nombre][:, columna]
+                    self.assertTrue(np.isnan(calculado[~validos]).all())
+                    np.testing.assert_allclose(calculado[validos], referencia.to_numpy(), rtol=1e-9, atol=1e-9)
+
+    def test_funciones_sueltas_igual_que_el_conjunto(self):
+        cierre = self.columnas['cierre']
+        conjunto = analytics.indicadores_tecnicos(
+            self.columnas['maximo'], self.columnas['minimo'], cierre, self.columnas['volumen']
+        )
+        # Las funciones sueltas solo ven los huecos del cierre: se comparan en el símbolo sin otros huecos
+        for nombre, calculado in (
+            ('media_movil_20', analytics.media_movil_simple(cierre)),
+            ('media_exponencial_20', analytics.media_movil_exponencial(cierre)),
+            ('rsi', analytics.rsi(cierre)),
+            ('macd_senal', analytics.macd(cierre)[1]),
+            ('bollinger_superior', analytics.bandas_bollinger(cierre)[1]),
+        ):
+            with self.subTest(indicador=nombre):
+                np.testing.assert_allclose(calculado[:, :2], conjunto[nombre][:, :2], equal_nan=True)
+
+    def test_un_solo_simbolo(self):
+        cierre = self.columnas['cierre'][:, 1]
+        np.testing.assert_allclose(
+            analytics.media_movil_simple(cierre, ventana=5),
+            analytics.media_movil_simple(self.columnas['cierre'], ventana=5)[:, 1],
+            equal_nan=True,
+        )
+
+
+class IndicadoresIncrementalesTests(SimpleTestCase):
+    def setUp(self):
+        self.df = _precios_aleatorios(300)
+
+    def test_suma_y_welford_moviles_coinciden_con_rolling(self):
+        retornos = self.df['cierre'].pct_change().dropna() * 100
+        medias = retornos.rolling(20).mean()
+        desvios = retornos.rolling(20, min_periods=2).std()
+        suma, welford = SumaMovil(20), WelfordMovil(20)
+        for retorno, media, desvio in zip(retornos, medias, desvios):
+            suma.agregar(retorno)
+            welford.agregar(retorno)
+            self.assertEqual(suma.media() is None, _vacio(media))
+            if suma.media() is not None:
+                self.assertAlmostEqual(suma.media(), media, places=9)
+            self.assertEqual(welford.desvio() is None, _vacio(desvio))
+            if welford.desvio() is not None:
+                self.assertAlmostEqual(welford.desvio(), desvio, places=9)
+
+    def test_wilder_coincide_con_rsi_wilder(self):
+        esperado = rsi_wilder(self.df['cierre'])
+        wilder = PromedioWilder()
+        for cambio, rsi in zip(self.df['cierre'].diff().iloc[1:], esperado.iloc[1:]):
+            wilder.agregar(cambio)
+            self.assertEqual(wilder.rsi() is None, _vacio(rsi))
+            if wilder.rsi() is not None:
+                self.assertAlmostEqual(wilder.rsi(), rsi, places=9)
+
+    def test_extremos_de_52_semanas_con_huecos(self):
+        df = self.df.drop(self.df.index[40:60])
+        maximos = df['maximo'].rolling('365D').max()
+        minimos = df['minimo'].rolling('365D').min()
+        maximo, minimo = ExtremoMovil(365, True), ExtremoMovil(365, False)
+        for fecha, fila in df.iterrows():
+            maximo.agregar(fecha.toordinal(), fila['maximo'])
+            minimo.agregar(fecha.toordinal(), fila['minimo'])
+            self.assertEqual(maximo.valor(), maximos[fecha])
+            self.assertEqual(minimo.valor(), minimos[fecha])
+
+    def test_estado_rodante_coincide_con_calcular_metricas(self):
+        estado = EstadoRodante()
+        for fecha, fila in self.df.iterrows():
+            # Ida y vuelta por JSON, como entre dos ingestas
+            estado = EstadoRodante.desde_dict(json.loads(json.dumps(estado.a_dict())))
+            metricas = estado.agregar(fecha.date(), fila['maximo'], fila['minimo'], fila['cierre'], fila['volumen'])
+
+        blue = pd.Series(dtype='float64', index=pd.DatetimeIndex([]))
+        for periodo in ('D', 'W', 'M'):
+            esperado = calcular_metricas(self.df, blue, periodo).iloc[-1]
+            for campo, valor in metricas[periodo].items():
+                with self.subTest(periodo=periodo, campo=campo):
+                    self.assertEqual(_vacio(valor), _vacio(esperado[campo]))
+                    if not _vacio(valor):
+                        self.assertAlmostEqual(valor, esperado[campo], places=6)
+
+
+class MetricasIncrementalesTests(TestCase):
+    def setUp(self):
+        self.df = _precios_aleatorios(140)
+        self.accion = AccionInternacional.objects.create(simbolo='AAPL', nombre='Apple')
+        blue = np.round(1000 * np.cumprod(1 + np.random.default_rng(3).normal(0, 0.01, len(self.df))), 2)
+        Cotizacion.objects.bulk_create(
+            Cotizacion(tipo='blue', fecha=fecha.date(), compra=Decimal(str(venta)), venta=Decimal(str(venta)))
+            for fecha, venta in zip(self.df.index, blue)
+        )
+
+    def _cargar_precios(self, df):
+        PrecioAccion.objects.bulk_create(
+            PrecioAccion(accion=self.accion, fecha=fecha.date(), cierre_ajustado=fila['cierre'], **fila.to_dict())
+            for fecha, fila in df.iterrows()
+        )
+
+    def _metricas(self):
+        return {
+            (fecha, periodo): valores
+            for fecha, periodo, *valores in MetricaAccion.objects.filter(accion=self.accion).values_list(
+                'fecha', 'periodo', 'retorno', 'volatilidad', 'volumen_promedio', 'rsi', 'media_movil_20',
+                'media_movil_50', 'maximo_52_semanas', 'minimo_52_semanas', 'correlacion_dolar_blue'
+            )
+        }
+
+    def test_correlacion_blue_es_de_retornos(self):
+        self._cargar_precios(self.df)
+        materializar_metricas(['AAPL'])
+
+        ultima = MetricaAccion.objects.filter(accion=self.accion, periodo='D').order_by('-fecha').first()
+        blue = pd.Series(
+            {pd.Timestamp(fecha): float(venta) for fecha, venta in Cotizacion.objects.values_list('fecha', 'venta')}
+        ).sort_index()
+        retornos = pd.concat([self.df['cierre'].pct_change(), blue.pct_change()], axis=1).dropna()
+        ventana = retornos[retornos.index > pd.Timestamp(ultima.fecha) - pd.Timedelta(days=30)]
+        self.assertAlmostEqual(ultima.correlacion_dolar_blue, ventana.corr().iloc[0, 1], places=9)
+
+    def test_incremental_igual_a_materializacion_completa(self):
+        self._cargar_precios(self.df.iloc[:-12])
+        materializar_metricas(['AAPL'])
+        self._cargar_precios(self.df.iloc[-12:])
+
+        actualizar_metricas_incrementales('AAPL', {'insertados': 12, 'actualizados': 0})
+        incrementales = self._metricas()
+        materializar_metricas(['AAPL'])
+        completas = self._metricas()
+
+        self.assertEqual(incrementales.keys(), completas.keys())
+        for clave, valores in completas.items():
+            for incremental, completo in zip(incrementales[clave], valores):
+                with self.subTest(clave=clave):
+                    self.assertEqual(_vacio(incremental), _vacio(completo))
+                    if not _vacio(completo):
+                        self.assertAlmostEqual(incremental, completo, places=6)
+
+
+class PaginacionCursorTests(TestCase):
+    def setUp(self):
+        # Varias filas por fecha: el orden dentro de una fecha lo desempata el tipo
+        for dia in range(10):
+            for tipo in ('blue', 'ccl', 'mep'):
+                Cotizacion.objects.create(tipo=tipo, fecha=date(2025, 1, 1) + timedelta(days=dia), compra=1, venta=1)
+        self.orden = [(fila.fecha, fila.tipo) for fila in Cotizacion.objects.order_by('-fecha', 'tipo')]
+
+    def _claves(self, pagina):
+        return [(fila.fecha, fila.tipo) for fila in pagina]
+
+    def test_recorre_hacia_adelante_y_hacia_atras(self):
+        paginas = [paginar_por_cursor(Cotizacion.objects.all(), None, 4)]
+        while paginas[-1].has_next():
+            paginas.append(paginar_por_cursor(Cotizacion.objects.all(), paginas[-1].cursor_siguiente, 4))
+
+        self.assertEqual([clave for pagina in paginas for clave in self._claves(pagina)], self.orden)
+        self.assertFalse(paginas[0].has_previous())
+        self.assertEqual(len(paginas[-1]), 2)
+
+        anterior = paginar_por_cursor(Cotizacion.objects.all(), paginas[-1].cursor_anterior, 4)
+        self.assertEqual(self._claves(anterior), self._claves(paginas[-2]))
+        self.assertTrue(anterior.has_next())
+
+        primera = paginar_por_cursor(Cotizacion.objects.all(), paginas[1].cursor_anterior, 4)
+        self.assertEqual(self._claves(primera), self.orden[:4])
+        self.assertFalse(primera.has_previous())
+
+    def test_corte_en_medio_de_una_fecha(self):
+        primera = paginar_por_cursor(Cotizacion.objects.all(), None, 2)
+        segunda = paginar_por_cursor(Cotizacion.objects.all(), primera.cursor_siguiente, 2)
+        self.assertEqual(self._claves(segunda), self.orden[2:4])
+        self.assertEqual(segunda.object_list[0].fecha, primera.object_list[-1].fecha)
+
+    def test_cursor_alterado_vuelve_a_la_primera_pagina(self):
+        pagina = paginar_por_cursor(Cotizacion.objects.all(), None, 4)
+        alterados = [
+            pagina.cursor_siguiente[:-2] + 'xx',
+            signing.dumps([ANTERIOR, '2025-01-05', 'blue'], salt='otra'),
+            'no-es-un-cursor',
+        ]
+        for cursor in alterados:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self._claves(paginar_por_cursor(Cotizacion.objects.all(), cursor, 4)), self.orden[:4])
+
+
+class SincronizarFilasTests(TestCase):
+    def _sincronizar(self, venta):
+        return sincronizar_filas(
+            Cotizacion, ['tipo', 'fecha'], ['compra', 'venta'],
+            [{'tipo': 'blue', 'fecha': date(2025, 1, 2), 'compra': '1000.00', 'venta': venta}],
+            clave_estado='cotizaciones:blue'
+        )
+
+    def test_filas_iguales_no_se_reescriben(self):
+        self._sincronizar('1050.00')
+        actualizado = Cotizacion.objects.get().actualizado
+
+        resultado = self._sincronizar('1050')
+
+        self.assertEqual((resultado['insertados'], resultado['actualizados'], resultado['sin_cambios']), (0, 0, 1))
+        self.assertEqual(Cotizacion.objects.get().actualizado, actualizado)
+        estado = EstadoIngesta.objects.get(clave='cotizaciones:blue')
+        self.assertEqual((estado.version, estado.escrituras_evitadas), (1, 1))
+
+    def test_cambio_sube_la_version(self):
+        self._sincronizar('1050.00')
+
+        resultado = self._sincronizar('1060.00')
+
+        self.assertEqual(resultado['actualizados'], 1)
+        self.assertEqual(Cotizacion.objects.get().venta, Decimal('1060.00'))
+        self.assertEqual(EstadoIngesta.objects.get(clave='cotizaciones:blue').version, 2)
+
+    def test_lote_mixto_con_clave_por_tipo(self):
+        def fila(tipo, dia, venta):
+            return {'tipo': tipo, 'fecha': date(2025, 1, dia), 'compra': '1000.00', 'venta': venta}
+
+        sincronizar_filas(
+            Cotizacion, ['tipo', 'fecha'], ['compra', 'venta'],
+            [fila('blue', 2, '1050.00'), fila('blue', 3, '1060.00'), fila('mep', 2, '1100.00')],
+            clave_estado=lambda fila: f"cotizaciones:{fila['tipo']}"
+        )
+
+        resultado = sincronizar_filas(
+            Cotizacion, ['tipo', 'fecha'], ['compra', 'venta'],
+            [
+                fila('blue', 2, '1050.00'),   # igual
+                fila('blue', 3, '1065.00'),   # cambia
+                fila('blue', 4, '1070.00'),   # nueva
+                fila('mep', 2, '1100'),       # igual con otra precisión
+            ],
+            clave_estado=lambda fila: f"cotizaciones:{fila['tipo']}",
+            batch_size=1,
+            devolver_objetos=True
+        )
+
+        self.assertEqual(
+            (resultado['insertados'], resultado['actualizados'], resultado['sin_cambios'], resultado['total']),
+            (1, 1, 2, 4)
+        )
+        self.assertEqual(
+            [situacion for _, situacion in resultado['objetos']],
+            ['sin_cambios', 'actualizado', 'insertado', 'sin_cambios']
+        )
+        self.assertEqual(Cotizacion.objects.count(), 4)
+        self.assertEqual(Cotizacion.objects.get(tipo='blue', fecha=date(2025, 1, 3)).venta, Decimal('1065.00'))
+        estados = {
+            estado.clave: (estado.version, estado.escrituras_evitadas)
+            for estado in EstadoIngesta.objects.all()
+        }
+        # blue escribió en las dos llamadas; mep solo en la primera
+        self.assertEqual(estados, {'cotizaciones:blue': (2, 1), 'cotizaciones:mep': (1, 1)})
+
+
+class GetCondicionalTests(TestCase):
+    def _sincronizar(self, tipo, venta):
+        sincronizar_filas(
+            Cotizacion, ['tipo', 'fecha'], ['compra', 'venta'],
+            [{'tipo': tipo, 'fecha': date(2025, 1, 2), 'compra': '1000.00', 'venta': venta}],
+            clave_estado=f'cotizaciones:{tipo}'
+        )
+
+    def test_304_mientras_no_cambien_los_datos(self):
+        self._sincronizar('blue', '1050.00')
+        url = reverse('cotizaciones')
+
+        primera = self.client.get(url)
+        self.assertEqual(primera.status_code, 200)
+        self.assertIn('no-cache', primera['Cache-Control'])
+
+        repetida = self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida.content, b'')
+
+        self._sincronizar('blue', '1050')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304)
+
+        self._sincronizar('mep', '1150.00')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 200)
+
+    def test_validar_tabla_no_recorre_la_tabla(self):
+        self._sincronizar('blue', '1050.00')
+        url = reverse('cotizaciones')
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        with mock.patch('dashboard.services.servicios_argentinos.programar_actualizacion_resumen'):
+            limpiar_datos_antiguos(dias=(date.today() - date(2025, 1, 3)).days)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
@@ -7,4 +7,6 @@ urlpatterns = [
     path('indices/', views.IndicesListView.as_view(), name='indices'),
     path('actualizar/', views.actualizar_datos_manual, name='actualizar'),
     path('mercado-internacional/', views.MercadoInternacionalView.as_view(), name='mercado_internacional'),
-]
\ No newline at end of file
+    path('correlaciones/', views.CorrelacionesView.as_view(), name='correlaciones'),
+    path('perfil-sql/', views.perfil_sql, name='perfil_sql'),
+]
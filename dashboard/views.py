@@ -1,86 +1,78 @@
 # dashboard/views.py
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.views.generic import TemplateView, ListView
 from django.utils import timezone
 from datetime import date, timedelta
 from .models import Cotizacion, IndiceEconomico
+from .resumen import obtener_resumen
 from .services import actualizar_todos_los_datos
-from .analytics import (AnalizadorMercadoInternacional, obtener_resumen_mercado, generar_grafico_heatmap_rendimientos)
-from .models import AccionInternacional
+from .analytics import (AnalizadorMercadoInternacional, ContextoDatos, ETIQUETAS_SERIES, obtener_resumen_mercado, generar_grafico_heatmap_rendimientos)
+from .cache_analitica import estadisticas_cache
+from .condicional import (condicional, validar_correlaciones, validar_dashboard, validar_mercado_internacional, validar_tabla)
+from .paginacion import PaginacionCursorMixin
+from .perfil_sql import resumen_por_vista, ultimas_requests
+from .models import AccionInternacional, PrecioAccion
 import plotly.express as px
 import pandas as pd
 from django.db.models import Count
 
 
+@method_decorator(condicional(validar_dashboard), name='dispatch')
 class DashboardView(TemplateView):
     """Vista principal del dashboard con resumen de datos"""
     template_name = 'dashboard/dashboard.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        hoy = date.today()
-        ayer = hoy - timedelta(days=1)
-        
-        # Cotizaciones de hoy
-        cotizaciones_hoy = Cotizacion.objects.filter(fecha=hoy)
-        
-        # Cotizaciones de ayer para comparar
-        cotizaciones_ayer = Cotizacion.objects.filter(fecha=ayer)
-        
-        # Índices económicos de hoy
-        indices_hoy = IndiceEconomico.objects.filter(fecha=hoy)
-        
-        # Calcular cambios porcentuales
-        context['cotizaciones'] = []
-        for tipo in ['oficial', 'blue', 'mep', 'ccl']:
-            try:
-                cot_hoy = cotizaciones_hoy.get(tipo=tipo)
-                cot_ayer = cotizaciones_ayer.get(tipo=tipo)
-                
-                # Calcular variación
-                variacion = ((cot_hoy.venta - cot_ayer.venta) / cot_ayer.venta) * 100
-                
-                context['cotizaciones'].append({
-                    'tipo': cot_hoy.get_tipo_display(),
-                    'codigo': tipo,
-                    'compra': cot_hoy.compra,
-                    'venta': cot_hoy.venta,
-                    'diferencia': cot_hoy.diferencia_precio(),
-                    'spread': cot_hoy.spread_porcentual(),
-                    'variacion': variacion,
-                    'actualizado': cot_hoy.actualizado,
-                })
-            except Cotizacion.DoesNotExist:
-                pass
-        
-        # Índices económicos
-        context['indices'] = []
-        for indice in indices_hoy:
-            context['indices'].append({
-                'nombre': indice.get_tipo_display(),
-                'valor': indice.valor,
-                'unidad': indice.unidad,
-                'actualizado': indice.actualizado,
-            })
-        
-        # Calcular brecha cambiaria
+        
+        # Cotizaciones, índices, brecha y totales precalculados por la ingesta (una lectura)
+        resumen = obtener_resumen()
+        context['cotizaciones'] = resumen['cotizaciones']
+        context['indices'] = resumen['indices']
+        context['brecha_cambiaria'] = resumen['brecha_cambiaria']
+        context['total_cotizaciones'] = resumen['total_cotizaciones']
+        context['total_indices'] = resumen['total_indices']
+        context['hoy'] = date.today()
+        
+        # Resumen mercado internacional
+        contexto_datos = ContextoDatos(dias=30)
         try:
-            oficial = cotizaciones_hoy.get(tipo='oficial')
-            blue = cotizaciones_hoy.get(tipo='blue')
-            context['brecha_cambiaria'] = ((blue.venta - oficial.venta) / oficial.venta) * 100
-        except Cotizacion.DoesNotExist:
-            context['brecha_cambiaria'] = None
+            analizador = AnalizadorMercadoInternacional(contexto=contexto_datos)
+            
+            # Obtener métricas para símbolos principales
+            simbolos_principales = ['AAPL', 'MSFT', 'SPY']
+            metricas_internacionales = analizador.generar_tabla_metricas(simbolos_principales, dias=7)
+            
+            context['metricas_internacionales'] = metricas_internacionales
+            
+            # Calcular correlación dólar blue vs acciones (ejemplo)
+            if metricas_internacionales:
+                context['correlacion_aapl_blue'] = analizador.calcular_correlacion_dolar_blue('AAPL', 30)
+            
+            # Correlación de retornos con cada tipo de dólar (misma matriz que la vista de correlaciones)
+            context['correlaciones_dolar'] = analizador.tabla_correlaciones_dolar(simbolos_principales, dias=90)
+            
+            # Gráfico mini comparativo
+            context['grafico_mini_internacional'] = analizador.generar_grafico_comparativo(
+                ['AAPL', 'SPY'], dias=7
+            )
+            
+        except Exception as e:
+            print(f"Error cargando datos internacionales: {e}")
+            context['metricas_internacionales'] = []
         
-        # Estadísticas generales
-        context['total_cotizaciones'] = Cotizacion.objects.count()
-        context['total_indices'] = IndiceEconomico.objects.count()
-        context['hoy'] = hoy
+        # Reuso de ventanas de precios en la request, para la página perfil_sql
+        self.request.datos_precios = contexto_datos.estadisticas()
         
         return context
 
 
-class CotizacionesListView(ListView):
-    """Lista de todas las cotizaciones históricas"""
+@method_decorator(condicional(validar_tabla('cotizaciones:')), name='dispatch')
+class CotizacionesListView(PaginacionCursorMixin, ListView):
+    """Lista de todas las cotizaciones históricas (paginada por cursor sobre fecha y tipo)"""
     model = Cotizacion
     template_name = 'dashboard/cotizaciones_list.html'
     context_object_name = 'cotizaciones'
@@ -102,8 +94,9 @@ class CotizacionesListView(ListView):
         return queryset
 
 
-class IndicesListView(ListView):
-    """Lista de todos los índices económicos históricos"""
+@method_decorator(condicional(validar_tabla('indices:')), name='dispatch')
+class IndicesListView(PaginacionCursorMixin, ListView):
+    """Lista de todos los índices económicos históricos (paginada por cursor sobre fecha y tipo)"""
     model = IndiceEconomico
     template_name = 'dashboard/indices_list.html'
     context_object_name = 'indices'
@@ -125,6 +118,20 @@ class IndicesListView(ListView):
         return queryset
 
 
+def perfil_sql(request):
+    """Resumen de consultas SQL por vista (requiere PERFIL_SQL_ACTIVO; solo en DEBUG o para staff)"""
+    if not getattr(settings, 'PERFIL_SQL_ACTIVO', False) or not (settings.DEBUG or request.user.is_staff):
+        raise Http404
+    
+    return render(request, 'dashboard/perfil_sql.html', {
+        'vistas': resumen_por_vista(),
+        'ultimas': ultimas_requests()[:20],
+        'max_consultas': settings.PERFIL_SQL_MAX_CONSULTAS,
+        'max_ms': settings.PERFIL_SQL_MAX_MS,
+        'cache_analitica': estadisticas_cache(),
+    })
+
+
 def actualizar_datos_manual(request):
     """Vista para actualizar datos manualmente"""
     if request.method == 'POST':
@@ -136,13 +143,16 @@ def actualizar_datos_manual(request):
     
     return render(request, 'dashboard/actualizar_datos.html')
 
+@method_decorator(condicional(validar_mercado_internacional), name='dispatch')
 class MercadoInternacionalView(TemplateView):
     """Vista para el mercado internacional"""
     template_name = 'dashboard/mercado_internacional.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        analizador = AnalizadorMercadoInternacional()
+        # Cada símbolo se carga una vez a 30 días; las ventanas menores se cortan de ahí
+        contexto_datos = ContextoDatos(dias=30)
+        analizador = AnalizadorMercadoInternacional(contexto=contexto_datos)
         
         # Obtener todos los símbolos activos
         simbolos = list(AccionInternacional.objects.filter(activo=True).values_list('simbolo', flat=True))
@@ -160,7 +170,7 @@ class MercadoInternacionalView(TemplateView):
         
         # Heatmap de rendimientos
         context['heatmap_rendimientos'] = generar_grafico_heatmap_rendimientos(
-            simbolos_principales, dias=5
+            simbolos_principales, dias=5, analizador=analizador
         )
         
         # Gráficos individuales
@@ -173,60 +183,73 @@ class MercadoInternacionalView(TemplateView):
         # Tabla de métricas
         context['metricas_acciones'] = metricas
         
+        # Análisis técnico precalculado (materializar_metricas)
+        context['metricas_tecnicas'] = analizador.obtener_metricas_materializadas(simbolos)
+        
         # Resumen rápido
-        context['resumen_mercado'] = obtener_resumen_mercado(dias=7)
+        context['resumen_mercado'] = obtener_resumen_mercado(dias=7, analizador=analizador)
         
         # Estadísticas
         context['total_acciones'] = AccionInternacional.objects.count()
-        context['total_precios'] = sum(
-            AccionInternacional.objects.get(simbolo=s).precios.count() 
-            for s in simbolos if AccionInternacional.objects.filter(simbolo=s).exists()
-        )
+        context['total_precios'] = PrecioAccion.objects.filter(accion__simbolo__in=simbolos).count()
         
         # Agrupar por tipo
         context['acciones_por_tipo'] = AccionInternacional.objects.values('tipo').annotate(
             total=Count('id')
         )
         
+        # Reuso de ventanas de precios en la request, para la página perfil_sql
+        self.request.datos_precios = contexto_datos.estadisticas()
+        
         return context
 
 
-
-class DashboardView(TemplateView):
-    """Vista principal del dashboard con resumen de datos"""
-    template_name = 'dashboard/dashboard.html'
+@method_decorator(condicional(validar_correlaciones), name='dispatch')
+class CorrelacionesView(TemplateView):
+    """Correlación de retornos entre las acciones activas y los tipos de dólar"""
+    template_name = 'dashboard/correlaciones.html'
+    periodos = [30, 90, 180, 365]
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        hoy = date.today()
-        ayer = hoy - timedelta(days=1)
         
-        # Resumen mercado internacional
         try:
-            analizador = AnalizadorMercadoInternacional()
-            
-            # Obtener métricas para símbolos principales
-            simbolos_principales = ['AAPL', 'MSFT', 'SPY']
-            metricas_internacionales = []
-            
-            for simbolo in simbolos_principales:
-                metricas = analizador.calcular_metricas_basicas(simbolo, dias=7)
-                if metricas:
-                    metricas_internacionales.append(metricas)
-            
-            context['metricas_internacionales'] = metricas_internacionales
-            
-            # Calcular correlación dólar blue vs acciones (ejemplo)
-            if metricas_internacionales:
-                context['correlacion_aapl_blue'] = analizador.calcular_correlacion_dolar_blue('AAPL', 30)
-            
-            # Gráfico mini comparativo
-            context['grafico_mini_internacional'] = analizador.generar_grafico_comparativo(
-                ['AAPL', 'SPY'], dias=7
-            )
-            
-        except Exception as e:
-            print(f"Error cargando datos internacionales: {e}")
-            context['metricas_internacionales'] = []
+            dias = int(self.request.GET.get('dias', 90))
+        except ValueError:
+            dias = 90
+        if dias not in self.periodos:
+            dias = 90
+        ventana = min(30, dias // 3)
+        
+        analizador = AnalizadorMercadoInternacional(contexto=ContextoDatos(dias=dias))
+        matriz = analizador.calcular_matriz_correlacion(dias=dias)
+        series = list(matriz.columns) if matriz is not None else []
+        
+        referencia = self.request.GET.get('referencia', 'dolar_blue')
+        if referencia not in series:
+            referencia = 'dolar_blue'
+        
+        context['heatmap_correlacion'] = analizador.generar_grafico_heatmap_correlacion(dias=dias)
+        context['grafico_correlacion_movil'] = analizador.generar_grafico_correlacion_movil(
+            referencia, dias=dias, ventana=ventana
+        )
+        
+        # Tabla de rezagos: una fila por serie, una columna por rezago
+        rezagadas = analizador.calcular_correlaciones_rezagadas(referencia, dias=dias)
+        context['rezagos'] = list(rezagadas.index) if rezagadas is not None else []
+        context['correlaciones_rezagadas'] = [
+            {
+                'serie': ETIQUETAS_SERIES.get(serie, serie),
+                'valores': [None if pd.isna(valor) else round(valor, 2) for valor in valores],
+            }
+            for serie, valores in (rezagadas.items() if rezagadas is not None else [])
+        ]
+        
+        context['series'] = [(serie, ETIQUETAS_SERIES.get(serie, serie)) for serie in series]
+        context['referencia'] = referencia
+        context['etiqueta_referencia'] = ETIQUETAS_SERIES.get(referencia, referencia)
+        context['dias'] = dias
+        context['ventana'] = ventana
+        context['periodos'] = self.periodos
         
-        return context
\ No newline at end of file
+        return context
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
+
+La analítica es CPU con el GIL, así que WSGI con hilos sigue siendo el
+despliegue recomendado; benchmark_wsgi_asgi compara ambos.
 """
 
 import os
@@ -49,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard.perfil_sql.PerfilSQLMiddleware',
 ]
 
 ROOT_URLCONF = 'financial_dashboard.urls'
@@ -121,6 +122,68 @@ STATIC_URL = 'static/'
 ALPHA_VANTAGE_API_KEY = config('ALPHA_VANTAGE_API_KEY', default='')
 ALPHA_VANTAGE_BASE_URL = 'https://www.alphavantage.co/query'
 
+# Cuota de la API key, compartida por todos los procesos a través del limitador; el cupo
+# diario se reinicia a la medianoche de ALPHA_VANTAGE_ZONA_HORARIA_CUOTA (la del proveedor)
+ALPHA_VANTAGE_LLAMADAS_POR_MINUTO = config('ALPHA_VANTAGE_LLAMADAS_POR_MINUTO', default=5, cast=int)
+ALPHA_VANTAGE_LLAMADAS_POR_DIA = config('ALPHA_VANTAGE_LLAMADAS_POR_DIA', default=25, cast=int)
+ALPHA_VANTAGE_LIMITADOR_DB = BASE_DIR / 'alpha_vantage_limitador.sqlite3'
+ALPHA_VANTAGE_ZONA_HORARIA_CUOTA = config('ALPHA_VANTAGE_ZONA_HORARIA_CUOTA', default='America/New_York')
+
+# Cache en disco de respuestas HTTP de los servicios externos
+# Modos: 'normal', 'replay' (solo respuestas grabadas, sin red) o 'desactivado'
+HTTP_CACHE_MODO = config('HTTP_CACHE_MODO', default='normal')
+HTTP_CACHE_DIR = config('HTTP_CACHE_DIR', default=str(BASE_DIR / 'http_cache'))
+HTTP_CACHE_TAMANO_MAXIMO = config('HTTP_CACHE_TAMANO_MAXIMO', default=200 * 1024 * 1024, cast=int)
+
+# Pool de conexiones keep-alive compartido por los servicios argentinos
+HTTP_POOL_HOSTS = config('HTTP_POOL_HOSTS', default=10, cast=int)
+HTTP_POOL_TAMANO = config('HTTP_POOL_TAMANO', default=10, cast=int)
+HTTP_REINTENTOS = config('HTTP_REINTENTOS', default=3, cast=int)
+HTTP_BACKOFF = config('HTTP_BACKOFF', default=0.5, cast=float)
+HTTP_BACKOFF_JITTER = config('HTTP_BACKOFF_JITTER', default=0.5, cast=float)
+
+# Cache de métricas y gráficos; las claves incluyen la versión de los datos (EstadoIngesta),
+# así que no hace falta TTL y el límite de entradas desaloja las más viejas (LRU)
+ANALITICA_CACHE_ACTIVA = config('ANALITICA_CACHE_ACTIVA', default=True, cast=bool)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analitica': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'analitica',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('ANALITICA_CACHE_MAX_ENTRADAS', default=500, cast=int),
+        },
+    },
+}
+
+# Copia columnar de los precios (un .npy mapeado en memoria por símbolo) para la analítica; cada
+# archivo lleva la versión de 'precios:<SIMBOLO>' y si no es la vigente se lee de la base
+PRECIOS_COLUMNAR_ACTIVO = config('PRECIOS_COLUMNAR_ACTIVO', default=True, cast=bool)
+PRECIOS_COLUMNAR_DIR = config('PRECIOS_COLUMNAR_DIR', default=str(BASE_DIR / 'precios_columnar'))
+
+# Recalcular MetricaAccion de cada símbolo al que la ingesta le escribe precios
+METRICAS_MATERIALIZAR_EN_INGESTA = config('METRICAS_MATERIALIZAR_EN_INGESTA', default=True, cast=bool)
+
+# Perfil de consultas SQL por vista (middleware opt-in, resumen en /perfil-sql/)
+PERFIL_SQL_ACTIVO = config('PERFIL_SQL_ACTIVO', default=False, cast=bool)
+PERFIL_SQL_MAX_CONSULTAS = config('PERFIL_SQL_MAX_CONSULTAS', default=30, cast=int)
+PERFIL_SQL_MAX_MS = config('PERFIL_SQL_MAX_MS', default=200, cast=float)
+PERFIL_SQL_LENTAS = config('PERFIL_SQL_LENTAS', default=5, cast=int)
+
+# Listados históricos paginados por cursor; el total se cuenta aparte y se cachea (aproximado)
+PAGINACION_TOTAL_APROXIMADO = config('PAGINACION_TOTAL_APROXIMADO', default=True, cast=bool)
+PAGINACION_TOTAL_TTL = config('PAGINACION_TOTAL_TTL', default=300, cast=int)
+
+# Respuestas 304 en las páginas del dashboard cuando los datos no cambiaron (ETag / Last-Modified)
+GET_CONDICIONAL_ACTIVO = config('GET_CONDICIONAL_ACTIVO', default=True, cast=bool)
+
+# Procesos del pool para la analítica de todo el universo (comandos y materialización); 0 = uno por núcleo
+ANALITICA_PROCESOS = config('ANALITICA_PROCESOS', default=0, cast=int)
+
 MERCADO_INTERNACIONAL_SYMBOLS = {
     'acciones': ['AAPL', 'MSFT', 'TSLA', 'GOOGL', 'META', 'NVDA'],
     'etfs': ['SPY', 'QQQ', 'VTI', 'VOO', 'GLD', 'IWM', 'EEM'],